@@ -46,19 +46,19 @@ QPushButton#ScanBtn:pressed {
 }
 
 /* --- Channel List --- */
-QListWidget {
+QListView {
     background-color: #171923;
     border: none;
     outline: none;
 }
-QListWidget::item {
+QListView::item {
     border-bottom: 1px solid #2d3748;
 }
-QListWidget::item:selected {
+QListView::item:selected {
     background-color: #2b6cb0;
     border-left: 4px solid #63b3ed;
 }
-QListWidget::item:hover:!selected {
+QListView::item:hover:!selected {
     background-color: #2d3748;
 }
 
@@ -0,0 +1,158 @@
+# core/addresses.py
+"""
+IPv4 address helpers for the scanner.
+
+Addresses are handled as 32-bit integers: range patterns expand lazily and
+visited tracking is a paged bitmap, so a pattern like 239.*.*.* costs no
+memory up front.
+"""
+import socket
+import struct
+
+
+def ip_to_int(ip):
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+
+def int_to_ip(addr):
+    return socket.inet_ntoa(struct.pack("!I", addr))
+
+
+def parse_pattern(pattern):
+    """
+    Turns '239.255.*.1' into a list of four octet ranges.
+    Returns None if the pattern is not a valid dotted quad.
+    """
+    parts = pattern.strip().split('.')
+    if len(parts) != 4:
+        return None
+
+    octets = []
+    for part in parts:
+        if part == '*':
+            octets.append(range(0, 256))
+            continue
+        try:
+            value = int(part)
+        except ValueError:
+            return None
+        if not 0 <= value <= 255:
+            return None
+        octets.append(range(value, value + 1))
+    return octets
+
+
+def parse_ports(text):
+    """
+    Turns '1234,5000-5002' into a sorted list of ports.
+    Returns None if any part is not a port or port range.
+    """
+    ports = set()
+    for part in text.replace(' ', '').split(','):
+        first, _, last = part.partition('-')
+        try:
+            first = int(first)
+            last = int(last) if last else first
+        except ValueError:
+            return None
+        if not 1 <= first <= last <= 65535:
+            return None
+        ports.update(range(first, last + 1))
+    return sorted(ports)
+
+
+def pattern_size(pattern, shard=None):
+    octets = parse_pattern(pattern)
+    if octets is None:
+        return 0
+    size = 1
+    for octet in octets:
+        size *= len(octet)
+    if not shard:
+        return size
+
+    # Units are dealt round robin, so the first `extra` shards get one more
+    index, count = shard
+    unit = len(octets[3]) if shard_by_block(pattern, count) else 1
+    units = size // unit
+    share, extra = divmod(units, count)
+    return (share + (1 if index < extra else 0)) * unit
+
+
+def shard_by_block(pattern, count):
+    """
+    Sharding unit for a pattern: whole /24 blocks when there are enough of
+    them to go round (keeps a subnet on one process), else single addresses.
+    """
+    octets = parse_pattern(pattern)
+    if octets is None:
+        return True
+    return len(octets[0]) * len(octets[1]) * len(octets[2]) >= count
+
+
+def iter_pattern(pattern, shard=None):
+    """
+    Lazily yields every address matching the pattern as an integer.
+    With shard=(index, count) only that shard's share is yielded; the shards
+    interleave so live subnets are spread across all of them.
+    """
+    octets = parse_pattern(pattern)
+    if octets is None:
+        return
+
+    index, count = shard if shard else (0, 1)
+    by_block = shard_by_block(pattern, count)
+
+    n = 0
+    for a in octets[0]:
+        for b in octets[1]:
+            base_ab = (a << 24) | (b << 16)
+            for c in octets[2]:
+                base = base_ab | (c << 8)
+                if by_block:
+                    n += 1
+                    if (n - 1) % count != index:
+                        continue
+                    for d in octets[3]:
+                        yield base | d
+                else:
+                    for d in octets[3]:
+                        n += 1
+                        if (n - 1) % count == index:
+                            yield base | d
+
+
+class AddressBitmap:
+    """
+    Set of IPv4 addresses stored as one bit each. Pages of 8 KiB (one /16)
+    are only allocated once an address inside them is added.
+    """
+    PAGE_BITS = 16
+
+    def __init__(self):
+        self.pages = {}
+        self.count = 0
+
+    def add(self, addr):
+        """Marks an address. Returns True if it was not already present."""
+        page = self.pages.get(addr >> self.PAGE_BITS)
+        if page is None:
+            page = self.pages[addr >> self.PAGE_BITS] = bytearray(1 << (self.PAGE_BITS - 3))
+
+        offset = addr & 0xFFFF
+        mask = 1 << (offset & 0x7)
+        if page[offset >> 3] & mask:
+            return False
+        page[offset >> 3] |= mask
+        self.count += 1
+        return True
+
+    def __contains__(self, addr):
+        page = self.pages.get(addr >> self.PAGE_BITS)
+        if page is None:
+            return False
+        offset = addr & 0xFFFF
+        return bool(page[offset >> 3] & (1 << (offset & 0x7)))
+
+    def __len__(self):
+        return self.count
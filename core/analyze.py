@@ -0,0 +1,99 @@
+# core/analyze.py
+"""
+Offline capture analysis.
+
+    python -m core.analyze segment.ts                 # a recording
+    python -m core.analyze capture.pcap               # every group/port in a capture
+    python -m core.analyze capture.pcapng --format m3u -o lineup.m3u
+
+Reports every stream with its services, providers and bitrates. The file
+is read once through a memory map, so captures larger than RAM are fine.
+"""
+import argparse
+import json
+import sys
+from dataclasses import asdict
+
+from core.capture import CaptureAnalyzer
+from core.channel import m3u_entry
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m core.analyze",
+                                     description="Report the services in a .ts recording or pcap capture.")
+    parser.add_argument("path", help=".ts, .pcap or .pcapng file")
+    parser.add_argument("--format", choices=("text", "jsonl", "m3u"), default="text")
+    parser.add_argument("-o", "--output", help="Write the report to a file instead of stdout")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No progress on stderr")
+    return parser
+
+
+def _rate(bitrate):
+    return "?" if bitrate is None else f"{bitrate / 1e6:.2f} Mb/s"
+
+
+def write_text(out, reports):
+    for report in reports:
+        stream = f"{report['ip']}:{report['port']}" if report["ip"] else "TS file"
+        out.write(f"{stream}  {_rate(report['bitrate'])}  {report['duration']:.1f} s  "
+                  f"{report['bytes'] / 1e6:.1f} MB  {len(report['services'])} services\n")
+        for service in report["services"]:
+            channel = service["channel"]
+            number = "-" if channel.service_id is None else channel.service_id
+            provider = f"  ({channel.provider})" if channel.provider else ""
+            out.write(f"    {number:>5}  {channel.name}{provider}  {_rate(service['bitrate'])}\n")
+
+
+def write_jsonl(out, reports):
+    for report in reports:
+        for service in report["services"]:
+            entry = asdict(service["channel"])
+            entry.update(bitrate=service["bitrate"], stream_bitrate=report["bitrate"],
+                         duration=report["duration"])
+            out.write(json.dumps(entry) + "\n")
+
+
+def write_m3u(out, reports):
+    out.write("#EXTM3U\n")
+    for report in reports:
+        if report["ip"]:
+            for service in report["services"]:
+                out.write(m3u_entry(service["channel"]) + "\n")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    def progress(percent):
+        if not args.quiet and sys.stderr.isatty():
+            sys.stderr.write(f"\r{percent}% read ")
+            sys.stderr.flush()
+
+    analyzer = CaptureAnalyzer(args.path, on_progress=progress)
+    try:
+        reports = analyzer.run()
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if not args.quiet and sys.stderr.isatty():
+        sys.stderr.write("\n")
+
+    try:
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    except OSError as e:
+        print(f"Could not open {args.output}: {e}", file=sys.stderr)
+        return 2
+    try:
+        {"text": write_text, "jsonl": write_jsonl, "m3u": write_m3u}[args.format](out, reports)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if not reports:
+        print("No MPEG-TS found.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
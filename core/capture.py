@@ -0,0 +1,344 @@
+# core/capture.py
+"""
+Offline analysis of .ts recordings and pcap/pcapng captures.
+
+The file is memory-mapped and walked once from start to end: TS files in
+packet-aligned chunks, captures record by record. Datagrams are
+demultiplexed by destination group and port, and every stream gets a
+PSIDemux (for services and providers) and per-PID packet counts (for
+bitrates). Only small slices are copied out of the mapping and pages
+behind the cursor are handed back to the kernel, so memory stays bounded
+however large the capture is, and the run time is linear in its size.
+
+Bitrates come from capture timestamps for pcap files and from the PCR
+for raw TS, which carries no arrival times.
+"""
+import mmap
+import struct
+from collections import Counter
+
+from core.channel import channels_from_psi
+from core.psi import PSIDemux
+from core.ts import SYNC_BYTE, TS_PACKET_SIZE, find_sync, has_pcr, iter_packets, pcr_delta, read_pcr
+
+# TS files are read this much at a time (a whole number of packets)
+TS_CHUNK = TS_PACKET_SIZE * 5577  # ~1 MB
+# Mapped pages behind the cursor are released every this many bytes
+RELEASE_BYTES = 64 * 1024 * 1024
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+PCAPNG_SECTION = b"\x0a\x0d\x0d\x0a"
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 14, 101, 228)
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+
+
+def _ip(raw):
+    return f"{raw[0]}.{raw[1]}.{raw[2]}.{raw[3]}"
+
+
+def ipv4_offset(frame, linktype):
+    """Where the IPv4 header starts in a captured frame, or None if it is not IPv4."""
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 12
+        ethertype = (frame[12] << 8) | frame[13] if len(frame) >= 14 else None
+        while ethertype in ETHERTYPE_VLAN and len(frame) >= offset + 6:
+            offset += 4
+            ethertype = (frame[offset] << 8) | frame[offset + 1]
+        return offset + 2 if ethertype == ETHERTYPE_IPV4 else None
+    if linktype == LINKTYPE_LINUX_SLL:
+        return 16 if len(frame) >= 16 and (frame[14] << 8) | frame[15] == ETHERTYPE_IPV4 else None
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return 20 if len(frame) >= 20 and (frame[0] << 8) | frame[1] == ETHERTYPE_IPV4 else None
+    if linktype == LINKTYPE_NULL:
+        # AF_INET (2) in the capturing host's byte order
+        return 4 if len(frame) >= 4 and 2 in (frame[0], frame[3]) else None
+    if linktype in LINKTYPE_RAW:
+        return 0
+    return None
+
+
+def udp_datagram(frame, linktype):
+    """(destination ip, destination port, payload) of a UDP/IPv4 frame, or None."""
+    ip = ipv4_offset(frame, linktype)
+    if ip is None or len(frame) < ip + 28 or frame[ip] >> 4 != 4 or frame[ip + 9] != 17:
+        return None
+    # Fragments cannot be demultiplexed on their own; IPTV senders avoid them
+    if ((frame[ip + 6] << 8) | frame[ip + 7]) & 0x3FFF:
+        return None
+    udp = ip + (frame[ip] & 0x0F) * 4
+    if len(frame) < udp + 8:
+        return None
+    port = (frame[udp + 2] << 8) | frame[udp + 3]
+    length = (frame[udp + 4] << 8) | frame[udp + 5]
+    return _ip(frame[ip + 16:ip + 20]), port, frame[udp + 8:udp + max(8, length)]
+
+
+def iter_pcap(mm):
+    """Yields (timestamp, linktype, frame, end of record) for every record of a classic pcap file."""
+    order, resolution = PCAP_MAGIC[mm[:4]]
+    linktype = struct.unpack_from(order + "I", mm, 20)[0] & 0xFFFF
+    record = struct.Struct(order + "IIII")
+    pos = 24
+    end = len(mm)
+    while pos + 16 <= end:
+        seconds, fraction, captured, _ = record.unpack_from(mm, pos)
+        pos += 16
+        if pos + captured > end:
+            return  # Truncated capture
+        pos += captured
+        yield seconds + fraction * resolution, linktype, mm[pos - captured:pos], pos
+
+
+def _pcapng_resolution(options, order):
+    # if_tsresol (option 9): 10^-n, or 2^-n with the top bit set
+    i = 0
+    while i + 4 <= len(options):
+        code, length = struct.unpack_from(order + "HH", options, i)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = options[i + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        i += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+def iter_pcapng(mm):
+    """Yields (timestamp, linktype, frame, end of block) for every Enhanced Packet Block of a pcapng file."""
+    pos = 0
+    end = len(mm)
+    order = "<"
+    interfaces = []  # (linktype, resolution) by interface id, per section
+    while pos + 12 <= end:
+        block_type = mm[pos:pos + 4]
+        if block_type == PCAPNG_SECTION:
+            order = "<" if mm[pos + 8:pos + 12] == b"\x4d\x3c\x2b\x1a" else ">"
+            interfaces = []
+            block_type = 0x0A0D0D0A
+        else:
+            block_type = struct.unpack_from(order + "I", mm, pos)[0]
+        length = struct.unpack_from(order + "I", mm, pos + 4)[0]
+        if length < 12 or pos + length > end:
+            return  # Corrupt or truncated
+        if block_type == 1:  # Interface Description
+            linktype = struct.unpack_from(order + "H", mm, pos + 8)[0]
+            interfaces.append((linktype, _pcapng_resolution(mm[pos + 16:pos + length - 4], order)))
+        elif block_type == 6:  # Enhanced Packet
+            interface, high, low, captured = struct.unpack_from(order + "IIII", mm, pos + 8)
+            if interface < len(interfaces):
+                linktype, resolution = interfaces[interface]
+                captured = min(captured, length - 32)
+                yield (((high << 32) | low) * resolution, linktype,
+                       mm[pos + 28:pos + 28 + captured], pos + length)
+        pos += length
+
+
+def count_pids(data, counts):
+    """Adds every TS packet in `data` to counts[(pid_hi byte, pid_lo byte)]. Returns the number of packets."""
+    start = find_sync(data)
+    if start < 0:
+        return 0
+    count = (len(data) - start) // TS_PACKET_SIZE
+    stop = start + count * TS_PACKET_SIZE
+    if data[start:stop:TS_PACKET_SIZE] == bytes([SYNC_BYTE]) * count:
+        # Aligned all the way: both PID bytes of every packet, counted in C
+        counts.update(zip(data[start + 1:stop:TS_PACKET_SIZE], data[start + 2:stop:TS_PACKET_SIZE]))
+        return count
+    packets = 0
+    for _, pid in iter_packets(data):
+        counts[(pid >> 8, pid & 0xFF)] += 1
+        packets += 1
+    return packets
+
+
+class PCRClock:
+    """Stream time covered by the bytes between the first and last PCR of one PID."""
+    __slots__ = ("pid", "last_pcr", "last_position", "elapsed", "bytes")
+
+    def __init__(self):
+        self.pid = None
+        self.last_pcr = None
+        self.last_position = None
+        self.elapsed = 0.0
+        self.bytes = 0
+
+    def feed(self, data, position):
+        """`position` is the stream offset of data[0]."""
+        if self.pid is None:
+            for offset, pid in iter_packets(data):
+                if has_pcr(data, offset):
+                    self.pid = pid
+                    break
+            else:
+                return
+
+        for offset, _ in iter_packets(data, (self.pid,)):
+            if not has_pcr(data, offset):
+                continue
+            pcr = read_pcr(data, offset + 6)
+            here = position + offset
+            if self.last_pcr is not None:
+                delta = pcr_delta(pcr, self.last_pcr)
+                # A jump of a second or more is a splice, not elapsed time
+                if delta < 1.0:
+                    self.elapsed += delta
+                    self.bytes += here - self.last_position
+            self.last_pcr = pcr
+            self.last_position = here
+
+
+class StreamStats:
+    """Everything learned about one group/port (or the whole of a TS file)."""
+
+    def __init__(self, ip, port):
+        self.ip = ip
+        self.port = port
+        self.psi = PSIDemux()
+        self.psi_complete = False
+        self.pid_counts = Counter()
+        self.clock = PCRClock()
+        self.bytes = 0
+        self.datagrams = 0
+        self.ts_packets = 0
+        self.first_time = None
+        self.last_time = None
+
+    def feed(self, data, timestamp=None):
+        if timestamp is None:
+            self.clock.feed(data, self.bytes)
+        else:
+            if self.first_time is None:
+                self.first_time = timestamp
+            self.last_time = timestamp
+        self.bytes += len(data)
+        self.datagrams += 1
+        self.ts_packets += count_pids(data, self.pid_counts)
+        # Services and providers do not change within a capture worth analysing
+        if not self.psi_complete:
+            self.psi.feed(data)
+            self.psi_complete = self.psi.complete
+
+    @property
+    def duration(self):
+        if self.first_time is not None:
+            return self.last_time - self.first_time
+        return self.clock.elapsed
+
+    @property
+    def bitrate(self):
+        if self.first_time is not None:
+            duration = self.last_time - self.first_time
+            return self.bytes * 8 / duration if duration > 0 else None
+        return self.clock.bytes * 8 / self.clock.elapsed if self.clock.elapsed > 0 else None
+
+    def pids(self):
+        """{pid: packets}"""
+        pids = Counter()
+        for (hi, lo), count in self.pid_counts.items():
+            pids[((hi & 0x1F) << 8) | lo] += count
+        return pids
+
+    def report(self):
+        """
+        {'ip', 'port', 'bytes', 'duration', 'bitrate', 'services'}, each
+        service being {'channel': Channel, 'bitrate': bits/s or None}.
+        """
+        duration = self.duration
+        pids = self.pids()
+        services = []
+        for channel in channels_from_psi(self.ip, self.psi, port=self.port):
+            service_pids = {channel.pmt_pid, channel.pcr_pid, *channel.pids} - {None}
+            bitrate = None
+            if duration > 0 and service_pids:
+                bitrate = sum(pids[pid] for pid in service_pids) * TS_PACKET_SIZE * 8 / duration
+            services.append({"channel": channel, "bitrate": bitrate})
+        return {"ip": self.ip, "port": self.port, "bytes": self.bytes, "duration": duration,
+                "bitrate": self.bitrate, "services": services}
+
+
+class CaptureAnalyzer:
+    """
+    Reads a .ts or pcap/pcapng file at `path` in one pass. run() returns one
+    report per stream that carried TS (see StreamStats.report), largest
+    first; on_progress(int) gets the percentage read as it goes.
+    """
+
+    def __init__(self, path, on_progress=None):
+        self.path = path
+        self.on_progress = on_progress or (lambda percent: None)
+        self.streams = {}  # (ip, port) -> StreamStats
+        self.skipped = 0  # Frames that were not unfragmented UDP/IPv4
+        self.next_report = 0
+        self.released = 0  # Bytes of the mapping handed back to the kernel
+
+    def run(self):
+        with open(self.path, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return []  # Empty file
+        try:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            magic = mm[:4]
+            if magic in PCAP_MAGIC:
+                self.read_capture(mm, iter_pcap(mm))
+            elif magic == PCAPNG_SECTION:
+                self.read_capture(mm, iter_pcapng(mm))
+            else:
+                self.read_ts(mm)
+        finally:
+            mm.close()
+
+        reports = [stream.report() for stream in self.streams.values() if stream.ts_packets]
+        return sorted(reports, key=lambda report: report["bytes"], reverse=True)
+
+    def read_ts(self, mm):
+        stream = self.streams[("", 0)] = StreamStats("", 0)
+        pos = max(0, find_sync(mm[:TS_CHUNK]))
+        end = len(mm)
+        while pos < end:
+            stream.feed(mm[pos:pos + TS_CHUNK])
+            pos += TS_CHUNK
+            self.progress(mm, pos)
+
+    def read_capture(self, mm, records):
+        streams = self.streams
+        for timestamp, linktype, frame, position in records:
+            self.progress(mm, position)
+            datagram = udp_datagram(frame, linktype)
+            if datagram is None:
+                self.skipped += 1
+                continue
+            ip, port, payload = datagram
+            stream = streams.get((ip, port))
+            if stream is None:
+                stream = streams[(ip, port)] = StreamStats(ip, port)
+            stream.feed(payload, timestamp)
+        self.progress(mm, len(mm))
+
+    def progress(self, mm, position):
+        """Every RELEASE_BYTES: reports progress and releases the pages read so far."""
+        if position < self.next_report and position < len(mm):
+            return
+        self.next_report = position + RELEASE_BYTES
+        # Dropped from our mapping only; the page cache decides whether to
+        # keep them, so resident memory stays flat on captures of any size
+        if hasattr(mmap, "MADV_DONTNEED"):
+            done = min(position, len(mm)) // mmap.PAGESIZE * mmap.PAGESIZE
+            if done > self.released:
+                mm.madvise(mmap.MADV_DONTNEED, self.released, done - self.released)
+                self.released = done
+        self.on_progress(min(100, position * 100 // max(1, len(mm))))
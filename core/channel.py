@@ -0,0 +1,81 @@
+# core/channel.py
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Channel:
+    """One service (program) found on a multicast group."""
+    name: str
+    ip: str
+    port: int = 1234
+    service_id: int = None  # None when the group carried no usable PSI
+    provider: str = ""
+    service_type: int = None
+    pmt_pid: int = None
+    pcr_pid: int = None
+    streams: list = field(default_factory=list)  # [(stream_type, pid), ...]
+    last_seen: float = None  # Unix time of the last scan that confirmed it
+    interface: str = ""  # Interface it was found on; "" means the default route
+
+    @property
+    def key(self):
+        """Identifies the service independently of its (changeable) name."""
+        return (self.interface, self.ip, self.port, self.service_id)
+
+    @property
+    def pids(self):
+        return [pid for _, pid in self.streams]
+
+
+def channels_from_psi(ip, psi, interface="", port=1234):
+    """
+    Builds one Channel per service on a group by cross-referencing the SDT
+    service loop with the PAT/PMT. Services only present in one of the
+    tables are still reported.
+    """
+    service_ids = sorted(set(psi.services) | set(psi.pmt_pids))
+    if not service_ids:
+        return [Channel(name=f"Unknown {ip}", ip=ip, port=port, interface=interface)]
+
+    channels = []
+    for service_id in service_ids:
+        sdt = psi.services.get(service_id, {})
+        pmt = psi.programs.get(service_id, {})
+
+        name = sdt.get("name")
+        if not name:
+            name = f"Unknown {ip}" if len(service_ids) == 1 else f"Program {service_id} ({ip})"
+
+        channels.append(Channel(
+            name=name,
+            ip=ip,
+            port=port,
+            service_id=service_id,
+            provider=sdt.get("provider", ""),
+            service_type=sdt.get("service_type"),
+            pmt_pid=psi.pmt_pids.get(service_id),
+            pcr_pid=pmt.get("pcr_pid"),
+            streams=list(pmt.get("streams", [])),
+            interface=interface,
+        ))
+    return channels
+
+
+def m3u_entry(channel, url=None):
+    """
+    Two or three M3U lines that make VLC play exactly this service, from the
+    group itself or from `url` (e.g. an HTTP relay that does the join).
+    """
+    attrs = f'tvg-name="{channel.name}"'
+    if channel.provider:
+        attrs += f' group-title="{channel.provider}"'
+
+    lines = [f"#EXTINF:-1 {attrs},{channel.name}"]
+    if channel.service_id is not None:
+        lines.append(f"#EXTVLCOPT:program={channel.service_id}")
+    if url is None:
+        if channel.interface:
+            lines.append(f"#EXTVLCOPT:miface={channel.interface}")
+        url = f"udp://@{channel.ip}:{channel.port}"
+    lines.append(url)
+    return "\n".join(lines)
@@ -0,0 +1,89 @@
+# core/channel_store.py
+"""
+On-disk cache of discovered channels.
+
+The sidebar fills itself from here at launch, and the next scan re-probes
+the cached groups before falling back to discovery.
+"""
+import json
+import os
+import time
+from dataclasses import asdict
+
+from core.channel import Channel
+
+STORE_VERSION = 1
+
+
+def default_store_path():
+    """Per-user config location, e.g. ~/.config/CableCompany/channels.json."""
+    if os.name == "nt":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(base, "CableCompany", "channels.json")
+
+
+class ChannelStore:
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        self.channels = {}  # Channel.key -> Channel
+
+    def load(self):
+        """Reads the cache. A missing or corrupt file just means an empty store."""
+        self.channels = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if not isinstance(data, dict) or not isinstance(data.get("channels", []), list):
+            return []
+
+        for entry in data.get("channels", []):
+            try:
+                channel = channel_from_dict(entry)
+            except (TypeError, ValueError):
+                continue
+            self.channels[channel.key] = channel
+
+        return self.all()
+
+    def save(self):
+        """Writes the cache atomically so a crash never leaves half a file."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        data = {
+            "version": STORE_VERSION,
+            "channels": [asdict(channel) for channel in self.all()],
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def all(self):
+        return sorted(self.channels.values(), key=lambda c: (c.ip, c.port, c.service_id or 0))
+
+    def groups(self):
+        """Distinct multicast groups in the cache, most recently seen first."""
+        seen = {}
+        for channel in self.channels.values():
+            seen[channel.ip] = max(seen.get(channel.ip, 0), channel.last_seen or 0)
+        return sorted(seen, key=seen.get, reverse=True)
+
+    def put(self, channel):
+        channel.last_seen = time.time()
+        self.channels[channel.key] = channel
+
+    def retain(self, keys):
+        """Drops every channel whose key is not in `keys`."""
+        self.channels = {key: c for key, c in self.channels.items() if key in keys}
+
+
+def channel_from_dict(entry):
+    channel = Channel(**entry)
+    channel.streams = [tuple(stream) for stream in channel.streams]
+    return channel
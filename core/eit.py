@@ -0,0 +1,132 @@
+# core/eit.py
+"""
+EIT (Event Information Table) decoding for the programme guide.
+
+EIT sections arrive on PID 0x12: present/following (table 0x4E) every
+couple of seconds and the schedule (0x50-0x5F) in slower cycles. Sections
+are stitched together with the same SectionAssembler as the PSI, and like
+PSIDemux a section whose version has not changed is skipped before the CRC
+check, so a group's guide costs one decode per change however long we
+listen to it. Only the tables for the transport stream itself ("actual")
+are read; "other" tables describe services we cannot map to a group.
+"""
+from core.psi import SectionAssembler, crc32_mpeg, decode_text
+from core.ts import iter_packets
+
+EIT_PID = 0x12
+
+TABLE_EIT_PF_ACTUAL = 0x4E
+TABLE_EIT_SCHEDULE_ACTUAL = range(0x50, 0x60)
+
+# Modified Julian Date of 1970-01-01
+MJD_UNIX_EPOCH = 40587
+
+
+def _bcd(value):
+    return (value >> 4) * 10 + (value & 0x0F)
+
+
+def decode_start(raw):
+    """5 byte MJD + BCD UTC start_time as Unix time, or None if undefined."""
+    if raw[0] == 0xFF and raw[1] == 0xFF:
+        return None
+    mjd = (raw[0] << 8) | raw[1]
+    return ((mjd - MJD_UNIX_EPOCH) * 86400
+            + _bcd(raw[2]) * 3600 + _bcd(raw[3]) * 60 + _bcd(raw[4]))
+
+
+def decode_duration(raw):
+    """3 byte BCD hhmmss as seconds."""
+    return _bcd(raw[0]) * 3600 + _bcd(raw[1]) * 60 + _bcd(raw[2])
+
+
+def parse_eit(section):
+    """
+    Returns (service_id, [event, ...]) for one EIT section, each event a dict
+    with 'event_id', 'start' (Unix time), 'duration' (seconds), 'name' and
+    'text'. Events without a start time are left out.
+    """
+    section = memoryview(section)
+    service_id = (section[3] << 8) | section[4]
+    events = []
+    end = len(section) - 4
+    i = 14  # After the header, ts/network ids, segment_last_section_number and last_table_id
+
+    while i + 12 <= end:
+        event_id = (section[i] << 8) | section[i + 1]
+        start = decode_start(section[i + 2:i + 7])
+        duration = decode_duration(section[i + 7:i + 10])
+        loop_len = ((section[i + 10] & 0x0F) << 8) | section[i + 11]
+        i += 12
+
+        name = text = ""
+        loop_end = min(i + loop_len, end)
+        while i + 2 <= loop_end:
+            tag = section[i]
+            length = section[i + 1]
+            body = section[i + 2:i + 2 + length]
+            i += 2 + length
+
+            # Short Event Descriptor: [Lang x3] [Name_Len] [Name] [Text_Len] [Text]
+            if tag == 0x4D and len(body) >= 5 and not name:
+                name_end = 4 + body[3]
+                if name_end >= len(body):
+                    continue
+                name = decode_text(body[4:name_end])
+                text = decode_text(body[name_end + 1:name_end + 1 + body[name_end]])
+
+        i = loop_end
+        if start is not None:
+            events.append({"event_id": event_id, "start": start, "duration": duration,
+                           "name": name, "text": text})
+
+    return service_id, events
+
+
+class EITDemux:
+    """
+    Assembles the EIT of one transport stream. feed() returns the events of
+    every new or changed section in the chunk.
+    """
+
+    def __init__(self):
+        self.assembler = SectionAssembler(EIT_PID)
+        self.versions = {}  # (table_id, service_id, section_number) -> version
+
+        self.sections_decoded = 0
+        self.sections_skipped = 0
+        self.crc_errors = 0
+
+    def feed(self, data):
+        """Returns [(service_id, [event, ...]), ...] decoded from this chunk."""
+        results = []
+        for offset, _ in iter_packets(data, (EIT_PID,)):
+            for section in self.assembler.feed_packet(data, offset):
+                result = self.on_section(section)
+                if result is not None:
+                    results.append(result)
+        return results
+
+    def on_section(self, section):
+        if len(section) < 18 or not section[1] & 0x80:
+            return None
+
+        table_id = section[0]
+        if table_id != TABLE_EIT_PF_ACTUAL and table_id not in TABLE_EIT_SCHEDULE_ACTUAL:
+            return None
+        if not section[5] & 0x1:
+            return None  # Not yet applicable
+
+        key = (table_id, (section[3] << 8) | section[4], section[6])
+        version = (section[5] >> 1) & 0x1F
+        if self.versions.get(key) == version:
+            self.sections_skipped += 1
+            return None
+
+        if crc32_mpeg(section) != 0:
+            self.crc_errors += 1
+            return None
+
+        self.versions[key] = version
+        self.sections_decoded += 1
+        return parse_eit(section)
@@ -0,0 +1,441 @@
+# core/engine.py
+import cProfile
+import selectors
+import time
+from collections import deque
+from core.addresses import AddressBitmap, int_to_ip, ip_to_int, iter_pattern, pattern_size
+from core.channel import channels_from_psi
+from core.interfaces import join_group, leave_group, membership_request
+from core.metrics import ScanMetrics
+from core.pacing import JoinPacer
+from core.psi import PSIDemux
+from core.ringbuf import RecvRing
+from core.smart import SmartQueue
+
+
+class _Probe:
+    """State for one multicast group that is currently joined, on every probed port."""
+    __slots__ = ("ip", "socks", "mreq", "deadline", "answered", "psi", "interface",
+                 "joined", "first_packet", "parse_time")
+
+    def __init__(self, ip, socks, mreq, deadline, interface=""):
+        self.ip = ip
+        self.socks = socks  # port -> socket bound to (ip, port)
+        self.mreq = mreq
+        self.deadline = deadline
+        self.interface = interface
+        self.answered = False
+        # perf_counter() stamps and totals for ScanMetrics
+        self.joined = time.perf_counter()
+        self.first_packet = None
+        self.parse_time = 0.0
+        # Sections are assembled across datagrams, so the hunt can stop as
+        # soon as the SDT and every PMT are in. One demux per port that
+        # answered: each port is a separate stream.
+        self.psi = {}
+
+    @property
+    def done(self):
+        return bool(self.psi) and all(psi.complete for psi in self.psi.values())
+
+    def channels(self):
+        channels = []
+        for port, psi in sorted(self.psi.items()):
+            channels.extend(channels_from_psi(self.ip, psi, self.interface, port))
+        return channels
+
+
+def _ignore(*args):
+    pass
+
+
+class ProbeEngine:
+    """
+    Multicast scanner with no GUI dependencies.
+
+    Results are reported through plain callbacks:
+      on_channel(Channel)  - once per service found, as soon as it is found
+      on_status(str)       - notable events (start, subnet expansion, ...)
+      on_progress(int)     - percentage of the estimated work done  } once per
+      on_snapshot(dict)    - counters, see snapshot()                } tick
+    Progress and snapshots are coalesced to `tick_interval` seconds no matter
+    how fast groups are probed. run() blocks until the scan is done or stop()
+    is called, and returns the number of channels found.
+    """
+
+    def __init__(self, mode="smart", custom_range=None, ports=(1234,),
+                 max_inflight=128, probe_timeout=0.1, hunt_timeout=2.0, known=None,
+                 tick_interval=0.066, shard=None, interface=None, join_rate=None,
+                 join_burst=None, max_memberships=None, profile=None, on_channel=None,
+                 on_progress=None, on_status=None, on_snapshot=None):
+        self.mode = mode
+        self.custom_range = custom_range
+        # (index, count): only probe this share of a custom range
+        self.shard = shard
+        # core.interfaces.Interface to join on, None lets the kernel pick
+        self.interface = interface
+        # Every group is probed on all of these ports at once
+        self.ports = sorted(set(ports))
+        # Groups from a previous scan: revalidated before any discovery
+        self.known = list(known or [])
+        # How many groups we keep joined at the same time
+        self.max_inflight = max(1, max_inflight)
+        # Silent groups are retired after probe_timeout, live ones get
+        # up to hunt_timeout to deliver a complete SDT and PMTs
+        self.probe_timeout = probe_timeout
+        self.hunt_timeout = hunt_timeout
+        # Joins per second and groups joined at once, enforced on every join
+        # (run and check_ip alike) so switches never see a join storm
+        self.pacer = JoinPacer(join_rate, join_burst, max_memberships)
+        # Opt-in: cProfile the scan loop and dump the stats to this path
+        self.profile = profile
+        self.is_running = True
+        # Published at most 1/tick_interval times a second (~15 Hz)
+        self.tick_interval = tick_interval
+
+        # Counters for the current run, see snapshot()
+        self.processed = 0  # Groups retired (answered, silent or failed)
+        self.hits = 0  # Groups that answered
+        self.found_count = 0  # Channels (services) reported
+        self.total_estimated = 0
+        self.inflight = {}  # ip -> _Probe
+        self.started = None
+        self.last_event = ""
+
+        # Latency histograms and counters of the current run, see core.metrics
+        self.metrics = ScanMetrics()
+
+        # Every probe reads into the same preallocated buffer
+        self.ring = RecvRing()
+
+        self.on_channel = on_channel or _ignore
+        self.on_progress = on_progress or _ignore
+        self.on_status = on_status or _ignore
+        self.on_snapshot = on_snapshot or _ignore
+
+    def generate_smart_beacons(self):
+        # Block 1: 239.255.x.1
+        for i in range(0, 256):
+            yield ip_to_int(f"239.255.{i}.1")
+        # Block 2: 239.192.x.1
+        for i in range(0, 50):
+            yield ip_to_int(f"239.192.{i}.1")
+
+    def generate_range_ips(self, pattern):
+        """Lazily yields the addresses matching a pattern such as 239.*.0.1 as integers."""
+        return iter_pattern(pattern, self.shard)
+
+    def snapshot(self):
+        """Counters of the running scan as a plain dict."""
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        remaining = max(0, self.total_estimated - self.processed)
+        eta = None
+        if self.processed and self.is_running:
+            eta = elapsed / self.processed * remaining
+
+        percent = 0
+        if self.total_estimated > 0:
+            percent = min(100, int((self.processed / self.total_estimated) * 100))
+
+        return {
+            "probed": self.processed,
+            "in_flight": len(self.inflight),
+            "hits": self.hits,
+            "channels": self.found_count,
+            "total": self.total_estimated,
+            "percent": percent,
+            "elapsed": elapsed,
+            "eta": eta,
+            "joins": self.pacer.joins,
+            "join_rate": self.pacer.joins / elapsed if elapsed > 0 else 0.0,
+            "event": self.last_event,
+        }
+
+    def metrics_snapshot(self):
+        """Histograms and counters of the current run, see core.metrics."""
+        return self.metrics.snapshot()
+
+    def status(self, message):
+        self.last_event = message
+        self.on_status(message)
+
+    def publish(self):
+        snapshot = self.snapshot()
+        self.on_progress(snapshot["percent"])
+        self.on_snapshot(snapshot)
+
+    def run(self):
+        self.started = time.monotonic()
+        self.processed = self.hits = self.found_count = 0
+        self.last_event = ""
+        self.pacer.reset()
+        self.metrics = ScanMetrics()
+
+        # Smart mode probes best-scoring /24 first, see core.smart
+        smart = None
+        if self.mode == "smart":
+            self.status("Initializing Smart Scan...")
+            smart = SmartQueue(self.generate_smart_beacons(), history=self.known)
+            self.total_estimated = smart.total
+        else:
+            source = self.generate_range_ips(self.custom_range)
+            self.total_estimated = pattern_size(self.custom_range, self.shard)
+
+        pending = deque()
+        visited = AddressBitmap()
+
+        # Warm start: cached groups go first so they show up within a second
+        for ip in self.known:
+            addr = ip_to_int(ip)
+            if visited.add(addr):
+                pending.append(addr)
+        if pending:
+            self.status(f"Revalidating {len(pending)} known groups...")
+            self.total_estimated += len(pending)
+
+        def next_address():
+            if pending:
+                return pending.popleft()
+            if smart is not None:
+                return smart.pop(visited)
+            for addr in source:
+                if visited.add(addr):
+                    return addr
+            return None
+
+        selector = selectors.DefaultSelector()
+        inflight = self.inflight = {}
+        next_tick = self.started
+        profiler = self.start_profile()
+
+        try:
+            while True:
+                # 1. IMMEDIATE STOP CHECK
+                if not self.is_running:
+                    break
+
+                # 2. Top up the window of joined groups, as fast as the pacer allows
+                exhausted = False
+                while len(inflight) < self.max_inflight and self.pacer.ready(time.monotonic()):
+                    addr = next_address()
+                    if addr is None:
+                        exhausted = True
+                        break
+                    ip = int_to_ip(addr)
+                    probe = self.open_probe(ip)
+                    if probe is None:
+                        self.processed += 1
+                        self.metrics.count("probes")
+                        continue
+                    inflight[ip] = probe
+                    for port, sock in probe.socks.items():
+                        selector.register(sock, selectors.EVENT_READ, (probe, port))
+
+                if not inflight and exhausted:
+                    break
+
+                # 3. Wait for traffic on any joined group, or for the next
+                # join token. The wait is capped at 0.1s so a stop request
+                # is noticed quickly.
+                now = time.monotonic()
+                timeout = 0.1
+                if inflight:
+                    next_deadline = min(p.deadline for p in inflight.values())
+                    timeout = min(timeout, max(0.0, next_deadline - now))
+                if not exhausted and len(inflight) < self.max_inflight and not self.pacer.full:
+                    timeout = min(timeout, self.pacer.delay(now))
+
+                if inflight:
+                    events = selector.select(timeout)
+                else:
+                    # Paced with nothing joined: some selectors refuse to wait on no sockets
+                    time.sleep(timeout)
+                    events = []
+
+                for key, _ in events:
+                    probe, port = key.data
+                    first_packet = not probe.answered
+                    self.read_probe(probe, port)
+                    if first_packet and probe.answered:
+                        self.hits += 1
+
+                    # Adaptive Logic: any hit opens its /24 and raises its neighbours
+                    if first_packet and probe.answered and smart is not None:
+                        opened, added = smart.hit(ip_to_int(probe.ip))
+                        self.total_estimated += added
+                        if opened:
+                            subnet_base = probe.ip.rsplit('.', 1)[0]
+                            self.status(f"🔥 Found subnet {subnet_base}.x! Expanding...")
+
+                # 4. Retire groups with complete PSI or that ran out of time
+                now = time.monotonic()
+                for probe in list(inflight.values()):
+                    if not probe.done and now < probe.deadline:
+                        continue
+
+                    del inflight[probe.ip]
+                    for sock in probe.socks.values():
+                        selector.unregister(sock)
+                    self.close_probe(probe)
+                    self.processed += 1
+                    self.record(probe)
+
+                    # One entry per service: an MPTS yields several channels
+                    if probe.answered:
+                        for channel in probe.channels():
+                            self.found_count += 1
+                            self.on_channel(channel)
+
+                # 5. Coalesced progress, however many groups were retired
+                if now >= next_tick:
+                    self.publish()
+                    next_tick = now + self.tick_interval
+        finally:
+            for probe in inflight.values():
+                self.close_probe(probe)
+            inflight.clear()
+            selector.close()
+            self.stop_profile(profiler)
+
+        self.publish()
+        return self.found_count
+
+    def start_profile(self):
+        if not self.profile:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Only one profiler may be active at a time (e.g. two interfaces' engines)
+            self.status(f"Profiling disabled: {e}")
+            return None
+        return profiler
+
+    def stop_profile(self, profiler):
+        if profiler is None:
+            return
+        profiler.disable()
+        try:
+            profiler.dump_stats(self.profile)
+        except OSError as e:
+            self.status(f"Could not write profile: {e}")
+
+    def record(self, probe):
+        """Adds a retired probe to the metrics."""
+        metrics = self.metrics
+        metrics.count("probes")
+        if not probe.answered:
+            metrics.count("timeouts")
+            return
+        metrics.count("hits")
+        metrics.count("complete" if probe.done else "hunt_timeouts")
+        metrics.observe("first_packet", probe.first_packet - probe.joined)
+        metrics.observe("hunt", time.perf_counter() - probe.first_packet)
+        metrics.observe("parse", probe.parse_time)
+
+    def open_probe(self, ip):
+        """
+        Joins a group with one non-blocking socket per port. The kernel keeps
+        a single membership per group and interface however many sockets
+        join it. Returns None if no port could be joined.
+        """
+        started = time.perf_counter()
+        mreq = membership_request(ip, self.interface)
+        socks = {}
+        for port in self.ports:
+            try:
+                socks[port], _ = join_group(ip, port, self.interface, mreq)
+            except OSError:
+                continue
+
+        if not socks:
+            self.metrics.count("join_failures")
+            return None
+        self.metrics.observe("join", time.perf_counter() - started)
+        self.pacer.joined(time.monotonic())
+
+        interface = self.interface.name if self.interface is not None else ""
+        return _Probe(ip, socks, mreq, time.monotonic() + self.probe_timeout, interface)
+
+    def read_probe(self, probe, port):
+        """Drains whatever is queued on one of a probe's sockets into its section assembler."""
+        sock = probe.socks[port]
+        datagrams = received = 0
+        try:
+            # Cap the reads per wakeup so one busy group cannot starve the others
+            for _ in range(16):
+                try:
+                    chunk = self.ring.recv(sock)
+                except (BlockingIOError, InterruptedError):
+                    return
+                except OSError:
+                    probe.deadline = 0
+                    return
+                datagrams += 1
+                received += len(chunk)
+
+                # --- PHASE 1: FAST CHECK ---
+                # First datagram: the group is live, give it the deep scan budget
+                if not probe.answered:
+                    probe.answered = True
+                    probe.first_packet = time.perf_counter()
+                    probe.deadline = time.monotonic() + self.hunt_timeout
+
+                # --- PHASE 2: DEEP SCAN ---
+                psi = probe.psi.get(port)
+                if psi is None:
+                    psi = probe.psi[port] = PSIDemux()
+                # CPU time of this thread: engines share the GIL in multi-interface scans
+                started = time.thread_time()
+                psi.feed(chunk)
+                probe.parse_time += time.thread_time() - started
+                if psi.complete:
+                    return
+        finally:
+            # Once per wakeup rather than per datagram
+            self.metrics.count("datagrams", datagrams)
+            self.metrics.count("bytes", received)
+
+    def close_probe(self, probe):
+        # Left as soon as the probe retires, so the membership tables stay small
+        for sock in probe.socks.values():
+            leave_group(sock, probe.mreq)
+        self.pacer.left()
+
+    def check_ip(self, ip):
+        """Probes a single group synchronously. Returns True if it is live."""
+        while not self.pacer.ready(time.monotonic()):
+            if not self.is_running:
+                return False
+            time.sleep(min(0.1, self.pacer.delay(time.monotonic()) or 0.1))
+        probe = self.open_probe(ip)
+        if probe is None:
+            self.metrics.count("probes")
+            return False
+
+        selector = selectors.DefaultSelector()
+        for port, sock in probe.socks.items():
+            selector.register(sock, selectors.EVENT_READ, port)
+        try:
+            while self.is_running and not probe.done:
+                timeout = probe.deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                # Short waits so we stop immediately if button pressed
+                for key, _ in selector.select(min(0.1, timeout)):
+                    self.read_probe(probe, key.data)
+        finally:
+            selector.close()
+            self.close_probe(probe)
+            self.record(probe)
+
+        if probe.answered and self.is_running:
+            for channel in probe.channels():
+                self.on_channel(channel)
+            return True
+        return False
+
+    def stop(self):
+        """Sets the flag to stop the scan; safe to call from any thread."""
+        self.is_running = False
@@ -0,0 +1,186 @@
+# core/epg.py
+"""
+Background programme guide collection.
+
+EPGHarvester visits the streams of the listed channels a window at a time
+and listens to each one's EIT until it has nothing new to say:
+  - no data within `probe_timeout`: the stream is down, move on
+  - no EIT within `eit_timeout`: the stream carries no guide
+  - otherwise until no new or changed section arrived for `settle`
+    seconds, and never longer than `dwell`
+Events are written to the EPGStore in batches, so the database sees one
+transaction every BATCH_SECONDS or BATCH_EVENTS events at most.
+"""
+import selectors
+import sqlite3
+import time
+from collections import deque
+
+from core.eit import EITDemux
+from core.epg_store import EPGStore
+from core.interfaces import join_group, leave_group, list_interfaces
+from core.monitor import stream_key
+from core.ringbuf import RecvRing
+
+BATCH_EVENTS = 500
+BATCH_SECONDS = 2.0
+
+
+class _Visit:
+    """One stream that is joined while its EIT is read."""
+    __slots__ = ("sock", "mreq", "services", "demux", "opened", "last_data", "last_section")
+
+    def __init__(self, sock, mreq, services, opened):
+        self.sock = sock
+        self.mreq = mreq
+        self.services = services  # service_id -> Channel.key
+        self.demux = EITDemux()
+        self.opened = opened
+        self.last_data = None
+        self.last_section = None
+
+
+class EPGHarvester:
+    """
+    Collects the guide of every channel in `channels` into the EPGStore at
+    `store_path`. With `repeat_after` set, another pass starts that many
+    seconds after the last one ended; otherwise run() returns after one pass.
+
+    Results are reported through plain callbacks:
+      on_batch(int)   - number of events just written
+      on_status(str)
+    """
+
+    def __init__(self, channels, store_path=None, window=16, dwell=15.0, settle=6.0,
+                 probe_timeout=1.0, eit_timeout=3.0, repeat_after=None,
+                 on_batch=None, on_status=None):
+        self.store_path = store_path
+        self.window = max(1, window)
+        self.dwell = dwell
+        self.settle = settle
+        self.probe_timeout = probe_timeout
+        self.eit_timeout = eit_timeout
+        self.repeat_after = repeat_after
+        self.is_running = True
+
+        # Only services with an id can be matched to EIT sections
+        self.streams = {}  # stream_key -> {service_id: Channel.key}
+        for channel in channels:
+            if channel.service_id is not None:
+                self.streams.setdefault(stream_key(channel), {})[channel.service_id] = channel.key
+
+        self.on_batch = on_batch or (lambda count: None)
+        self.on_status = on_status or (lambda message: None)
+
+        self.interfaces = {interface.name: interface for interface in list_interfaces()}
+        self.ring = RecvRing()
+        self.batch = []  # (Channel.key, event) waiting to be written
+        self.last_flush = time.monotonic()
+        self.events_written = 0
+
+    def run(self):
+        store = EPGStore(self.store_path)
+        try:
+            store.open()
+        except (OSError, sqlite3.Error) as e:
+            self.on_status(f"Could not open the programme guide: {e}")
+            return
+
+        selector = selectors.DefaultSelector()
+        try:
+            while self.is_running:
+                self.harvest(store, selector)
+                if self.repeat_after is None:
+                    break
+                resume = time.monotonic() + self.repeat_after
+                while self.is_running and time.monotonic() < resume:
+                    time.sleep(0.1)
+        finally:
+            selector.close()
+            store.close()
+
+    def harvest(self, store, selector):
+        """One pass over every stream."""
+        self.on_status(f"Collecting programme guide from {len(self.streams)} streams")
+        queue = deque(self.streams.items())
+        visits = []
+        with_guide = 0
+        written = self.events_written
+        try:
+            while self.is_running and (queue or visits):
+                while queue and len(visits) < self.window:
+                    visit = self.open_visit(*queue.popleft())
+                    if visit is not None:
+                        selector.register(visit.sock, selectors.EVENT_READ, visit)
+                        visits.append(visit)
+                if not visits:
+                    continue
+
+                for key, _ in selector.select(0.1):
+                    self.read(key.data, time.monotonic())
+
+                now = time.monotonic()
+                for visit in [v for v in visits if self.finished(v, now)]:
+                    with_guide += visit.last_section is not None
+                    visits.remove(visit)
+                    selector.unregister(visit.sock)
+                    leave_group(visit.sock, visit.mreq)
+
+                if self.batch and (len(self.batch) >= BATCH_EVENTS
+                                   or now - self.last_flush >= BATCH_SECONDS):
+                    self.flush(store)
+        finally:
+            for visit in visits:
+                selector.unregister(visit.sock)
+                leave_group(visit.sock, visit.mreq)
+            self.flush(store)
+
+        self.on_status(f"Programme guide: {self.events_written - written} events "
+                       f"from {with_guide} of {len(self.streams)} streams")
+
+    def open_visit(self, key, services):
+        name, ip, port = key
+        try:
+            sock, mreq = join_group(ip, port, self.interfaces.get(name) if name else None)
+        except OSError:
+            return None
+        return _Visit(sock, mreq, services, time.monotonic())
+
+    def finished(self, visit, now):
+        if now - visit.opened >= self.dwell:
+            return True
+        if visit.last_data is None:
+            return now - visit.opened >= self.probe_timeout
+        if visit.last_section is None:
+            return now - visit.opened >= self.eit_timeout
+        return now - visit.last_section >= self.settle
+
+    def read(self, visit, now):
+        for _ in range(64):
+            try:
+                data = self.ring.recv(visit.sock)
+            except (BlockingIOError, InterruptedError):
+                return
+            visit.last_data = now
+            for service_id, events in visit.demux.feed(data):
+                visit.last_section = now
+                key = visit.services.get(service_id)
+                if key is not None:
+                    self.batch.extend((key, event) for event in events)
+
+    def flush(self, store):
+        self.last_flush = time.monotonic()
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        try:
+            store.put_events(batch)
+        except sqlite3.Error as e:
+            self.on_status(f"Could not write the programme guide: {e}")
+            return
+        self.events_written += len(batch)
+        self.on_batch(len(batch))
+
+    def stop(self):
+        """Sets the flag to stop collecting; safe to call from any thread."""
+        self.is_running = False
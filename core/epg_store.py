@@ -0,0 +1,116 @@
+# core/epg_store.py
+"""
+Indexed on-disk programme guide.
+
+Events are kept in SQLite, keyed by service (Channel.key: interface, ip,
+port, service_id), start time and event id. The key doubles as the index
+that now/next lookups seek on, so showing the guide for thousands of
+channels is two index probes per channel and never touches a stream.
+Writes come in batches, one transaction each.
+"""
+import os
+import sqlite3
+import time
+
+from core.channel_store import default_store_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    interface TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    service_id INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    event_id INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    text TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (interface, ip, port, service_id, start, event_id)
+) WITHOUT ROWID;
+"""
+
+SERVICE = "interface = ? AND ip = ? AND port = ? AND service_id = ?"
+COLUMNS = "event_id, start, duration, name, text"
+
+# Events that ended longer ago than this are dropped when the store is opened
+KEEP_PAST = 6 * 3600
+
+
+def default_epg_path():
+    """Next to the channel cache, e.g. ~/.config/CableCompany/epg.sqlite."""
+    return os.path.join(os.path.dirname(default_store_path()), "epg.sqlite")
+
+
+def _event(row):
+    return dict(zip(("event_id", "start", "duration", "name", "text"), row))
+
+
+class EPGStore:
+    """
+    One connection to the guide database. SQLite connections belong to the
+    thread that opened them, so a writer thread opens its own store.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_epg_path()
+        self.db = None
+
+    def open(self):
+        """Opens (creating if needed) the database. Raises OSError or sqlite3.Error."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=5.0)
+        # Readers keep working while a batch is written
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        with self.db:
+            self.db.execute("DELETE FROM events WHERE start + duration < ?", (time.time() - KEEP_PAST,))
+        return self
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def put_events(self, batch):
+        """
+        Writes [(Channel.key, event), ...] in one transaction. Events on the
+        same service that start during a new event are replaced by it, which
+        also clears out programmes that were rescheduled.
+        """
+        now = time.time()
+        with self.db:
+            for key, event in batch:
+                start = event["start"]
+                self.db.execute(f"DELETE FROM events WHERE {SERVICE} AND start >= ? AND start < ?",
+                                (*key, start, start + max(1, event["duration"])))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*key, event["start"], event["event_id"], event["duration"],
+                  event["name"], event["text"], now) for key, event in batch])
+
+    def now_next(self, keys, now=None):
+        """{Channel.key: (current event or None, next event or None)} for services with a guide."""
+        now = time.time() if now is None else now
+        guide = {}
+        for key in keys:
+            if key[3] is None:
+                continue  # No service id, no EIT
+            row = self.db.execute(f"SELECT {COLUMNS} FROM events WHERE {SERVICE} AND start <= ? "
+                                  "ORDER BY start DESC LIMIT 1", (*key, now)).fetchone()
+            current = _event(row) if row and row[1] + row[2] > now else None
+            row = self.db.execute(f"SELECT {COLUMNS} FROM events WHERE {SERVICE} AND start > ? "
+                                  "ORDER BY start LIMIT 1", (*key, now)).fetchone()
+            following = _event(row) if row else None
+            if current or following:
+                guide[key] = (current, following)
+        return guide
+
+    def schedule(self, key, start, end):
+        """Events of one service starting in [start, end), in order."""
+        rows = self.db.execute(f"SELECT {COLUMNS} FROM events WHERE {SERVICE} AND start >= ? AND start < ? "
+                               "ORDER BY start", (*key, start, end))
+        return [_event(row) for row in rows]
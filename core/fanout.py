@@ -0,0 +1,227 @@
+# core/fanout.py
+"""
+Multicast to HTTP fan-out.
+
+Each group is joined once, however many clients watch it, and its TS goes
+out to every client as a chunked HTTP response. Every client reads from a
+bounded queue: one that cannot keep up is disconnected instead of holding
+up the others or piling up memory. Clients arriving on a running stream
+start with the buffered PAT/PMT and GOP, as with the zap relay.
+
+    GET /playlist.m3u               every channel, pointing back at this server
+    GET /<iface or ->/<ip>/<port>[?program=N]
+                                    a stream; only groups in the lineup are joined, and
+                                    the burst starts at a keyframe of program N
+
+The event loop needs add_reader(), i.e. a selector loop (not the Windows
+proactor loop).
+"""
+import asyncio
+from http import HTTPStatus
+
+from core.channel import m3u_entry
+from core.interfaces import join_group, leave_group, list_interfaces
+from core.ringbuf import SLOT_SIZE
+from core.zap import GopBuffer, program_from_query, program_path, stream_path
+
+# Datagrams queued per client (~350 KB at 7 packets each) before it is dropped
+CLIENT_QUEUE = 256
+# A client that fell a little behind gets up to this many datagrams per chunk
+MAX_CHUNK_DATAGRAMS = 64
+REQUEST_TIMEOUT = 10.0
+
+
+def _chunk(data):
+    return b"%X\r\n%s\r\n" % (len(data), data)
+
+
+class _Client:
+    __slots__ = ("queue", "writer", "dropped")
+
+    def __init__(self, writer, size):
+        self.queue = asyncio.Queue(size)
+        self.writer = writer
+        self.dropped = False
+
+
+class _Group:
+    __slots__ = ("path", "channel", "sock", "mreq", "buffer", "clients")
+
+    def __init__(self, path, channel, sock, mreq, buffer):
+        self.path = path
+        self.channel = channel
+        self.sock = sock
+        self.mreq = mreq
+        self.buffer = buffer
+        self.clients = []
+
+
+class FanoutServer:
+    """
+    Serves `channels` (scan results or the channel store) to any number of
+    HTTP clients. serve() runs until stop() is called from the event loop.
+    """
+
+    def __init__(self, channels, host="0.0.0.0", port=8080, queue_size=CLIENT_QUEUE, on_status=None):
+        self.channels = list(channels)
+        self.lineup = {}  # stream path -> [Channel] carried on that stream
+        for channel in self.channels:
+            self.lineup.setdefault(stream_path(channel), []).append(channel)
+
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.on_status = on_status or (lambda message: None)
+
+        self.groups = {}  # stream path -> _Group, while somebody watches it
+        self.interfaces = {interface.name: interface for interface in list_interfaces()}
+        self.stopped = None
+
+    async def serve(self):
+        self.stopped = asyncio.Event()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        self.on_status(f"Serving {len(self.lineup)} streams, playlist at "
+                       f"http://{self.host}:{self.port}/playlist.m3u")
+        try:
+            await self.stopped.wait()
+        finally:
+            server.close()
+            for group in list(self.groups.values()):
+                for client in group.clients:
+                    self.drop(client)
+                self.close_group(group)
+
+    def stop(self):
+        self.stopped.set()
+
+    async def handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT)
+            method, target = request.decode("latin-1").split("\r\n")[0].split()[:2]
+            path, _, query = target.partition("?")
+            program = program_from_query(query)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            writer.close()
+            return
+
+        try:
+            if method != "GET":
+                await self.respond(writer, HTTPStatus.METHOD_NOT_ALLOWED)
+            elif path in ("/", "/playlist.m3u"):
+                await self.send_playlist(writer)
+            elif path in self.lineup:
+                await self.stream(writer, path, program)
+            else:
+                await self.respond(writer, HTTPStatus.NOT_FOUND)
+        except ConnectionError:
+            pass  # Client went away or was dropped
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, content_type="text/plain", body=None):
+        if body is None:
+            body = f"{status.phrase}\n".encode()
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     "Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def send_playlist(self, writer):
+        # Point the entries at the address we are bound to, never at what the
+        # client claims in its Host header. Bound to every address, that is
+        # the local address this connection arrived on.
+        host = self.host
+        if host in ("", "0.0.0.0", "::"):
+            host = writer.get_extra_info("sockname")[0]
+        if ":" in host:
+            host = f"[{host}]"
+        host = f"{host}:{self.port}"
+        entries = [m3u_entry(channel, f"http://{host}{program_path(channel)}") for channel in self.channels]
+        body = "\n".join(["#EXTM3U"] + entries) + "\n"
+        await self.respond(writer, HTTPStatus.OK, "audio/x-mpegurl", body.encode("utf-8"))
+
+    async def stream(self, writer, path, program=None):
+        group = self.groups.get(path) or self.open_group(path)
+        if group is None:
+            await self.respond(writer, HTTPStatus.SERVICE_UNAVAILABLE)
+            return
+
+        client = _Client(writer, self.queue_size)
+        burst = group.buffer.burst(program)
+        group.clients.append(client)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: video/mp2t\r\n"
+                         b"Cache-Control: no-cache\r\n"
+                         b"Transfer-Encoding: chunked\r\n"
+                         b"Connection: close\r\n\r\n")
+            if burst:
+                writer.write(_chunk(burst))
+            await writer.drain()
+
+            while True:
+                chunks = [await client.queue.get()]
+                # Write whatever piled up in one go
+                while len(chunks) < MAX_CHUNK_DATAGRAMS and not client.queue.empty():
+                    chunks.append(client.queue.get_nowait())
+                if client.dropped:
+                    break
+                writer.write(_chunk(b"".join(chunks)))
+                await writer.drain()
+        finally:
+            group.clients.remove(client)
+            if not group.clients:
+                self.close_group(group)
+
+    def open_group(self, path):
+        channels = self.lineup[path]
+        channel = channels[0]
+        interface = self.interfaces.get(channel.interface) if channel.interface else None
+        try:
+            sock, mreq = join_group(channel.ip, channel.port, interface)
+        except OSError as e:
+            self.on_status(f"Could not join {channel.ip}:{channel.port}: {e}")
+            return None
+
+        group = self.groups[path] = _Group(path, channel, sock, mreq, GopBuffer(channels))
+        asyncio.get_running_loop().add_reader(sock.fileno(), self.read_group, group)
+        self.on_status(f"Joined {channel.ip}:{channel.port}")
+        return group
+
+    def close_group(self, group):
+        if self.groups.get(group.path) is not group:
+            return
+        del self.groups[group.path]
+        asyncio.get_running_loop().remove_reader(group.sock.fileno())
+        leave_group(group.sock, group.mreq)
+        self.on_status(f"Left {group.channel.ip}:{group.channel.port}")
+
+    def read_group(self, group):
+        # Datagrams are shared by the GOP buffer and every queue, so each is its own bytes
+        for _ in range(64):
+            try:
+                data = group.sock.recv(SLOT_SIZE)
+            except OSError:
+                return  # Drained (BlockingIOError) or the socket went away
+
+            group.buffer.feed(data)
+            for client in group.clients:
+                if client.dropped:
+                    continue
+                try:
+                    client.queue.put_nowait(data)
+                except asyncio.QueueFull:
+                    self.drop(client)
+                    self.on_status(f"Dropped a slow client of {group.channel.ip}:{group.channel.port}")
+
+    def drop(self, client):
+        """Disconnects a client; its stream() notices and cleans up."""
+        client.dropped = True
+        client.writer.transport.abort()
+        try:
+            client.queue.put_nowait(None)  # Wakes it if it is waiting for data
+        except asyncio.QueueFull:
+            pass  # Then it is blocked writing, which fails now
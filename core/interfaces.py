@@ -0,0 +1,150 @@
+# core/interfaces.py
+"""
+Local IPv4 interfaces and per-interface multicast joins.
+
+By default a group is joined with INADDR_ANY and the kernel picks the
+interface from the routing table. Probe servers with one VLAN per lineup
+need to join on a specific interface instead, and to receive only what
+arrived on it.
+"""
+import socket
+import struct
+import sys
+from dataclasses import dataclass
+
+# Linux ioctls for reading an interface's flags and address
+SIOCGIFFLAGS = 0x8913
+SIOCGIFADDR = 0x8915
+IFF_UP = 0x1
+IFF_LOOPBACK = 0x8
+
+# Not exported by the socket module. When set to 0 a socket only receives
+# the groups joined on *that* socket, on the interface they were joined on.
+IP_MULTICAST_ALL = getattr(socket, "IP_MULTICAST_ALL", 49)
+
+
+@dataclass
+class Interface:
+    name: str
+    address: str
+    index: int = 0  # 0 when the OS gives us no index (ip_mreq instead of ip_mreqn)
+    loopback: bool = False
+
+    def __str__(self):
+        return f"{self.name} ({self.address})"
+
+
+def _linux_interfaces():
+    import fcntl
+
+    interfaces = []
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for index, name in socket.if_nameindex():
+            request = struct.pack("256s", name.encode()[:15])
+            try:
+                flags = struct.unpack("H", fcntl.ioctl(sock.fileno(), SIOCGIFFLAGS, request)[16:18])[0]
+                address = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, request)[20:24])
+            except OSError:
+                continue  # No IPv4 address
+            if not flags & IFF_UP:
+                continue
+            interfaces.append(Interface(name, address, index, bool(flags & IFF_LOOPBACK)))
+    finally:
+        sock.close()
+    return interfaces
+
+
+def _hostname_interfaces():
+    # Portable fallback: addresses only, named after themselves
+    try:
+        infos = socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)
+    except OSError:
+        return []
+    addresses = sorted({info[4][0] for info in infos})
+    return [Interface(address, address, loopback=address.startswith("127.")) for address in addresses]
+
+
+def list_interfaces():
+    """Up IPv4 interfaces, loopback last."""
+    interfaces = _linux_interfaces() if sys.platform.startswith("linux") else _hostname_interfaces()
+    return sorted(interfaces, key=lambda i: (i.loopback, i.name))
+
+
+def find_interface(spec, interfaces=None):
+    """Looks an interface up by name, address or index. Returns None if there is no match."""
+    for interface in interfaces if interfaces is not None else list_interfaces():
+        if spec in (interface.name, interface.address, str(interface.index)):
+            return interface
+    return None
+
+
+def membership_request(group, interface=None):
+    """
+    The IP_ADD_MEMBERSHIP argument for `group` (dotted quad): ip_mreqn with
+    the interface index where we have one, ip_mreq with its address otherwise.
+    """
+    group = socket.inet_aton(group)
+    if interface is None:
+        return struct.pack('4sL', group, socket.INADDR_ANY)
+    local = socket.inet_aton(interface.address)
+    if interface.index and sys.platform.startswith("linux"):
+        return struct.pack('4s4si', group, local, interface.index)
+    return group + local
+
+
+def bind_to_interface(sock, interface):
+    """Pins a multicast socket to one interface for both directions."""
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface.address))
+    if sys.platform.startswith("linux"):
+        # Same group on two VLANs: without this each socket would see both
+        sock.setsockopt(socket.IPPROTO_IP, IP_MULTICAST_ALL, 0)
+
+
+def join_group(ip, port, interface=None, mreq=None):
+    """
+    Opens a non-blocking UDP socket bound to (ip, port) and joined to the
+    group, on `interface` if given. Returns (sock, mreq); raises OSError.
+    """
+    if mreq is None:
+        mreq = membership_request(ip, interface)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        # Binding to the group filters out other groups on the same port;
+        # Windows only allows binding to a local address
+        try:
+            sock.bind((ip, port))
+        except OSError:
+            sock.bind(('', port))
+
+        if interface is not None:
+            bind_to_interface(sock, interface)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock, mreq
+
+
+def leave_group(sock, mreq):
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_DROP_MEMBERSHIP, mreq)
+    except OSError:
+        pass
+    sock.close()
+
+
+# Linux caps how many groups one socket may join (net.ipv4.igmp_max_memberships)
+DEFAULT_MAX_MEMBERSHIPS = 20
+
+
+def max_memberships():
+    """Groups a single socket can join on this host."""
+    try:
+        with open("/proc/sys/net/ipv4/igmp_max_memberships") as f:
+            return max(1, int(f.read()))
+    except (OSError, ValueError):
+        return DEFAULT_MAX_MEMBERSHIPS
@@ -0,0 +1,136 @@
+# core/latency.py
+"""
+Click-to-picture timing for channel changes.
+
+A ZapMeasurement starts when a channel is clicked and records, once each,
+how long it took to reach every stage of playback. Stages come from libvlc
+events:
+  opening      - MediaPlayerOpening: the input is being opened / joined
+  first_packet - first MediaPlayerBuffering: data is arriving
+  playing      - MediaPlayerPlaying: the input is running
+  buffered     - MediaPlayerBuffering at 100%: network-caching is filled
+  first_frame  - MediaPlayerVout: the first picture was decoded
+  displayed    - first MediaPlayerTimeChanged after that: pictures are shown
+A zap to a pre-rolled player is displayed as soon as its page is switched,
+so those are reported as a series of their own instead of pulling the
+percentiles of real joins down towards zero.
+
+LatencyStats keeps a rolling window of measurements for percentiles, a text
+histogram and a JSON lines dump, so buffering options can be tuned from
+data and regressions spotted.
+"""
+import json
+import time
+from collections import deque
+
+STAGES = ("opening", "first_packet", "playing", "buffered", "first_frame", "displayed")
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open
+BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000)
+
+# Series in the report: zaps that joined and buffered, and pre-rolled ones
+SERIES = (("Joined (direct and relay)", ("direct", "relay")), ("Pre-rolled (warm)", ("warm",)))
+
+
+class ZapMeasurement:
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source  # "direct", "relay" or "warm"
+        self.started = time.monotonic()
+        self.wall_time = time.time()
+        self.stages = {}  # stage -> seconds since the click
+
+    def mark(self, stage, at=None):
+        """
+        Records `stage` the first time it is reached, at monotonic time `at`
+        (default: now). Returns True if it was new.
+        """
+        if stage in self.stages:
+            return False
+        self.stages[stage] = (at if at is not None else time.monotonic()) - self.started
+        return True
+
+    @property
+    def complete(self):
+        return "displayed" in self.stages
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "source": self.source,
+            "time": self.wall_time,
+            "stages_ms": {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()},
+        }
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LatencyStats:
+    """Rolling window of the last `window` zaps."""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def add(self, measurement):
+        if measurement.stages:
+            self.samples.append(measurement)
+
+    def values(self, stage, source=None):
+        """Milliseconds to `stage` over the window, optionally for one source (or a tuple of them) only."""
+        sources = (source,) if isinstance(source, str) else source
+        return [m.stages[stage] * 1000 for m in self.samples
+                if stage in m.stages and (sources is None or m.source in sources)]
+
+    def percentiles(self, stage, source=None):
+        values = self.values(stage, source)
+        if not values:
+            return None
+        return {"count": len(values), "p50": _percentile(values, 0.5),
+                "p90": _percentile(values, 0.9), "p99": _percentile(values, 0.99)}
+
+    def histogram(self, stage, source=None):
+        """Counts per BUCKETS_MS bucket, plus one for everything slower."""
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for value in self.values(stage, source):
+            for i, bound in enumerate(BUCKETS_MS):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return counts
+
+    def report(self):
+        """Plain text summary: percentiles per stage and series, and a histogram of time to picture."""
+        lines = [f"Last {len(self.samples)} channel changes"]
+        for title, sources in SERIES:
+            rows = [(stage, self.percentiles(stage, sources)) for stage in STAGES]
+            rows = [(stage, p) for stage, p in rows if p]
+            if not rows:
+                continue
+            lines += ["", title, f"{'stage':<14}{'count':>6}{'p50':>9}{'p90':>9}{'p99':>9}   (ms)"]
+            for stage, p in rows:
+                lines.append(f"{stage:<14}{p['count']:>6}{p['p50']:>9.0f}{p['p90']:>9.0f}{p['p99']:>9.0f}")
+
+        for source in ("direct", "relay", "warm"):
+            counts = self.histogram("displayed", source)
+            total = sum(counts)
+            if not total:
+                continue
+            lines += ["", f"Click to picture, {source} ({total} zaps)"]
+            lower = 0
+            for bound, count in zip(BUCKETS_MS + (None,), counts):
+                label = f"{lower}-{bound} ms" if bound else f">{lower} ms"
+                bar = "#" * max(1 if count else 0, round(40 * count / total))
+                lines.append(f"{label:>14} {count:>5} {bar}")
+                lower = bound
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Writes every measurement in the window as one JSON object per line."""
+        with open(path, "w", encoding="utf-8") as f:
+            for measurement in self.samples:
+                f.write(json.dumps(measurement.to_dict()) + "\n")
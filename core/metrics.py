@@ -0,0 +1,144 @@
+# core/metrics.py
+"""
+Where scan time goes.
+
+ScanMetrics is filled in by the ProbeEngine as it works: counters for
+probes, hits, timeouts and bytes, and fixed-bucket histograms for
+
+  join         - seconds spent in the join syscalls of one probe
+  first_packet - join to the first datagram, for groups that answered
+  hunt         - first datagram to complete PSI (or to the hunt timeout)
+  parse        - CPU seconds spent in PSIDemux.feed per answered probe
+
+Recording a value is a bisect and two additions, so it stays on in every
+scan. snapshot() returns plain dicts that pickle across processes and
+merge with merge_metrics(); prometheus_text() renders one in the
+Prometheus text exposition format. The first_packet and hunt
+distributions are what the probe and hunt timeouts should be tuned from.
+"""
+from bisect import bisect_left
+
+# Bucket upper bounds in seconds (1-2.5-5 steps); the last bucket is open
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HISTOGRAMS = ("join", "first_packet", "hunt", "parse")
+COUNTERS = (
+    "probes",         # Groups retired
+    "join_failures",  # Groups no port could be joined on
+    "hits",           # Groups that answered
+    "timeouts",       # Groups silent for the whole probe timeout
+    "complete",       # Answered with complete PSI
+    "hunt_timeouts",  # Answered, but the PSI was not complete in time
+    "datagrams",
+    "bytes",
+)
+
+HELP = {
+    "join": "Seconds spent joining one group on every probed port",
+    "first_packet": "Seconds from the join to the first datagram",
+    "hunt": "Seconds from the first datagram to complete PSI or the hunt timeout",
+    "parse": "CPU seconds spent parsing PSI per answered group",
+    "probes": "Groups probed",
+    "join_failures": "Groups that could not be joined",
+    "hits": "Groups that answered",
+    "timeouts": "Groups that stayed silent for the probe timeout",
+    "complete": "Groups whose PSI was complete",
+    "hunt_timeouts": "Groups whose PSI was not complete within the hunt timeout",
+    "datagrams": "Datagrams received",
+    "bytes": "Bytes received",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+
+class ScanMetrics:
+    def __init__(self):
+        self.histograms = {name: Histogram() for name in HISTOGRAMS}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def observe(self, name, seconds):
+        self.histograms[name].observe(seconds)
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def snapshot(self):
+        return {
+            "counters": dict(self.counters),
+            "histograms": {name: {"counts": list(h.counts), "sum": h.sum}
+                           for name, h in self.histograms.items()},
+        }
+
+
+def merge_metrics(snapshots):
+    """Adds up ScanMetrics snapshots from several engines."""
+    merged = ScanMetrics().snapshot()
+    for snapshot in snapshots:
+        for name, value in snapshot["counters"].items():
+            merged["counters"][name] += value
+        for name, histogram in snapshot["histograms"].items():
+            into = merged["histograms"][name]
+            into["counts"] = [a + b for a, b in zip(into["counts"], histogram["counts"])]
+            into["sum"] += histogram["sum"]
+    return merged
+
+
+def quantile(histogram, q):
+    """
+    Estimated q-quantile (0..1) of a snapshot histogram: the upper bound of
+    the bucket it falls in. None when empty; inf in the open bucket.
+    """
+    total = sum(histogram["counts"])
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bound, count in zip(BUCKETS + (float("inf"),), histogram["counts"]):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float("inf")
+
+
+def summary(snapshot):
+    """One line per histogram with count, mean and p50/p90/p99, for humans."""
+    lines = []
+    for name, histogram in snapshot["histograms"].items():
+        count = sum(histogram["counts"])
+        if not count:
+            continue
+        p50, p90, p99 = (quantile(histogram, q) * 1000 for q in (0.5, 0.9, 0.99))
+        lines.append(f"{name}: {count} × mean {histogram['sum'] / count * 1000:.2f} ms, "
+                     f"p50 ≤{p50:g} ms, p90 ≤{p90:g} ms, p99 ≤{p99:g} ms")
+    counters = snapshot["counters"]
+    lines.append(", ".join(f"{counters[name]} {name}" for name in COUNTERS))
+    return lines
+
+
+def prometheus_text(snapshot, prefix="cablecompany_scan"):
+    """Renders a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name, value in snapshot["counters"].items():
+        metric = f"{prefix}_{name}_total"
+        lines += [f"# HELP {metric} {HELP[name]}", f"# TYPE {metric} counter", f"{metric} {value}"]
+
+    for name, histogram in snapshot["histograms"].items():
+        metric = f"{prefix}_{name}_seconds"
+        lines += [f"# HELP {metric} {HELP[name]}", f"# TYPE {metric} histogram"]
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), histogram["counts"]):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{metric}_sum {histogram['sum']}", f"{metric}_count {cumulative}"]
+    return "\n".join(lines) + "\n"
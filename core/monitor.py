@@ -0,0 +1,288 @@
+# core/monitor.py
+"""
+Continuous health monitoring of discovered channels.
+
+Groups are joined in bulk: every socket is bound to ('', port) and joins
+as many groups as the kernel allows per socket, and datagrams are told
+apart by their destination address from IP_PKTINFO. Watching 500 groups
+takes ~25 sockets instead of 500.
+
+Per stream we only look at packet headers of one PID (the PCR PID), so the
+cost per datagram is a handful of byte lookups:
+  bitrate     - bytes received over the last tick
+  cc_errors   - continuity counter gaps on that PID
+  pcr_jitter  - smoothed deviation of PCR spacing from arrival spacing (ms)
+  last_seen   - seconds since the last datagram; past `down_after` the
+                stream is reported down
+"""
+import selectors
+import socket
+import sys
+import time
+
+from core.interfaces import IP_MULTICAST_ALL, list_interfaces, max_memberships, membership_request
+from core.ringbuf import RecvRing
+from core.ts import TS_PACKET_SIZE, iter_packets, packet_offsets, pcr_delta, read_pcr
+
+# Linux value; the socket module does not export it everywhere
+IP_PKTINFO = getattr(socket, "IP_PKTINFO", 8)
+# struct in_pktinfo { int ipi_ifindex; in_addr ipi_spec_dst; in_addr ipi_addr; }
+PKTINFO_SIZE = 12
+NULL_PID = 0x1FFF
+
+
+def stream_key(channel):
+    """Channels sharing a group and port are one stream to the monitor."""
+    return (channel.interface, channel.ip, channel.port)
+
+
+def _pktinfo_supported():
+    return sys.platform.startswith("linux") and hasattr(socket.socket, "recvmsg_into")
+
+
+class StreamHealth:
+    """Counters for one (interface, group, port) stream."""
+    __slots__ = ("ip", "port", "interface", "pid", "bytes", "window_bytes", "bitrate",
+                 "last_cc", "cc_errors", "last_pcr", "last_pcr_time", "pcr_jitter",
+                 "last_seen")
+
+    def __init__(self, ip, port, interface="", pid=None):
+        self.ip = ip
+        self.port = port
+        self.interface = interface
+        self.pid = pid  # PID whose headers we check; the PCR PID when known
+        self.bytes = 0
+        self.window_bytes = 0
+        self.bitrate = 0.0  # bits per second over the last tick
+        self.last_cc = None
+        self.cc_errors = 0
+        self.last_pcr = None
+        self.last_pcr_time = None
+        self.pcr_jitter = 0.0  # seconds, smoothed like RFC 3550 interarrival jitter
+        self.last_seen = None
+
+    def feed(self, data, now):
+        self.last_seen = now
+        self.window_bytes += len(data)
+
+        if self.pid is None:
+            # No PMT from the scan: follow the first real PID we see
+            for offset, pid in iter_packets(data):
+                if pid != NULL_PID:
+                    self.pid = pid
+                    break
+            else:
+                return
+
+        pid_hi = self.pid >> 8
+        pid_lo = self.pid & 0xFF
+        for offset in packet_offsets(data, (self.pid,)):
+            if data[offset + 2] != pid_lo or data[offset + 1] & 0x1F != pid_hi:
+                continue
+            b3 = data[offset + 3]
+            adaptation = b3 & 0x20
+            if adaptation and data[offset + 4] >= 7:
+                flags = data[offset + 5]
+                if flags & 0x80:
+                    # Discontinuity indicator: CC and PCR legitimately jump
+                    self.last_cc = None
+                    self.last_pcr = None
+                if flags & 0x10:
+                    self.on_pcr(data, offset + 6, now)
+
+            if b3 & 0x10:
+                cc = b3 & 0x0F
+                last = self.last_cc
+                # A repeated CC is an allowed duplicate, anything else is loss
+                if last is not None and cc != last and cc != (last + 1) & 0x0F:
+                    self.cc_errors += 1
+                self.last_cc = cc
+
+    def on_pcr(self, data, at, now):
+        pcr = read_pcr(data, at)
+
+        if self.last_pcr is not None:
+            stream_delta = pcr_delta(pcr, self.last_pcr)
+            deviation = abs((now - self.last_pcr_time) - stream_delta)
+            # Larger than a second is a splice or restart, not jitter
+            if deviation < 1.0:
+                self.pcr_jitter += (deviation - self.pcr_jitter) / 16
+        self.last_pcr = pcr
+        self.last_pcr_time = now
+
+    def tick(self, interval):
+        self.bytes += self.window_bytes
+        self.bitrate = self.window_bytes * 8 / interval if interval > 0 else 0.0
+        self.window_bytes = 0
+
+    def report(self, now, down_after):
+        age = None if self.last_seen is None else now - self.last_seen
+        return {
+            "up": age is not None and age < down_after,
+            "bitrate": self.bitrate,
+            "bytes": self.bytes,
+            "cc_errors": self.cc_errors,
+            "pcr_jitter_ms": self.pcr_jitter * 1000,
+            "last_seen": age,
+        }
+
+
+class HealthMonitor:
+    """
+    Stays joined to the groups of `channels` and reports their health.
+
+    Results are reported through plain callbacks:
+      on_health(dict)  - {stream_key: report} for every stream, once per tick
+      on_change(key, up) - on the first tick after a stream goes up or down
+      on_status(str)
+    run() blocks until stop() is called.
+    """
+
+    def __init__(self, channels, tick_interval=1.0, down_after=3.0,
+                 on_health=None, on_change=None, on_status=None):
+        self.tick_interval = tick_interval
+        self.down_after = down_after
+        self.is_running = True
+
+        self.streams = {}  # stream_key -> StreamHealth
+        for channel in channels:
+            key = stream_key(channel)
+            if key not in self.streams:
+                self.streams[key] = StreamHealth(channel.ip, channel.port, channel.interface,
+                                                 channel.pcr_pid)
+
+        self.on_health = on_health or (lambda health: None)
+        self.on_change = on_change or (lambda key, up: None)
+        self.on_status = on_status or (lambda message: None)
+
+        self.ring = RecvRing()
+        self.socks = []
+        self.state = {}  # stream_key -> last reported up/down
+
+    def open_sockets(self, selector):
+        """Joins every stream, packing as many groups per socket as the kernel allows."""
+        pktinfo = _pktinfo_supported()
+        per_socket = max_memberships() if pktinfo else 1
+        interfaces = {interface.name: interface for interface in list_interfaces()}
+
+        # Only groups on the same interface and port can share a socket
+        buckets = {}
+        for stream in self.streams.values():
+            buckets.setdefault((stream.interface, stream.port), []).append(stream)
+
+        failed = 0
+        for (name, port), streams in buckets.items():
+            interface = interfaces.get(name) if name else None
+            for i in range(0, len(streams), per_socket):
+                chunk = streams[i:i + per_socket]
+                sock = self.open_socket(port, chunk, interface, pktinfo)
+                if sock is None:
+                    failed += len(chunk)
+                    continue
+                self.socks.append(sock)
+                # With IP_PKTINFO the destination tells the streams apart,
+                # otherwise there is one stream per socket
+                lookup = {s.ip: s for s in chunk} if pktinfo else chunk[0]
+                selector.register(sock, selectors.EVENT_READ, lookup)
+
+        if failed:
+            self.on_status(f"Could not join {failed} groups")
+        return pktinfo
+
+    def open_socket(self, port, streams, interface, pktinfo):
+        sock = None
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if pktinfo:
+                sock.bind(('', port))
+                sock.setsockopt(socket.IPPROTO_IP, IP_PKTINFO, 1)
+                # Only the groups joined on this socket, not every group on the host
+                sock.setsockopt(socket.IPPROTO_IP, IP_MULTICAST_ALL, 0)
+            else:
+                try:
+                    sock.bind((streams[0].ip, port))
+                except OSError:
+                    sock.bind(('', port))
+            for stream in streams:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                membership_request(stream.ip, interface))
+            sock.setblocking(False)
+        except OSError:
+            if sock: sock.close()
+            return None
+        return sock
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        pktinfo = self.open_sockets(selector)
+        self.on_status(f"Watching {len(self.streams)} streams on {len(self.socks)} sockets")
+
+        ancbufsize = socket.CMSG_SPACE(PKTINFO_SIZE) if pktinfo else 0
+        last_tick = time.monotonic()
+        try:
+            while self.is_running:
+                now = time.monotonic()
+                timeout = max(0.0, min(0.1, last_tick + self.tick_interval - now))
+                for key, _ in selector.select(timeout):
+                    now = time.monotonic()
+                    try:
+                        if pktinfo:
+                            self.read_pktinfo(key.fileobj, key.data, ancbufsize, now)
+                        else:
+                            self.read_single(key.fileobj, key.data, now)
+                    except OSError as e:
+                        # Stop reading this socket; its streams go down, the rest carry on
+                        selector.unregister(key.fileobj)
+                        self.on_status(f"Stopped reading a monitor socket: {e}")
+
+                now = time.monotonic()
+                if now - last_tick >= self.tick_interval:
+                    self.publish(now, now - last_tick)
+                    last_tick = now
+        finally:
+            selector.close()
+            for sock in self.socks:
+                sock.close()  # Closing drops the memberships
+            self.socks = []
+
+    def read_pktinfo(self, sock, streams, ancbufsize, now):
+        # Cap the reads per wakeup so one busy socket cannot starve the others
+        for _ in range(64):
+            try:
+                data, ancdata = self.ring.recvmsg(sock, ancbufsize)
+            except (BlockingIOError, InterruptedError):
+                return
+            for level, kind, info in ancdata:
+                if level == socket.IPPROTO_IP and kind == IP_PKTINFO and len(info) >= PKTINFO_SIZE:
+                    stream = streams.get(socket.inet_ntoa(info[8:12]))
+                    if stream is not None and len(data) >= TS_PACKET_SIZE:
+                        stream.feed(data, now)
+                    break
+
+    def read_single(self, sock, stream, now):
+        for _ in range(64):
+            try:
+                data = self.ring.recv(sock)
+            except (BlockingIOError, InterruptedError):
+                return
+            if len(data) >= TS_PACKET_SIZE:
+                stream.feed(data, now)
+
+    def publish(self, now, interval):
+        health = {}
+        for key, stream in self.streams.items():
+            stream.tick(interval)
+            report = health[key] = stream.report(now, self.down_after)
+            if self.state.get(key) != report["up"]:
+                self.state[key] = report["up"]
+                self.on_change(key, report["up"])
+        self.on_health(health)
+
+    def health(self):
+        now = time.monotonic()
+        return {key: stream.report(now, self.down_after) for key, stream in self.streams.items()}
+
+    def stop(self):
+        """Sets the flag to stop monitoring; safe to call from any thread."""
+        self.is_running = False
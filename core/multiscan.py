@@ -0,0 +1,139 @@
+# core/multiscan.py
+"""
+One scan over several network interfaces at once.
+
+Every (interface, range) job runs its own engine on its own thread, joined
+on that interface only. The jobs report back over a queue, and run() hands
+channels and merged progress to the usual callbacks from a single thread,
+so a sweep of N VLANs takes one pass instead of N.
+"""
+import queue
+import threading
+import time
+
+from core.engine import ProbeEngine
+from core.metrics import merge_metrics
+from core.pacing import split_limits
+from core.sharding import ShardedScan, merge_snapshots
+
+
+def build_engine(mode="smart", custom_range=None, processes=1, **options):
+    """A ProbeEngine, or a ShardedScan when a custom range is spread over processes."""
+    if mode == "custom" and processes > 1:
+        return ShardedScan(custom_range, processes=processes, **options)
+    return ProbeEngine(mode=mode, custom_range=custom_range, **options)
+
+
+def build_scan(mode="smart", custom_range=None, interfaces=None, processes=1, **options):
+    """Picks the engine for a scan of the same range on zero, one or many interfaces."""
+    interfaces = list(interfaces or [])
+    if len(interfaces) > 1:
+        jobs = [(interface, mode, custom_range) for interface in interfaces]
+        return MultiInterfaceScan(jobs, processes=processes, **options)
+    interface = interfaces[0] if interfaces else None
+    return build_engine(mode, custom_range, processes, interface=interface, **options)
+
+
+class MultiInterfaceScan:
+    """
+    Drop-in for ProbeEngine that runs `jobs`, a list of
+    (Interface, mode, custom_range), concurrently. Channels come back tagged
+    with the interface they were found on.
+    """
+
+    def __init__(self, jobs, processes=1, tick_interval=0.066, on_channel=None,
+                 on_progress=None, on_status=None, on_snapshot=None, **engine_options):
+        self.jobs = list(jobs)
+        self.tick_interval = tick_interval
+        self.is_running = True
+
+        self.on_channel = on_channel or (lambda channel: None)
+        self.on_progress = on_progress or (lambda percent: None)
+        self.on_status = on_status or (lambda message: None)
+        self.on_snapshot = on_snapshot or (lambda snapshot: None)
+
+        self.events = queue.Queue()
+        self.snapshots = {}
+        self.found_count = 0
+        self.processed = 0
+
+        # The interfaces may well hang off the same switch: share the join limits
+        engine_options = split_limits(engine_options, len(self.jobs))
+        profile = engine_options.pop("profile", None)
+        self.engines = [
+            build_engine(mode, custom_range, processes, interface=interface,
+                         tick_interval=tick_interval, **self._callbacks(index), **engine_options,
+                         profile=f"{profile}.{interface.name}" if profile else None)
+            for index, (interface, mode, custom_range) in enumerate(self.jobs)
+        ]
+
+    def _callbacks(self, index):
+        # Called on the job threads: only ever touch the queue from there
+        put = self.events.put
+        return dict(on_channel=lambda channel: put(("channel", index, channel)),
+                    on_status=lambda message: put(("status", index, message)),
+                    on_snapshot=lambda snapshot: put(("snapshot", index, snapshot)))
+
+    def stop(self):
+        self.is_running = False
+        for engine in self.engines:
+            engine.stop()
+
+    def snapshot(self):
+        return merge_snapshots(self.snapshots.values())
+
+    def metrics_snapshot(self):
+        return merge_metrics(engine.metrics_snapshot() for engine in self.engines)
+
+    def publish(self):
+        snapshot = self.snapshot()
+        self.processed = snapshot["probed"]
+        self.on_progress(snapshot["percent"])
+        self.on_snapshot(snapshot)
+
+    def run(self):
+        def run_job(index, engine):
+            found = 0
+            try:
+                found = engine.run()
+            finally:
+                self.events.put(("done", index, found))
+
+        threads = [threading.Thread(target=run_job, args=(index, engine), daemon=True)
+                   for index, engine in enumerate(self.engines)]
+        for thread in threads:
+            thread.start()
+
+        names = ", ".join(interface.name for interface, _, _ in self.jobs)
+        self.on_status(f"Scanning on {len(self.jobs)} interfaces: {names}")
+
+        running = set(range(len(self.engines)))
+        next_tick = time.monotonic()
+        try:
+            while running:
+                try:
+                    kind, index, payload = self.events.get(timeout=self.tick_interval)
+                except queue.Empty:
+                    kind = None
+
+                if kind == "channel":
+                    self.found_count += 1
+                    self.on_channel(payload)
+                elif kind == "snapshot":
+                    self.snapshots[index] = payload
+                elif kind == "status":
+                    self.on_status(f"[{self.jobs[index][0].name}] {payload}")
+                elif kind == "done":
+                    running.discard(index)
+
+                now = time.monotonic()
+                if now >= next_tick:
+                    self.publish()
+                    next_tick = now + self.tick_interval
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join(timeout=2.0)
+
+        self.publish()
+        return self.found_count
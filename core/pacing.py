@@ -0,0 +1,86 @@
+# core/pacing.py
+"""
+IGMP join pacing.
+
+Every probe is an IP_ADD_MEMBERSHIP, and the snooping tables of access
+switches and the PIM state upstream only take so many joins a second
+before they start dropping traffic, live viewers' included. JoinPacer is a
+token bucket on joins plus a cap on how many groups are joined at once.
+The engine asks it before each join and tells it about each leave; it
+never sleeps itself, so a paced scan still serves its open probes while it
+waits for the next token.
+"""
+
+
+class JoinPacer:
+    """
+    Allows `rate` joins a second on average with bursts of up to `burst`
+    (default: a tenth of a second's worth), and at most `max_memberships`
+    groups joined at the same time. None means no limit.
+    """
+
+    def __init__(self, rate=None, burst=None, max_memberships=None):
+        self.rate = rate if rate and rate > 0 else None
+        self.burst = max(1.0, burst or (self.rate or 0) / 10)
+        self.max_memberships = max_memberships if max_memberships and max_memberships > 0 else None
+        self.tokens = self.burst
+        self.last_fill = None
+
+        self.memberships = 0
+        self.joins = 0  # Since the last reset(), for the achieved rate
+
+    def fill(self, now):
+        if self.rate is None:
+            return
+        if self.last_fill is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.last_fill) * self.rate)
+        self.last_fill = now
+
+    @property
+    def full(self):
+        """True while no more groups may be joined until one is left."""
+        return self.max_memberships is not None and self.memberships >= self.max_memberships
+
+    def ready(self, now):
+        """True if a group may be joined right now."""
+        if self.full:
+            return False
+        self.fill(now)
+        return self.rate is None or self.tokens >= 1.0
+
+    def delay(self, now):
+        """Seconds until the next token (0 if there is one). Leaves are not predicted."""
+        self.fill(now)
+        if self.rate is None or self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def joined(self, now):
+        """Takes a token for a join that went through."""
+        self.fill(now)
+        if self.rate is not None:
+            self.tokens -= 1.0
+        self.memberships += 1
+        self.joins += 1
+
+    def left(self):
+        self.memberships = max(0, self.memberships - 1)
+
+    def reset(self):
+        """Starts a new count of joins; memberships still held are kept."""
+        self.joins = 0
+
+
+def split_limits(options, count):
+    """
+    Engine options with the join limits divided between `count` engines
+    running side by side, so the limits hold for the scan as a whole.
+    """
+    options = dict(options)
+    if count > 1:
+        for key in ("join_rate", "join_burst"):
+            if options.get(key):
+                options[key] = options[key] / count
+        if options.get("max_memberships"):
+            options["max_memberships"] = max(1, options["max_memberships"] // count)
+    return options
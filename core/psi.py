@@ -0,0 +1,336 @@
+# core/psi.py
+"""
+Incremental PSI/SI section assembly (PAT, PMT, SDT).
+
+Chunks of raw TS are fed in as they arrive. Each PID gets its own
+SectionAssembler that stitches sections together across packets, and the
+PSIDemux checks CRC32 and caches every section by version_number so a table
+that is repeated unchanged is never decoded twice.
+"""
+from core.ts import TS_PACKET_SIZE, iter_packets
+
+PAT_PID = 0x00
+SDT_PID = 0x11
+
+TABLE_PAT = 0x00
+TABLE_PMT = 0x02
+TABLE_SDT_ACTUAL = 0x42
+
+# Largest legal private section (section_length is capped at 4093)
+MAX_SECTION_SIZE = 4096
+
+
+def _make_crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            if crc & 0x80000000:
+                crc = ((crc << 1) ^ 0x04C11DB7) & 0xFFFFFFFF
+            else:
+                crc = (crc << 1) & 0xFFFFFFFF
+        table.append(crc)
+    return table
+
+
+_CRC_TABLE = _make_crc_table()
+
+
+def crc32_mpeg(data):
+    """CRC-32/MPEG-2 as used by PSI sections (not the zlib polynomial order)."""
+    crc = 0xFFFFFFFF
+    table = _CRC_TABLE
+    for b in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[(crc >> 24) ^ b]
+    return crc
+
+
+def decode_text(raw):
+    """
+    Decodes a DVB text field. A leading byte below 0x20 selects the character
+    table; we honour UTF-8 (0x15) and otherwise fall back to the old
+    UTF-8 / ISO-8859-1 guess.
+    """
+    if not raw:
+        return ""
+
+    if raw[0] < 0x20:
+        selector = raw[0]
+        if selector == 0x15:
+            return bytes(raw[1:]).decode('utf-8', errors='replace')
+        # 0x10 carries a two byte code page number, the rest are one byte
+        raw = raw[3:] if selector == 0x10 else raw[1:]
+
+    raw = bytes(raw)
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('iso-8859-1')
+
+
+class SectionAssembler:
+    """
+    Rebuilds complete sections for a single PID from its TS packets.
+    Handles PUSI/pointer_field, sections spanning several packets, several
+    sections in one packet, and drops partial data on continuity errors.
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.buffer = None  # bytearray of the section being assembled
+        self.last_cc = None
+
+    def reset(self):
+        self.buffer = None
+
+    def feed_packet(self, data, offset):
+        """Consumes one TS packet at `offset` and returns any completed sections."""
+        b1 = data[offset + 1]
+        b3 = data[offset + 3]
+
+        # Transport error indicator: the packet is garbage
+        if b1 & 0x80:
+            self.reset()
+            return []
+
+        adaptation = (b3 >> 4) & 0x3
+        if not adaptation & 0x1:
+            return []  # No payload
+
+        # Continuity: ignore duplicates, drop partial sections on a gap
+        cc = b3 & 0x0F
+        if self.last_cc is not None:
+            if cc == self.last_cc:
+                return []
+            if cc != (self.last_cc + 1) & 0x0F:
+                self.reset()
+        self.last_cc = cc
+
+        start = offset + 4
+        end = offset + TS_PACKET_SIZE
+        if adaptation == 0x3:
+            start += 1 + data[start]
+        if start >= end:
+            return []
+
+        sections = []
+        if b1 & 0x40:
+            # PUSI: the pointer field tells us where the next section begins
+            pointer = data[start]
+            start += 1
+            if self.buffer is not None:
+                self.buffer += data[start:min(start + pointer, end)]
+                self._complete(sections)
+            self.buffer = None
+            start += pointer
+            self._start_sections(data, start, end, sections)
+        elif self.buffer is not None:
+            self.buffer += data[start:end]
+            self._complete(sections)
+            # Without PUSI nothing new can start in this packet
+            if self.buffer is not None and len(self.buffer) > MAX_SECTION_SIZE:
+                self.reset()
+
+        return sections
+
+    def _start_sections(self, data, start, end, sections):
+        while start < end:
+            # 0xFF table_id is stuffing: the rest of the packet is padding
+            if data[start] == 0xFF:
+                return
+            self.buffer = bytearray(data[start:end])
+            consumed = self._complete(sections)
+            if consumed is None:
+                return
+            start += consumed
+
+    def _complete(self, sections):
+        """
+        Moves a finished section out of the buffer. Returns the number of
+        bytes it used, or None while the section is still incomplete.
+        """
+        buf = self.buffer
+        if buf is None or len(buf) < 3:
+            return None
+
+        total = 3 + (((buf[1] & 0x0F) << 8) | buf[2])
+        if len(buf) < total:
+            return None
+
+        # Hand the buffer itself out rather than copying the section again
+        del buf[total:]
+        sections.append(buf)
+        self.buffer = None
+        return total
+
+
+class PSIDemux:
+    """
+    Feeds TS chunks through per-PID assemblers and keeps the decoded PAT,
+    PMTs and SDT. Call feed() with every chunk as it arrives.
+    """
+
+    def __init__(self):
+        self.assemblers = {}
+        self.versions = {}  # (pid, table_id, ext, section_number) -> version
+        self.sdt_sections = {}  # (ts_id, version) -> set of section numbers seen
+
+        self.pmt_pids = {}  # program_number -> PMT PID (from the PAT)
+        self.programs = {}  # program_number -> decoded PMT
+        self.services = {}  # service_id -> decoded SDT entry
+        self.transport_stream_id = None
+        self.original_network_id = None
+
+        self.sdt_complete = False
+
+        # Counters, handy for tuning the hunt
+        self.sections_decoded = 0
+        self.sections_skipped = 0
+        self.crc_errors = 0
+
+    @property
+    def pids(self):
+        return {PAT_PID, SDT_PID, *self.pmt_pids.values()}
+
+    def feed(self, data):
+        """
+        Consumes a chunk of TS (bytes, bytearray or a memoryview into a receive
+        buffer). Returns True once a full SDT has been assembled.
+        """
+        pids = self.pids
+        self._feed_pids(data, pids)
+
+        # A PAT in this chunk may have announced PMTs that are also in it
+        new_pids = self.pids - pids
+        if new_pids:
+            self._feed_pids(data, new_pids)
+
+        return self.sdt_complete
+
+    def _feed_pids(self, data, pids):
+        for offset, pid in iter_packets(data, pids):
+            assembler = self.assemblers.get(pid)
+            if assembler is None:
+                assembler = self.assemblers[pid] = SectionAssembler(pid)
+            for section in assembler.feed_packet(data, offset):
+                self.on_section(pid, section)
+
+    def on_section(self, pid, section):
+        # Only long-form sections carry version numbers and a CRC
+        if len(section) < 12 or not section[1] & 0x80:
+            return
+
+        table_id = section[0]
+        ext = (section[3] << 8) | section[4]
+        version = (section[5] >> 1) & 0x1F
+        current = section[5] & 0x1
+        number = section[6]
+        last_number = section[7]
+
+        if not current:
+            return
+
+        key = (pid, table_id, ext, number)
+        if self.versions.get(key) == version:
+            self.sections_skipped += 1
+            return
+
+        if crc32_mpeg(section) != 0:
+            self.crc_errors += 1
+            return
+
+        self.versions[key] = version
+        self.sections_decoded += 1
+
+        if pid == PAT_PID and table_id == TABLE_PAT:
+            self.pmt_pids.update(parse_pat(section))
+            self.transport_stream_id = ext
+        elif table_id == TABLE_PMT and pid in self.pmt_pids.values():
+            self.programs[ext] = parse_pmt(section)
+        elif pid == SDT_PID and table_id == TABLE_SDT_ACTUAL:
+            self.original_network_id = (section[8] << 8) | section[9]
+            self.services.update(parse_sdt(section))
+
+            seen = self.sdt_sections.setdefault((ext, version), set())
+            seen.add(number)
+            if len(seen) > last_number:
+                self.sdt_complete = True
+
+    @property
+    def complete(self):
+        """True once the SDT and the PMT of every program in the PAT are in."""
+        if not self.sdt_complete or self.transport_stream_id is None:
+            return False
+        return all(number in self.programs for number in self.pmt_pids)
+
+    def first_service_name(self):
+        for service in self.services.values():
+            if service["name"]:
+                return service["name"]
+        return None
+
+
+def parse_pat(section):
+    """Returns {program_number: pmt_pid}, skipping the network PID entry."""
+    programs = {}
+    end = len(section) - 4
+    for i in range(8, end - 3, 4):
+        program_number = (section[i] << 8) | section[i + 1]
+        pid = ((section[i + 2] & 0x1F) << 8) | section[i + 3]
+        if program_number != 0:
+            programs[program_number] = pid
+    return programs
+
+
+def parse_pmt(section):
+    """Returns {'pcr_pid': int, 'streams': [(stream_type, pid), ...]}."""
+    end = len(section) - 4
+    pcr_pid = ((section[8] & 0x1F) << 8) | section[9]
+    info_len = ((section[10] & 0x0F) << 8) | section[11]
+
+    streams = []
+    i = 12 + info_len
+    while i + 5 <= end:
+        stream_type = section[i]
+        pid = ((section[i + 1] & 0x1F) << 8) | section[i + 2]
+        es_info_len = ((section[i + 3] & 0x0F) << 8) | section[i + 4]
+        streams.append((stream_type, pid))
+        i += 5 + es_info_len
+
+    return {"pcr_pid": pcr_pid, "streams": streams}
+
+
+def parse_sdt(section):
+    """Returns {service_id: {'name', 'provider', 'service_type'}} for one SDT section."""
+    section = memoryview(section)  # Descriptor bodies are sliced without copying
+    services = {}
+    end = len(section) - 4
+    i = 11  # After the 8 byte header, original_network_id and a reserved byte
+
+    while i + 5 <= end:
+        service_id = (section[i] << 8) | section[i + 1]
+        loop_len = ((section[i + 3] & 0x0F) << 8) | section[i + 4]
+        i += 5
+
+        entry = {"name": "", "provider": "", "service_type": None}
+        loop_end = min(i + loop_len, end)
+        while i + 2 <= loop_end:
+            tag = section[i]
+            length = section[i + 1]
+            body = section[i + 2:i + 2 + length]
+            i += 2 + length
+
+            # Service Descriptor: [Type] [Provider_Len] [Provider_Name] [Name_Len] [Name]
+            if tag == 0x48 and len(body) >= 3:
+                provider_len = body[1]
+                name_at = 2 + provider_len
+                if name_at >= len(body):
+                    continue
+                entry["service_type"] = body[0]
+                entry["provider"] = decode_text(body[2:name_at])
+                entry["name"] = decode_text(body[name_at + 1:name_at + 1 + body[name_at]])
+
+        i = loop_end
+        services[service_id] = entry
+
+    return services
@@ -0,0 +1,122 @@
+# core/record.py
+"""
+Headless recorder.
+
+    python -m core.record 239.255.0.1 239.255.0.2:5000 -o recordings
+    python -m core.record 239.255.0.1 --duration 3600 --segment-mb 512
+    python -m core.record --seek 90 recordings/239.255.0.1-20261017-201500-0000.ts
+
+Every group is recorded as raw TS with a keyframe index next to each
+segment; --seek prints the segment and byte offset to start playing from.
+"""
+import argparse
+import signal
+import socket
+import sys
+import threading
+import time
+
+from core.channel import Channel
+from core.interfaces import find_interface
+from core.recorder import Recorder, RecordingIndex, RecordingSession, default_recording_dir
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m core.record",
+                                     description="Record UDP multicast MPEG-TS groups to disk.")
+    parser.add_argument("groups", nargs="*", metavar="GROUP[:PORT]",
+                        help="Groups to record, e.g. 239.255.0.1 or 239.255.0.1:5000")
+    parser.add_argument("--port", type=int, default=1234,
+                        help="Port for groups given without one (default: 1234)")
+    parser.add_argument("-o", "--output", default=None, metavar="DIR",
+                        help="Directory for the recordings (default: ~/Videos/CableCompany)")
+    parser.add_argument("--duration", type=float, default=None, metavar="SECONDS",
+                        help="Stop after this long (default: until Ctrl+C)")
+    parser.add_argument("--segment-mb", type=int, default=1024,
+                        help="Start a new segment file after this many MB (default: 1024)")
+    parser.add_argument("--interface", metavar="NAME",
+                        help="Join on this interface (name, address or index)")
+    parser.add_argument("--seek", type=float, metavar="SECONDS",
+                        help="Print where SECONDS into the recording given as GROUP starts")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No status output on stderr")
+    return parser
+
+
+def parse_group(spec, default_port):
+    """'239.255.0.1[:5000]' -> (ip, port). Raises ValueError."""
+    ip, _, port = spec.partition(":")
+    try:
+        socket.inet_aton(ip)
+    except OSError:
+        raise ValueError(f"Invalid address in {spec}")
+    port = int(port) if port else default_port
+    if not 0 < port < 65536:
+        raise ValueError(f"Invalid port in {spec}")
+    return ip, port
+
+
+def seek(path, seconds):
+    index = RecordingIndex(path)
+    position = index.seek(seconds)
+    if position is None:
+        print(f"No recording at {path}", file=sys.stderr)
+        return 1
+    segment, offset = position
+    print(f"{segment}\t{offset}")
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.seek is not None:
+        if len(args.groups) != 1:
+            print("--seek needs exactly one recording", file=sys.stderr)
+            return 2
+        return seek(args.groups[0], args.seek)
+
+    if not args.groups:
+        build_parser().print_usage(sys.stderr)
+        return 2
+
+    interface = None
+    if args.interface:
+        interface = find_interface(args.interface)
+        if interface is None:
+            print(f"No such interface: {args.interface}", file=sys.stderr)
+            return 2
+
+    channels = []
+    for spec in args.groups:
+        try:
+            ip, port = parse_group(spec, args.port)
+        except ValueError:
+            print(f"Invalid group: {spec}", file=sys.stderr)
+            return 2
+        channels.append(Channel(name=ip, ip=ip, port=port,
+                                interface=interface.name if interface else ""))
+
+    def status(message):
+        if not args.quiet:
+            print(message, file=sys.stderr)
+
+    session = RecordingSession(on_status=status)
+    directory = args.output or default_recording_dir()
+    for channel in channels:
+        session.add(Recorder(channel, directory, args.segment_mb * 1024 * 1024))
+
+    # Ctrl+C closes every segment and index cleanly
+    signal.signal(signal.SIGINT, lambda *_: session.stop())
+    if args.duration is not None:
+        timer = threading.Timer(args.duration, session.stop)
+        timer.daemon = True
+        timer.start()
+
+    started = time.monotonic()
+    session.run()
+    status(f"Done after {time.monotonic() - started:.0f}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
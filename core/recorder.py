@@ -0,0 +1,358 @@
+# core/recorder.py
+"""
+Raw TS recording with a seek index.
+
+A Recorder joins one stream and appends its datagrams untouched to segment
+files through a large write buffer: no remux and no decoder, so a recording
+costs little more than the disk bandwidth. Nothing is written until the
+PAT/PMT and a keyframe have been seen; every segment starts with the latest
+PAT/PMT followed by a keyframe packet, and a full segment ends just before
+the next keyframe, so each file plays on its own.
+
+Next to every NAME-NNNN.ts, NAME-NNNN.idx holds a header and fixed-size
+records written as the data goes out:
+    offset   u64  byte offset in the segment
+    pcr      u64  last 27 MHz PCR seen (NO_PCR before the first one)
+    elapsed  u32  milliseconds since the recording started
+    flags    u8   KEYFRAME and/or PCR
+There is one record per keyframe (at offset 0 for the one that starts the
+segment, which takes the PAT/PMT with it) and one per PCR at most every
+PCR_INDEX_INTERVAL of stream time, so an hour of a channel indexes in a few hundred KB.
+RecordingIndex turns a time into (segment, offset) with a binary search.
+
+RecordingSession drives any number of recorders from one thread and one
+selector, which keeps multi-channel recording cheap.
+"""
+import bisect
+import glob
+import os
+import re
+import selectors
+import struct
+import threading
+import time
+from datetime import datetime
+
+from core.interfaces import find_interface, join_group, leave_group
+from core.psi import PAT_PID, PSIDemux
+from core.ringbuf import RecvRing
+from core.ts import TS_PACKET_SIZE, has_pcr, is_random_access, packet_offsets, pcr_delta, read_pcr
+from core.zap import random_access_pids
+
+INDEX_MAGIC = b"CCIX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHd")  # magic, version, wall clock start of the segment
+INDEX_RECORD = struct.Struct("<QQIB")  # offset, pcr, elapsed ms, flags
+NO_PCR = (1 << 64) - 1
+KEYFRAME = 0x01
+PCR = 0x02
+
+# A segment is closed at the first keyframe past this size, or at twice
+# the size if the stream has no keyframes we can see
+SEGMENT_BYTES = 1024 * 1024 * 1024
+WRITE_BUFFER = 4 * 1024 * 1024
+PCR_INDEX_INTERVAL = 0.5
+# Once the PAT/PMT are known, how long to wait for the first keyframe
+# before recording anyway (a stream whose keyframes we cannot see)
+KEYFRAME_WAIT = 5.0
+
+
+def default_recording_dir():
+    """Where the GUI saves recordings, e.g. ~/Videos/CableCompany."""
+    videos = os.path.expanduser("~/Videos")
+    return os.path.join(videos if os.path.isdir(videos) else os.path.expanduser("~"), "CableCompany")
+
+
+def recording_prefix(path):
+    """The recording a segment or index file belongs to: its path without -NNNN.ts/.idx."""
+    return re.sub(r"-\d{4}\.(ts|idx)$", "", path)
+
+
+class Recorder:
+    """
+    Records the stream carrying `channel` into `directory`. start() joins
+    the group, feed() writes a datagram and close() finishes the files.
+    """
+
+    def __init__(self, channel, directory, segment_bytes=SEGMENT_BYTES):
+        self.channel = channel
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+
+        self.sock = None
+        self.mreq = None
+        self.prefix = None
+        self.started_at = None
+        self.paths = []  # Segment files written so far
+        self.bytes_written = 0
+
+        self.file = None
+        self.index_file = None
+        self.segment_written = 0
+
+        self.rap_pids = random_access_pids(channel.streams, [channel.pcr_pid])
+        self.pcr_pid = channel.pcr_pid
+        self.psi_pids = {PAT_PID} | ({channel.pmt_pid} if channel.pmt_pid is not None else set())
+        self.psi = {}  # pid -> last packet starting a section on it
+        # Without a PMT from the scan, learn the PIDs from the stream itself
+        self.demux = None if self.rap_pids else PSIDemux()
+
+        self.psi_known_at = None  # When the PAT/PMT were first all seen
+
+        self.last_pcr = None
+        self.last_pcr_indexed = None
+
+    def start(self):
+        """Joins the group and picks the file names. Raises OSError."""
+        os.makedirs(self.directory, exist_ok=True)
+        name = re.sub(r"[^\w.-]+", "_", self.channel.name).strip("_") or self.channel.ip
+        self.prefix = os.path.join(self.directory, f"{name}-{datetime.now():%Y%m%d-%H%M%S}")
+
+        interface = find_interface(self.channel.interface) if self.channel.interface else None
+        self.sock, self.mreq = join_group(self.channel.ip, self.channel.port, interface)
+        self.started_at = time.monotonic()
+
+    @property
+    def duration(self):
+        return 0.0 if self.started_at is None else time.monotonic() - self.started_at
+
+    def learn(self, data):
+        self.demux.feed(data)
+        programs = self.demux.programs
+        number = self.channel.service_id
+        if number not in programs:
+            if number in self.demux.pmt_pids or not programs:
+                return  # Our PMT has not come round yet
+            number = next(iter(programs))
+
+        program = programs[number]
+        self.rap_pids = random_access_pids(program["streams"], [program["pcr_pid"]])
+        self.pcr_pid = program["pcr_pid"]
+        self.psi_pids = {PAT_PID, self.demux.pmt_pids[number]}
+        self.demux = None
+
+    def psi_ready(self, now):
+        """True once the PIDs are known and a PAT/PMT packet has been kept for each."""
+        if self.psi_known_at is None:
+            if self.demux is not None or not self.psi_pids <= self.psi.keys():
+                return False
+            self.psi_known_at = now
+        return True
+
+    def feed(self, data, now):
+        if self.demux is not None:
+            self.learn(data)
+
+        rap = None
+        pcr_offset = None
+        for offset in packet_offsets(data):
+            b1 = data[offset + 1]
+            pid = ((b1 & 0x1F) << 8) | data[offset + 2]
+            if pid in self.psi_pids:
+                if b1 & 0x40:
+                    self.psi[pid] = bytes(data[offset:offset + TS_PACKET_SIZE])
+                continue
+            if rap is None and pid in self.rap_pids and is_random_access(data, offset):
+                rap = offset
+            if pcr_offset is None and pid == self.pcr_pid and has_pcr(data, offset):
+                pcr_offset = offset
+                self.last_pcr = read_pcr(data, offset + 6)
+
+        # Where in this datagram a new segment starts, if one does
+        cut = None
+        if self.file is None:
+            if not self.psi_ready(now):
+                return
+            if rap is None and now - self.psi_known_at < KEYFRAME_WAIT:
+                return
+            cut = rap or 0
+        elif rap is not None and self.segment_written >= self.segment_bytes:
+            cut = rap
+        elif self.segment_written >= 2 * self.segment_bytes:
+            cut = 0
+        opened = cut is not None
+        if opened:
+            if cut and self.file is not None:
+                self.write(data[:cut])
+            self.open_segment()
+        else:
+            cut = 0
+
+        elapsed = int((now - self.started_at) * 1000)
+        base = self.segment_written - cut
+        records = []
+        if rap is not None and rap >= cut:
+            # The keyframe a segment opens on is indexed at 0, with the PAT/PMT
+            records.append((0 if opened and rap == cut else base + rap, KEYFRAME))
+        if (pcr_offset is not None and pcr_offset >= cut
+                and (self.last_pcr_indexed is None
+                     or pcr_delta(self.last_pcr, self.last_pcr_indexed) >= PCR_INDEX_INTERVAL)):
+            self.last_pcr_indexed = self.last_pcr
+            records.append((base + pcr_offset, PCR))
+        pcr = NO_PCR if self.last_pcr is None else self.last_pcr
+        for offset, flags in sorted(records):
+            self.index_file.write(INDEX_RECORD.pack(offset, pcr, elapsed, flags))
+
+        self.write(data[cut:])
+
+    def write(self, data):
+        self.file.write(data)
+        self.segment_written += len(data)
+        self.bytes_written += len(data)
+
+    def open_segment(self):
+        self.close_segment()
+        path = f"{self.prefix}-{len(self.paths):04d}.ts"
+        self.file = open(path, "wb", buffering=WRITE_BUFFER)
+        self.index_file = open(path[:-3] + ".idx", "wb")
+        self.index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, time.time()))
+        self.paths.append(path)
+        self.segment_written = 0
+
+        # Each segment starts with the tables needed to decode it, PAT first
+        self.write(b"".join(self.psi[pid] for pid in sorted(self.psi)))
+
+    def close_segment(self):
+        for f in (self.file, self.index_file):
+            if f is not None:
+                f.close()
+        self.file = None
+        self.index_file = None
+
+    def close(self):
+        self.close_segment()
+        if self.sock is not None:
+            leave_group(self.sock, self.mreq)
+            self.sock = None
+
+
+class RecordingSession:
+    """
+    Runs any number of recorders on one thread. add() and remove() are safe
+    to call from any thread; run() blocks until stop().
+    """
+
+    def __init__(self, on_status=None):
+        self.is_running = True
+        self.lock = threading.Lock()
+        self.pending = []  # (add?, recorder), applied by the recording thread
+        self.recorders = []
+        self.selector = None
+        self.ring = RecvRing()
+        self.on_status = on_status or (lambda message: None)
+
+    def add(self, recorder):
+        with self.lock:
+            self.pending.append((True, recorder))
+
+    def remove(self, recorder):
+        with self.lock:
+            self.pending.append((False, recorder))
+
+    def apply_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for add, recorder in pending:
+            if not add:
+                self.finish(recorder)
+                continue
+            try:
+                recorder.start()
+            except OSError as e:
+                self.on_status(f"Could not record {recorder.channel.name}: {e}")
+                continue
+            self.selector.register(recorder.sock, selectors.EVENT_READ, recorder)
+            self.recorders.append(recorder)
+            self.on_status(f"Recording {recorder.channel.name} to {recorder.prefix}-*.ts")
+
+    def finish(self, recorder, reason=None):
+        if recorder not in self.recorders:
+            return
+        self.selector.unregister(recorder.sock)
+        recorder.close()
+        self.recorders.remove(recorder)
+        self.on_status(reason or f"Recorded {recorder.channel.name}: "
+                                 f"{recorder.bytes_written / 1e6:.1f} MB in {len(recorder.paths)} segments")
+
+    def run(self):
+        self.selector = selectors.DefaultSelector()
+        try:
+            while self.is_running:
+                self.apply_pending()
+                if not self.recorders:
+                    time.sleep(0.05)
+                    continue
+                for key, _ in self.selector.select(0.1):
+                    self.read(key.data, time.monotonic())
+        finally:
+            for recorder in list(self.recorders):
+                self.finish(recorder)
+            self.selector.close()
+
+    def read(self, recorder, now):
+        for _ in range(64):
+            try:
+                data = self.ring.recv(recorder.sock)
+            except (BlockingIOError, InterruptedError):
+                return
+            if len(data) < TS_PACKET_SIZE:
+                continue
+            try:
+                recorder.feed(data, now)
+            except OSError as e:
+                # Disk full or gone: keep what was written and stop this one
+                self.finish(recorder, f"Stopped recording {recorder.channel.name}: {e}")
+                return
+
+    def stop(self):
+        """Sets the flag to stop recording; safe to call from any thread."""
+        self.is_running = False
+
+
+def read_index(path):
+    """Returns (segment start as Unix time, [(offset, pcr, elapsed_ms, flags), ...])."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < INDEX_HEADER.size:
+        raise ValueError(f"Not a recording index: {path}")
+    magic, version, started = INDEX_HEADER.unpack_from(data)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        raise ValueError(f"Not a recording index: {path}")
+    # A recording that was cut off may end in half a record
+    end = INDEX_HEADER.size + (len(data) - INDEX_HEADER.size) // INDEX_RECORD.size * INDEX_RECORD.size
+    return started, list(INDEX_RECORD.iter_unpack(data[INDEX_HEADER.size:end]))
+
+
+class RecordingIndex:
+    """Keyframe positions over every segment of one recording."""
+
+    def __init__(self, path):
+        self.prefix = recording_prefix(path)
+        self.segments = sorted(glob.glob(glob.escape(self.prefix) + "-[0-9][0-9][0-9][0-9].ts"))
+        self.started = None
+        self.duration = 0.0  # Seconds up to the last index record
+        self.times = []  # Elapsed ms of every keyframe, ascending
+        self.keyframes = []  # (segment path, byte offset) of every keyframe
+
+        for segment in self.segments:
+            try:
+                started, records = read_index(segment[:-3] + ".idx")
+            except (OSError, ValueError):
+                continue
+            if self.started is None:
+                self.started = started
+            for offset, _, elapsed, flags in records:
+                self.duration = max(self.duration, elapsed / 1000)
+                if flags & KEYFRAME:
+                    self.times.append(elapsed)
+                    self.keyframes.append((segment, offset))
+
+    def seek(self, seconds):
+        """
+        (segment path, byte offset) of the last keyframe at or before
+        `seconds` into the recording; None if there are no segments.
+        """
+        if not self.keyframes:
+            return (self.segments[0], 0) if self.segments else None
+        i = bisect.bisect_right(self.times, seconds * 1000) - 1
+        return self.keyframes[max(i, 0)]
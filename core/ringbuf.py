@@ -0,0 +1,43 @@
+# core/ringbuf.py
+"""
+Preallocated receive buffers.
+
+Datagrams are read with recv_into() straight into slots of one big
+bytearray, and callers get a memoryview of the bytes received. Nothing is
+allocated per datagram; a slot is only overwritten once the ring wraps, so
+a view stays valid for the next `slots - 1` receives.
+"""
+
+# Large enough for any UDP datagram, so nothing is ever cut short. 7 x 188
+# bytes is typical, but jumbo frames and reassembled fragments go far beyond
+# 4 KiB, and a truncated datagram would be parsed as partial TS.
+SLOT_SIZE = 65535
+
+
+class RecvRing:
+    def __init__(self, slots=64, slot_size=SLOT_SIZE):
+        self.slot_size = slot_size
+        self.slots = slots
+        self.buffer = bytearray(slots * slot_size)
+        self.view = memoryview(self.buffer)
+        self.index = 0
+        self.bytes_received = 0
+
+    def recv(self, sock):
+        """
+        Reads one datagram into the next slot and returns a view of it.
+        Raises BlockingIOError like sock.recv() when nothing is queued.
+        """
+        offset = self.index * self.slot_size
+        n = sock.recv_into(self.view[offset:offset + self.slot_size])
+        self.index = (self.index + 1) % self.slots
+        self.bytes_received += n
+        return self.view[offset:offset + n]
+
+    def recvmsg(self, sock, ancbufsize):
+        """Like recv(), but also returns the ancillary data (e.g. IP_PKTINFO)."""
+        offset = self.index * self.slot_size
+        n, ancdata, _, _ = sock.recvmsg_into([self.view[offset:offset + self.slot_size]], ancbufsize)
+        self.index = (self.index + 1) % self.slots
+        self.bytes_received += n
+        return self.view[offset:offset + n], ancdata
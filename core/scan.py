@@ -0,0 +1,210 @@
+# core/scan.py
+"""
+Headless scanner.
+
+    python -m core.scan                          # smart scan, JSON lines on stdout
+    python -m core.scan --range 239.255.0.* --format m3u -o lineup.m3u
+    python -m core.scan --ports 1234,5000,5500
+    python -m core.scan --interface eth1=239.255.0.* --interface eth2=239.192.*.1
+    python -m core.scan --range 239.*.*.* --join-rate 200 --max-groups 64
+    python -m core.scan --metrics scan.prom --profile scan.pstats
+
+Results are written as soon as each channel is found. Only the probe engine
+is imported, so this runs on boxes without PyQt5 or libvlc.
+"""
+import argparse
+import json
+import signal
+import sys
+from dataclasses import asdict
+
+from core.addresses import parse_pattern, parse_ports
+from core.channel import m3u_entry
+from core.channel_store import ChannelStore
+from core.interfaces import find_interface, list_interfaces
+from core.metrics import prometheus_text, summary
+from core.multiscan import MultiInterfaceScan, build_scan
+from core.sharding import default_process_count
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m core.scan",
+                                     description="Scan for UDP multicast MPEG-TS channels.")
+    parser.add_argument("--range", dest="custom_range", metavar="PATTERN",
+                        help="Scan a custom range such as 239.255.0.* instead of the smart beacons")
+    parser.add_argument("--ports", "--port", dest="ports", default="1234", metavar="PORTS",
+                        help="Ports probed on every group, e.g. 1234,5000-5010 (default: 1234)")
+    parser.add_argument("--format", choices=("jsonl", "m3u"), default="jsonl")
+    parser.add_argument("-o", "--output", help="Write results to a file instead of stdout")
+    parser.add_argument("--window", type=int, default=128,
+                        help="Number of groups joined at the same time (default: 128)")
+    parser.add_argument("--probe-timeout", type=float, default=0.1,
+                        help="Seconds to wait for the first packet of a group (default: 0.1)")
+    parser.add_argument("--hunt-timeout", type=float, default=2.0,
+                        help="Seconds to wait for complete PSI on a live group (default: 2.0)")
+    parser.add_argument("--join-rate", type=float, metavar="N",
+                        help="At most N IGMP joins per second for the whole scan (default: unlimited)")
+    parser.add_argument("--join-burst", type=float, metavar="N",
+                        help="Joins allowed back to back under --join-rate (default: 0.1s worth)")
+    parser.add_argument("--max-groups", type=int, metavar="N",
+                        help="At most N groups joined at the same time for the whole scan")
+    parser.add_argument("--processes", type=int, default=1, metavar="N",
+                        help="Split a --range scan across N processes (0 = one per CPU)")
+    parser.add_argument("--interface", action="append", default=[], metavar="NAME[=PATTERN]",
+                        help="Join on this interface (name, address or index), optionally with its "
+                             "own range. Repeat to scan several interfaces at once; 'all' for every one")
+    parser.add_argument("--list-interfaces", action="store_true",
+                        help="Print the local IPv4 interfaces and exit")
+    parser.add_argument("--warm", action="store_true",
+                        help="Re-probe the groups in the GUI's channel cache first")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Write join/first-packet/hunt/parse histograms in Prometheus text format "
+                             "('-' for stderr) and print a summary")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="cProfile the scan loop and save the stats (one file per process or interface)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No status output on stderr")
+    return parser
+
+
+class ResultWriter:
+    """Streams channels out in the requested format, flushing after each one."""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == "m3u":
+            self.stream.write("#EXTM3U\n")
+            self.stream.flush()
+
+    def write(self, channel):
+        if self.fmt == "m3u":
+            self.stream.write(m3u_entry(channel) + "\n")
+        else:
+            self.stream.write(json.dumps(asdict(channel)) + "\n")
+        self.stream.flush()
+
+
+def parse_interface_jobs(specs, default_range):
+    """
+    Turns --interface values into [(Interface, custom_range)]. Raises
+    ValueError naming the first spec that does not resolve.
+    """
+    available = list_interfaces()
+    jobs = []
+    for spec in specs:
+        name, _, pattern = spec.partition("=")
+        pattern = pattern or default_range
+        if pattern and parse_pattern(pattern) is None:
+            raise ValueError(f"Invalid range: {pattern}")
+
+        if name == "all":
+            jobs.extend((interface, pattern) for interface in available if not interface.loopback)
+            continue
+        interface = find_interface(name, available)
+        if interface is None:
+            raise ValueError(f"No such interface: {name}")
+        jobs.append((interface, pattern))
+    return jobs
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.list_interfaces:
+        for interface in list_interfaces():
+            print(f"{interface.index}\t{interface.name}\t{interface.address}")
+        return 0
+
+    if args.custom_range and parse_pattern(args.custom_range) is None:
+        print(f"Invalid range: {args.custom_range}", file=sys.stderr)
+        return 2
+
+    ports = parse_ports(args.ports)
+    if not ports:
+        print(f"Invalid ports: {args.ports}", file=sys.stderr)
+        return 2
+
+    try:
+        jobs = parse_interface_jobs(args.interface, args.custom_range)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    def status(message):
+        if not args.quiet:
+            print(message, file=sys.stderr)
+
+    def progress(snapshot):
+        # A live counter line, only when a human is watching
+        if args.quiet or not sys.stderr.isatty():
+            return
+        eta = "" if snapshot["eta"] is None else f", ETA {snapshot['eta']:.0f}s"
+        sys.stderr.write(f"\r{snapshot['probed']}/{snapshot['total']} probed, "
+                         f"{snapshot['in_flight']} in flight, {snapshot['hits']} live, "
+                         f"{snapshot['join_rate']:.0f} joins/s{eta}   ")
+        sys.stderr.flush()
+
+    known = ChannelStore().load() if args.warm else []
+    try:
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    except OSError as e:
+        print(f"Could not open {args.output}: {e}", file=sys.stderr)
+        return 2
+    writer = ResultWriter(out, args.format)
+
+    options = dict(ports=ports,
+                   max_inflight=args.window,
+                   probe_timeout=args.probe_timeout,
+                   hunt_timeout=args.hunt_timeout,
+                   join_rate=args.join_rate,
+                   join_burst=args.join_burst,
+                   max_memberships=args.max_groups,
+                   profile=args.profile,
+                   known=sorted({channel.ip for channel in known}),
+                   on_channel=writer.write,
+                   on_status=status,
+                   on_snapshot=progress)
+
+    processes = args.processes if args.processes > 0 else default_process_count()
+    if len(jobs) > 1:
+        engine = MultiInterfaceScan([(interface, "custom" if pattern else "smart", pattern)
+                                     for interface, pattern in jobs],
+                                    processes=processes, **options)
+    else:
+        pattern = jobs[0][1] if jobs else args.custom_range
+        engine = build_scan("custom" if pattern else "smart", pattern,
+                            [interface for interface, _ in jobs], processes, **options)
+
+    # Ctrl+C finishes the current loop iteration and leaves every group cleanly
+    signal.signal(signal.SIGINT, lambda *_: engine.stop())
+
+    try:
+        found = engine.run()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if not args.quiet and sys.stderr.isatty():
+        sys.stderr.write("\n")
+    snapshot = engine.snapshot()
+    status(f"Scan complete. {found} channels found, "
+           f"{snapshot['joins']} joins at {snapshot['join_rate']:.0f}/s.")
+
+    if args.metrics:
+        metrics = engine.metrics_snapshot()
+        for line in summary(metrics):
+            status(line)
+        if args.metrics == "-":
+            sys.stderr.write(prometheus_text(metrics))
+        else:
+            try:
+                with open(args.metrics, "w", encoding="utf-8") as f:
+                    f.write(prometheus_text(metrics))
+            except OSError as e:
+                print(f"Could not write metrics: {e}", file=sys.stderr)
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# core/serve.py
+"""
+Headless HTTP fan-out of discovered channels.
+
+    python -m core.serve                             # the GUI's channel cache
+    python -m core.scan --range 239.255.0.* -o lineup.jsonl
+    python -m core.serve --channels lineup.jsonl --port 8080
+
+Players open http://<host>:8080/playlist.m3u. Each group is joined once
+on this machine, however many players watch it.
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from core.channel_store import ChannelStore, channel_from_dict
+from core.fanout import CLIENT_QUEUE, FanoutServer
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m core.serve",
+                                     description="Relay multicast channels to HTTP clients.")
+    parser.add_argument("--channels", metavar="FILE",
+                        help="JSON lines from python -m core.scan (default: the GUI's channel cache)")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on (default: all)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument("--queue", type=int, default=CLIENT_QUEUE, metavar="DATAGRAMS",
+                        help=f"Datagrams buffered per client before it is dropped (default: {CLIENT_QUEUE})")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No status output on stderr")
+    return parser
+
+
+def load_channels(path):
+    """Channels from a JSON lines scan result; bad lines are skipped."""
+    channels = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                channels.append(channel_from_dict(json.loads(line)))
+            except (TypeError, ValueError):
+                continue
+    return channels
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    try:
+        channels = load_channels(args.channels) if args.channels else ChannelStore().load()
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if not channels:
+        print("No channels to serve; run a scan first.", file=sys.stderr)
+        return 2
+
+    def status(message):
+        if not args.quiet:
+            print(message, file=sys.stderr)
+
+    # The relay reads sockets with add_reader(), which the proactor loop lacks
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    server = FanoutServer(channels, args.host, args.port, args.queue, on_status=status)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass  # The groups were left while unwinding
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
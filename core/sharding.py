@@ -0,0 +1,185 @@
+# core/sharding.py
+"""
+Multi-process scanning for very wide custom ranges.
+
+The range is dealt round robin (by /24 block, or by address for narrow
+patterns) into one shard per process. Each child runs its own ProbeEngine
+and socket loop, and streams channels and snapshots back over a queue. The
+parent dedupes channels and merges progress, and it exposes the same
+callbacks and run()/stop() interface as ProbeEngine.
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+from core.engine import ProbeEngine
+from core.metrics import merge_metrics
+from core.pacing import split_limits
+
+
+def default_process_count():
+    return max(1, os.cpu_count() or 1)
+
+
+def _shard_main(index, count, options, results, stop_flag):
+    """Entry point of a shard process."""
+    # Ctrl+C reaches the whole process group; the parent handles it and
+    # stops us through the flag below
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    engine = ProbeEngine(shard=(index, count),
+                         on_channel=lambda channel: results.put(("channel", index, channel)),
+                         on_status=lambda message: results.put(("status", index, message)),
+                         on_snapshot=lambda snapshot: results.put(("snapshot", index, snapshot)),
+                         **options)
+
+    # The parent asks us to stop through a shared flag. It is polled rather
+    # than waited on: a process exiting inside Event.wait() leaves the
+    # event's condition waiting forever for its wake-up acknowledgement.
+    def watch_stop():
+        while not stop_flag.value:
+            time.sleep(0.05)
+        engine.stop()
+
+    threading.Thread(target=watch_stop, daemon=True).start()
+
+    found = 0
+    try:
+        found = engine.run()
+    finally:
+        results.put(("metrics", index, engine.metrics_snapshot()))
+        results.put(("done", index, found))
+
+
+def merge_snapshots(snapshots):
+    """Sums per-shard counters into one snapshot shaped like ProbeEngine.snapshot()."""
+    merged = {"probed": 0, "in_flight": 0, "hits": 0, "channels": 0, "total": 0,
+              "joins": 0, "join_rate": 0.0, "elapsed": 0.0, "eta": None, "event": ""}
+    for snapshot in snapshots:
+        for key in ("probed", "in_flight", "hits", "channels", "total", "joins", "join_rate"):
+            merged[key] += snapshot[key]
+        merged["elapsed"] = max(merged["elapsed"], snapshot["elapsed"])
+        if snapshot["eta"] is not None:
+            merged["eta"] = max(merged["eta"] or 0.0, snapshot["eta"])
+        if snapshot["event"]:
+            merged["event"] = snapshot["event"]
+
+    merged["percent"] = 0
+    if merged["total"] > 0:
+        merged["percent"] = min(100, int(merged["probed"] * 100 / merged["total"]))
+    return merged
+
+
+class ShardedScan:
+    """
+    Drop-in for ProbeEngine (custom ranges only) that spreads the range over
+    `processes` worker processes.
+    """
+
+    def __init__(self, custom_range, processes=None, ports=(1234,), known=None,
+                 tick_interval=0.066, on_channel=None, on_progress=None,
+                 on_status=None, on_snapshot=None, **engine_options):
+        self.custom_range = custom_range
+        self.processes = processes or default_process_count()
+        self.ports = ports
+        self.known = list(known or [])
+        self.tick_interval = tick_interval
+        self.engine_options = engine_options
+
+        self.on_channel = on_channel or (lambda channel: None)
+        self.on_progress = on_progress or (lambda percent: None)
+        self.on_status = on_status or (lambda message: None)
+        self.on_snapshot = on_snapshot or (lambda snapshot: None)
+
+        # Spawn, not fork: the parent may be a multi-threaded Qt process
+        self.context = multiprocessing.get_context("spawn")
+        self.stop_flag = self.context.RawValue("b", 0)
+        self.found_keys = set()
+        self.snapshots = {}
+        self.metrics = {}  # index -> final ScanMetrics snapshot of that shard
+        self.processed = 0
+
+    @property
+    def is_running(self):
+        return not self.stop_flag.value
+
+    def stop(self):
+        self.stop_flag.value = 1
+
+    def snapshot(self):
+        merged = merge_snapshots(self.snapshots.values())
+        merged["channels"] = len(self.found_keys)  # After dedupe
+        return merged
+
+    def metrics_snapshot(self):
+        """Metrics of every shard that has finished, added up."""
+        return merge_metrics(self.metrics.values())
+
+    def publish(self):
+        snapshot = self.snapshot()
+        self.processed = snapshot["probed"]
+        self.on_progress(snapshot["percent"])
+        self.on_snapshot(snapshot)
+
+    def run(self):
+        results = self.context.Queue()
+        workers = []
+        # Join limits are for the whole scan, not per process
+        engine_options = split_limits(self.engine_options, self.processes)
+        for index in range(self.processes):
+            options = dict(engine_options, mode="custom", custom_range=self.custom_range,
+                           ports=self.ports, tick_interval=self.tick_interval,
+                           # Known groups are revalidated once, by the first shard
+                           known=self.known if index == 0 else None)
+            if options.get("profile"):
+                options["profile"] = f"{options['profile']}.{index}"
+            proc = self.context.Process(target=_shard_main, daemon=True,
+                                        args=(index, self.processes, options, results, self.stop_flag))
+            proc.start()
+            workers.append(proc)
+
+        self.on_status(f"Scanning {self.custom_range} with {self.processes} processes...")
+
+        running = set(range(self.processes))
+        next_tick = time.monotonic()
+        try:
+            while running:
+                try:
+                    kind, index, payload = results.get(timeout=self.tick_interval)
+                except queue.Empty:
+                    kind = None
+                    # A shard that died without reporting must not hang us
+                    for i in list(running):
+                        if not workers[i].is_alive():
+                            running.discard(i)
+
+                if kind == "channel":
+                    # Shards may overlap on known groups: report each service once
+                    if payload.key not in self.found_keys:
+                        self.found_keys.add(payload.key)
+                        self.on_channel(payload)
+                elif kind == "snapshot":
+                    self.snapshots[index] = payload
+                elif kind == "metrics":
+                    self.metrics[index] = payload
+                elif kind == "status":
+                    self.on_status(payload)
+                elif kind == "done":
+                    running.discard(index)
+
+                now = time.monotonic()
+                if now >= next_tick:
+                    self.publish()
+                    next_tick = now + self.tick_interval
+        finally:
+            self.stop_flag.value = 1
+            for proc in workers:
+                proc.join(timeout=2.0)
+                if proc.is_alive():
+                    proc.terminate()
+
+        self.publish()
+        return len(self.found_keys)
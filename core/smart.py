@@ -0,0 +1,180 @@
+# core/smart.py
+"""
+Address ordering for Smart Scan.
+
+Lineups cluster: a live group usually has live neighbours in its /24, and
+busy /24s usually sit next to each other. SmartQueue keeps one entry per
+/24 block in a priority queue scored by hit density,
+
+    score = (hits + prior + BASE_PRIOR) / (probed + 1)
+
+and always probes the next address of the best block. A block starts out
+offering its beacon (.1) only. The first hit anywhere in it opens the whole
+block, and lends weight to the two blocks on either side together with the
+offset that answered. A closed block tries those offsets first, and once
+enough weight has built up (a handful of hits next door) every 16th address
+of it as well, so a lineup that runs on into the next /24 at .10 is found
+without a .1 there. Groups from earlier scans seed the priors of their
+blocks the same way.
+
+Every address ever offered is eventually probed, so the order changes and
+the coverage does not: it only grows by the neighbour offsets.
+"""
+import heapq
+
+from core.addresses import ip_to_int
+
+# Every block's odds before anything is known: an open block that stays
+# silent falls behind the untried beacons after a few dozen probes
+BASE_PRIOR = 0.05
+# Weight a hit lends to the blocks 1 and 2 away (divided by the distance)
+NEIGHBOUR_WEIGHT = 0.5
+# Prior a group from a previous scan gives its own block
+HISTORY_WEIGHT = 1.0
+# A closed block is sampled once its prior reaches this, and it goes no
+# higher: a silent block is only worth so much however busy its neighbours
+SAMPLE_PRIOR = 2.0
+# Any run of this many consecutive live groups has one in the sample
+SAMPLE_STRIDE = 16
+# Offsets from hits next door a closed block will queue
+MAX_OFFERS = 8
+NEIGHBOUR_DISTANCE = 2
+
+
+class _Block:
+    """One /24 and the addresses of it that are still to be probed."""
+    __slots__ = ("base", "order", "hits", "prior", "probed", "opened", "sampled", "offers", "cursor",
+                 "version")
+
+    def __init__(self, base, order):
+        self.base = base
+        self.order = order  # Ties go to the block created first, i.e. beacon order
+        self.hits = 0
+        self.prior = 0.0
+        self.probed = 0
+        self.opened = False
+        self.sampled = False
+        self.offers = []  # Offsets to try before the sweep, in order
+        self.cursor = 1  # Next offset of the sweep once opened
+        self.version = 0
+
+    @property
+    def score(self):
+        return (self.hits + self.prior + BASE_PRIOR) / (self.probed + 1)
+
+    def offer(self, offset):
+        """Queues one offset of a closed block. Returns True if it is new."""
+        if self.opened or offset in self.offers or len(self.offers) >= MAX_OFFERS:
+            return False
+        self.offers.append(offset)
+        return True
+
+    def sample(self):
+        """Queues every SAMPLE_STRIDE-th offset once. Returns the number added."""
+        if self.opened or self.sampled:
+            return 0
+        self.sampled = True
+        added = [offset for offset in range(SAMPLE_STRIDE // 2, 256, SAMPLE_STRIDE)
+                 if offset not in self.offers]
+        self.offers.extend(added)
+        return len(added)
+
+    def next_address(self, visited):
+        """Next unvisited address of the block (marking it visited), or None."""
+        while self.offers:
+            addr = self.base | self.offers.pop(0)
+            if visited.add(addr):
+                return addr
+        while self.opened and self.cursor < 256:
+            addr = self.base | self.cursor
+            self.cursor += 1
+            if visited.add(addr):
+                return addr
+        return None
+
+
+class SmartQueue:
+    """
+    Hands out smart scan addresses (as integers) best block first.
+    `beacons` seeds the blocks in the order they are swept when nothing
+    has been found yet; `history` is a list of group IPs from earlier scans.
+    """
+
+    def __init__(self, beacons, history=()):
+        self.blocks = {}  # base -> _Block
+        self.heap = []
+        self.total = 0  # Addresses offered so far, for the progress estimate
+
+        for addr in beacons:
+            block = self.block(addr & 0xFFFFFF00)
+            self.total += block.offer(addr & 0xFF)
+        for ip in history:
+            addr = ip_to_int(ip)
+            block = self.block(addr & 0xFFFFFF00)
+            self.total += self.raise_prior(block, HISTORY_WEIGHT)
+            self.total += self.boost_neighbours(block, addr & 0xFF)
+
+    def block(self, base):
+        block = self.blocks.get(base)
+        if block is None:
+            block = self.blocks[base] = _Block(base, len(self.blocks))
+            self.push(block)
+        return block
+
+    def push(self, block):
+        # Scores change in place: older heap entries are skipped by version
+        block.version += 1
+        heapq.heappush(self.heap, (-block.score, block.order, block.version, block))
+
+    def pop(self, visited):
+        """Next address to probe, or None when every block is exhausted."""
+        while self.heap:
+            _, _, version, block = heapq.heappop(self.heap)
+            if version != block.version:
+                continue
+            addr = block.next_address(visited)
+            if addr is None:
+                continue
+            block.probed += 1
+            self.push(block)
+            return addr
+        return None
+
+    def hit(self, addr):
+        """
+        Records a live group. Returns (opened, added): whether this hit opened
+        its block, and how many addresses that queued in all.
+        """
+        block = self.block(addr & 0xFFFFFF00)
+        block.hits += 1
+        opened = not block.opened
+        added = self.open(block) + self.boost_neighbours(block, addr & 0xFF)
+        self.push(block)
+        return opened, added
+
+    def open(self, block):
+        """Queues the whole block. Returns the number of addresses added."""
+        if block.opened:
+            return 0
+        block.opened = True
+        # Offers still queued go first, then the sweep skips what is visited
+        return max(0, 255 - block.probed - len(block.offers))
+
+    def raise_prior(self, block, weight):
+        block.prior = min(SAMPLE_PRIOR, block.prior + weight)
+        added = block.sample() if block.prior >= SAMPLE_PRIOR else 0
+        self.push(block)
+        return added
+
+    def boost_neighbours(self, block, offset):
+        """Lends weight and `offset` to the blocks either side in the same /16."""
+        added = 0
+        third = (block.base >> 8) & 0xFF
+        for distance in range(1, NEIGHBOUR_DISTANCE + 1):
+            for step in (-distance, distance):
+                if not 0 <= third + step <= 255:
+                    continue
+                neighbour = self.block(block.base + (step << 8))
+                added += neighbour.offer(offset)
+                added += self.raise_prior(neighbour, NEIGHBOUR_WEIGHT / distance)
+        return added
@@ -0,0 +1,146 @@
+# core/ts.py
+"""
+MPEG-TS packet framing.
+
+Instead of testing every byte for 0x47, we lock onto the 188-byte packet grid
+once and then read whole columns of header bytes with strided slices. The
+per-byte search is only used to resync after a corrupt or truncated packet.
+"""
+
+TS_PACKET_SIZE = 188
+SYNC_BYTE = 0x47
+
+# Consecutive sync bytes (one per packet) needed before we trust an alignment
+SYNC_LOCK_PACKETS = 3
+
+# The PCR counts a 27 MHz clock and wraps with its 33 bit base
+PCR_CLOCK = 27_000_000
+PCR_WRAP = (1 << 33) * 300
+
+_SYNC = bytes([SYNC_BYTE])
+
+
+def _column(data, start, stop):
+    """One header byte of every packet in [start, stop) as a bytes-like object."""
+    column = data[start:stop:TS_PACKET_SIZE]
+    if isinstance(column, memoryview):
+        return column.tobytes()
+    return column
+
+
+def _find_sync_byte(data, start):
+    find = getattr(data, "find", None)
+    if find is not None:
+        return find(_SYNC, start)
+    # memoryview has no find(); this only runs while resyncing
+    for i in range(start, len(data)):
+        if data[i] == SYNC_BYTE:
+            return i
+    return -1
+
+
+def find_sync(data, start=0):
+    """
+    Returns the offset of the first packet boundary at or after `start`,
+    or -1 if there is no whole packet left in the buffer.
+    """
+    end = len(data)
+    i = _find_sync_byte(data, start)
+
+    while 0 <= i <= end - TS_PACKET_SIZE:
+        # Check the following sync bytes at a 188 stride (as many as fit)
+        count = min(SYNC_LOCK_PACKETS, (end - i) // TS_PACKET_SIZE)
+        if _column(data, i, i + count * TS_PACKET_SIZE) == _SYNC * count:
+            return i
+        i = _find_sync_byte(data, i + 1)
+
+    return -1
+
+
+def _pid_filter_table(pids):
+    """Translation table that maps the low PID byte of wanted PIDs to 0x01."""
+    table = bytearray(256)
+    for pid in pids:
+        table[pid & 0xFF] = 1
+    return bytes(table)
+
+
+def iter_packets(data, pids=None):
+    """
+    Yields (offset, pid) for every whole TS packet in `data`.
+    If `pids` is given, only packets carrying one of those PIDs are yielded.
+    """
+    end = len(data)
+    wanted = None
+    if pids is not None:
+        wanted = set(pids)
+        table = _pid_filter_table(wanted)
+
+    pos = find_sync(data)
+    while pos >= 0:
+        count = (end - pos) // TS_PACKET_SIZE
+        stop = pos + count * TS_PACKET_SIZE
+
+        # 1. How many packets in a row keep the alignment?
+        syncs = _column(data, pos, stop)
+        run = count - len(syncs.lstrip(_SYNC))
+        stop = pos + run * TS_PACKET_SIZE
+
+        # 2. Pull the PID bytes of the whole run in one go
+        # Header: [Sync] [TEI/PUSI/Pri/PID_H] [PID_L] [Scram/Adapt/Cont]
+        pid_hi = _column(data, pos + 1, stop)
+        pid_lo = _column(data, pos + 2, stop)
+
+        if wanted is None:
+            for k in range(run):
+                yield pos + k * TS_PACKET_SIZE, ((pid_hi[k] & 0x1F) << 8) | pid_lo[k]
+        else:
+            # Only visit packets whose low PID byte could match
+            hits = pid_lo.translate(table)
+            k = hits.find(b'\x01')
+            while k >= 0:
+                pid = ((pid_hi[k] & 0x1F) << 8) | pid_lo[k]
+                if pid in wanted:
+                    yield pos + k * TS_PACKET_SIZE, pid
+                k = hits.find(b'\x01', k + 1)
+
+        if run == count:
+            break
+
+        # 3. Lost sync: fall back to a byte search for the next boundary
+        pos = find_sync(data, stop + 1)
+
+
+def packet_offsets(data, pids=None):
+    """
+    Offsets of the whole TS packets in `data`. A datagram of whole packets
+    from its first byte (the usual case) is a plain stride, ~5x cheaper than
+    the generic walk; it is not filtered, so callers still check the PID.
+    Anything else goes through iter_packets() with `pids`.
+    """
+    end = len(data)
+    if end and end % TS_PACKET_SIZE == 0 and data[0] == SYNC_BYTE:
+        return range(0, end, TS_PACKET_SIZE)
+    return [offset for offset, _ in iter_packets(data, pids)]
+
+
+def is_random_access(data, offset):
+    """True if the packet at `offset` has the random_access_indicator set."""
+    return bool(data[offset + 3] & 0x20 and data[offset + 4] and data[offset + 5] & 0x40)
+
+
+def has_pcr(data, offset):
+    """True if the packet at `offset` carries a PCR (read it at offset + 6)."""
+    return bool(data[offset + 3] & 0x20 and data[offset + 4] >= 7 and data[offset + 5] & 0x10)
+
+
+def pcr_delta(pcr, last_pcr):
+    """Seconds of stream time from `last_pcr` to `pcr`, across the wrap."""
+    return ((pcr - last_pcr) % PCR_WRAP) / PCR_CLOCK
+
+
+def read_pcr(data, at):
+    """The 27 MHz PCR whose 6 bytes start at `at` (just after the adaptation field flags)."""
+    base = ((data[at] << 25) | (data[at + 1] << 17) | (data[at + 2] << 9)
+            | (data[at + 3] << 1) | (data[at + 4] >> 7))
+    return base * 300 + (((data[at + 4] & 0x01) << 8) | data[at + 5])
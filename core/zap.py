@@ -0,0 +1,358 @@
+# core/zap.py
+"""
+Pre-joined buffer relay for fast channel changes.
+
+Joining a group from VLC means waiting for the IGMP join, then the next
+PAT/PMT, then the next keyframe, which adds up to 1-3 s per zap. The relay
+stays joined to the channels around the current one and keeps, per stream,
+the latest PAT/PMT packets plus everything since the last random access
+point. VLC then plays http://127.0.0.1:<port>/... which starts with a burst
+of PSI + the buffered GOP and continues live, so decoding can start at once.
+"""
+import queue
+import selectors
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from urllib.parse import parse_qs
+
+from core.interfaces import join_group, leave_group, list_interfaces
+from core.monitor import stream_key
+from core.psi import PAT_PID
+from core.ringbuf import SLOT_SIZE
+from core.ts import TS_PACKET_SIZE, is_random_access, packet_offsets
+
+# MPEG-1/2, MPEG-4 part 2, H.264 and HEVC video
+VIDEO_STREAM_TYPES = {0x01, 0x02, 0x10, 0x1B, 0x24}
+# A GOP longer than this is dropped rather than buffered without bound
+MAX_GOP_BYTES = 8 * 1024 * 1024
+# Datagrams queued for a client before it counts as too slow and is dropped
+CLIENT_QUEUE = 512
+
+
+def random_access_pids(streams, pcr_pids=()):
+    """
+    PIDs whose random_access_indicator marks a keyframe: the video PIDs, or
+    the PCR PIDs when there is no known video. Audio frames are all flagged
+    as random access points, so they must not count.
+    """
+    pids = {pid for stream_type, pid in streams if stream_type in VIDEO_STREAM_TYPES}
+    return pids or {pid for pid in pcr_pids if pid is not None}
+
+
+def stream_path(channel):
+    """URL path of a channel's stream on the relay."""
+    return f"/{channel.interface or '-'}/{channel.ip}/{channel.port}"
+
+
+def program_path(channel):
+    """stream_path() plus the program, so the burst starts at that program's keyframe."""
+    if channel.service_id is None:
+        return stream_path(channel)
+    return f"{stream_path(channel)}?program={channel.service_id}"
+
+
+def program_from_query(query):
+    """The program number of a program_path() query string, or None. Raises ValueError."""
+    values = parse_qs(query).get("program")
+    return int(values[0]) if values else None
+
+
+class GopBuffer:
+    """
+    Latest PSI of one stream and every datagram since the last random access
+    point of each of its programs. In an MPTS every program keeps its own
+    RAP: a keyframe of a sibling service says nothing about when the one
+    being watched can be decoded, so burst() starts at the requested
+    program's keyframe.
+    """
+
+    def __init__(self, channels):
+        self.psi_pids = {PAT_PID}
+        self.programs = set()  # service_ids tracked so far
+        self.rap_programs = {}  # pid -> [service_id, ...] whose keyframes it carries
+        self.any_programs = []  # Programs with no known video or PCR PID: any RAP will do
+        self.add_channels(channels)
+
+        self.psi = {}  # pid -> last packet starting a section on it
+        self.datagrams = deque()  # Everything since the oldest RAP still tracked
+        self.first = 0  # Sequence number of datagrams[0]
+        self.buffered = 0  # Bytes in datagrams
+        self.raps = {}  # service_id -> (sequence number, offset) of its last RAP
+
+    def add_channels(self, channels):
+        """Starts tracking the PMT and keyframes of services not seen before."""
+        for channel in channels:
+            if channel.service_id in self.programs:
+                continue
+            self.programs.add(channel.service_id)
+            if channel.pmt_pid is not None:
+                self.psi_pids.add(channel.pmt_pid)
+            pids = random_access_pids(channel.streams, [channel.pcr_pid])
+            for pid in pids:
+                self.rap_programs.setdefault(pid, []).append(channel.service_id)
+            if not pids:
+                self.any_programs.append(channel.service_id)
+
+    def feed(self, data):
+        found = {}
+        for offset in packet_offsets(data):
+            pid = ((data[offset + 1] & 0x1F) << 8) | data[offset + 2]
+            if pid in self.psi_pids:
+                if data[offset + 1] & 0x40:
+                    self.psi[pid] = data[offset:offset + TS_PACKET_SIZE]
+            elif is_random_access(data, offset):
+                for program in self.rap_programs.get(pid, ()):
+                    found.setdefault(program, offset)
+                for program in self.any_programs:
+                    found.setdefault(program, offset)
+
+        if not found and not self.raps:
+            return  # Nothing is decodable from here yet
+
+        sequence = self.first + len(self.datagrams)
+        self.datagrams.append(data)
+        self.buffered += len(data)
+        for program, offset in found.items():
+            self.raps[program] = (sequence, offset)
+        if found or self.buffered > MAX_GOP_BYTES:
+            self.trim()
+
+    def trim(self):
+        """Drops what no program needs; a GOP too long to buffer is given up."""
+        while self.raps:
+            oldest = min(sequence for sequence, _ in self.raps.values())
+            while self.first < oldest:
+                self.buffered -= len(self.datagrams.popleft())
+                self.first += 1
+            if self.buffered <= MAX_GOP_BYTES:
+                return
+            self.raps = {program: rap for program, rap in self.raps.items() if rap[0] != oldest}
+        self.first += len(self.datagrams)
+        self.datagrams.clear()
+        self.buffered = 0
+
+    def ready(self, program=None):
+        """True once `program` (a service_id; None for any) can start at a keyframe."""
+        return program in self.raps if program is not None else bool(self.raps)
+
+    def burst(self, program=None):
+        """
+        What a new viewer gets first: PSI, then the stream from the last
+        keyframe of `program` up to now. Unknown or None starts at the oldest
+        tracked keyframe, which covers every program that has one.
+        """
+        if program in self.raps:
+            sequence, offset = self.raps[program]
+        elif self.raps:
+            sequence, offset = min(self.raps.values())
+        else:
+            return b"".join(self.psi.values())
+        index = sequence - self.first
+        return b"".join([*self.psi.values(), self.datagrams[index][offset:],
+                         *islice(self.datagrams, index + 1, None)])
+
+
+class _Client:
+    __slots__ = ("queue", "alive")
+
+    def __init__(self):
+        self.queue = queue.Queue(CLIENT_QUEUE)
+        self.alive = True
+
+    def push(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except queue.Full:
+            self.alive = False
+
+
+class _RelayStream:
+    __slots__ = ("key", "sock", "mreq", "buffer", "clients")
+
+    def __init__(self, key, sock, mreq, buffer):
+        self.key = key
+        self.sock = sock
+        self.mreq = mreq
+        self.buffer = buffer
+        self.clients = []
+
+
+class _ZapHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        relay = self.server.relay
+        path, _, query = self.path.partition("?")
+        try:
+            interface, ip, port = path.strip("/").split("/")
+            key = ("" if interface == "-" else interface, ip, int(port))
+            program = program_from_query(query)
+        except ValueError:
+            self.send_error(404)
+            return
+
+        subscription = relay.subscribe(key, program)
+        if subscription is None:
+            self.send_error(404)
+            return
+        burst, client = subscription
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp2t")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            self.wfile.write(burst)
+
+            while client.alive and relay.is_running:
+                try:
+                    chunks = [client.queue.get(timeout=1.0)]
+                except queue.Empty:
+                    continue
+                # Write whatever piled up in one go
+                while len(chunks) < 64:
+                    try:
+                        chunks.append(client.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self.wfile.write(b"".join(chunks))
+        except OSError:
+            pass  # Player went away
+        finally:
+            relay.unsubscribe(key, client)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ZapRelay:
+    """
+    Keeps up to `max_streams` groups joined and serves them over local HTTP.
+
+    prefetch(channels) says which channels to keep warm (the current one and
+    its neighbours); url_for(channel) returns the relay URL once that
+    channel's stream has a buffered GOP, or None to fall back to direct UDP.
+    """
+
+    def __init__(self, max_streams=8, host="127.0.0.1", port=0):
+        self.max_streams = max_streams
+        self.is_running = True
+
+        self.lock = threading.Lock()
+        self.streams = {}  # (interface, ip, port) -> _RelayStream
+        self.wanted = None  # Latest prefetch() request, applied by the relay thread
+        self.interfaces = {interface.name: interface for interface in list_interfaces()}
+
+        self.server = ThreadingHTTPServer((host, port), _ZapHandler)
+        self.server.daemon_threads = True
+        self.server.relay = self
+        self.host, self.port = self.server.server_address[:2]
+        self.threads = []
+
+    def start(self):
+        for target in (self.server.serve_forever, self.run):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.is_running = False
+        self.server.shutdown()
+        self.server.server_close()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+
+    def prefetch(self, channels):
+        """Keep these channels joined and buffered, most important first."""
+        with self.lock:
+            self.wanted = list(channels)
+
+    def url_for(self, channel):
+        with self.lock:
+            stream = self.streams.get(stream_key(channel))
+            if stream is None or not stream.buffer.ready(channel.service_id):
+                return None
+        return f"http://{self.host}:{self.port}{program_path(channel)}"
+
+    def subscribe(self, key, program=None):
+        with self.lock:
+            stream = self.streams.get(key)
+            if stream is None:
+                return None
+            client = _Client()
+            stream.clients.append(client)
+            return stream.buffer.burst(program), client
+
+    def unsubscribe(self, key, client):
+        client.alive = False
+        with self.lock:
+            stream = self.streams.get(key)
+            if stream is not None and client in stream.clients:
+                stream.clients.remove(client)
+
+    def apply_wanted(self, selector):
+        with self.lock:
+            wanted, self.wanted = self.wanted, None
+        if wanted is None:
+            return
+
+        groups = {}
+        for channel in wanted:
+            key = stream_key(channel)
+            if key in groups or len(groups) < self.max_streams:
+                groups.setdefault(key, []).append(channel)
+
+        with self.lock:
+            # Leave what is no longer wanted, unless somebody is still watching it
+            for key, stream in list(self.streams.items()):
+                if key not in groups and not stream.clients:
+                    selector.unregister(stream.sock)
+                    leave_group(stream.sock, stream.mreq)
+                    del self.streams[key]
+
+            for key, channels in groups.items():
+                if key in self.streams:
+                    # Services of a joined MPTS that were not prefetched before
+                    self.streams[key].buffer.add_channels(channels)
+                    continue
+                name, ip, port = key
+                try:
+                    sock, mreq = join_group(ip, port, self.interfaces.get(name) if name else None)
+                except OSError:
+                    continue
+                stream = self.streams[key] = _RelayStream(key, sock, mreq, GopBuffer(channels))
+                selector.register(sock, selectors.EVENT_READ, stream)
+
+    def run(self):
+        selector = selectors.DefaultSelector()
+        try:
+            while self.is_running:
+                self.apply_wanted(selector)
+                if not self.streams:
+                    time.sleep(0.05)
+                    continue
+
+                for key, _ in selector.select(0.1):
+                    self.read_stream(key.data)
+        finally:
+            with self.lock:
+                for stream in self.streams.values():
+                    leave_group(stream.sock, stream.mreq)
+                self.streams = {}
+            selector.close()
+
+    def read_stream(self, stream):
+        # Datagrams are kept in the GOP buffer, so each one is its own bytes object
+        for _ in range(64):
+            try:
+                data = stream.sock.recv(SLOT_SIZE)
+            except OSError:
+                return  # Drained (BlockingIOError) or the socket went away
+
+            with self.lock:
+                stream.buffer.feed(data)
+                if stream.clients:
+                    for client in stream.clients:
+                        client.push(data)
+                    stream.clients = [c for c in stream.clients if c.alive]
@@ -0,0 +1,125 @@
+# test/pystreamer/bench.py
+"""
+Scan throughput benchmark.
+
+Starts the simulator in a child process, runs the headless ProbeEngine over
+a range that mixes live and silent groups, and reports:
+
+  * groups/sec           - groups probed (live or silent) per wall-clock second
+  * time to first/last   - seconds from start until the first/last channel
+  * CPU per group        - scanner process CPU time divided by groups probed
+  * coverage             - channels found vs. channels simulated
+
+    python test/pystreamer/bench.py --groups 200 --range 239.255.1.* --window 128
+    python test/pystreamer/bench.py --json results.json --min-rate 500
+
+With --min-rate the exit status is 1 when throughput drops below the given
+groups/sec, so it can gate a CI job.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from core.addresses import pattern_size  # noqa: E402
+from core.engine import ProbeEngine  # noqa: E402
+
+
+def start_simulator(args):
+    cmd = [sys.executable, os.path.join(ROOT, "test", "pystreamer", "simulator.py"),
+           "--groups", str(args.groups), "--range", args.pattern,
+           "--services", str(args.services), "--bitrate", args.bitrate,
+           "--port", str(args.port)]
+    if args.interface:
+        cmd += ["--interface", args.interface]
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith("ready"):
+        proc.kill()
+        raise RuntimeError("simulator failed to start")
+    return proc
+
+
+def run_once(args):
+    found = []
+    start = time.perf_counter()
+
+    def on_channel(channel):
+        found.append((time.perf_counter() - start, channel))
+
+    engine = ProbeEngine(mode="custom", custom_range=args.pattern, ports=[args.port],
+                         max_inflight=args.window, probe_timeout=args.probe_timeout,
+                         hunt_timeout=args.hunt_timeout, on_channel=on_channel)
+
+    cpu_start = time.process_time()
+    engine.run()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - start
+
+    probed = max(1, engine.processed)
+    return {
+        "groups_probed": engine.processed,
+        "wall_s": round(wall, 3),
+        "groups_per_s": round(probed / wall, 1),
+        "first_channel_s": round(found[0][0], 3) if found else None,
+        "last_channel_s": round(found[-1][0], 3) if found else None,
+        "cpu_ms_per_group": round(cpu * 1000 / probed, 3),
+        "channels_found": len(found),
+        "channels_expected": args.groups * args.services,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scanner throughput against the loopback simulator.")
+    parser.add_argument("--groups", type=int, default=200, help="Live groups to simulate (default: 200)")
+    parser.add_argument("--range", dest="pattern", default="239.255.1.*",
+                        help="Range to scan; live groups are spread over it (default: 239.255.1.*)")
+    parser.add_argument("--services", type=int, default=1, help="Services per group")
+    parser.add_argument("--bitrate", default="500k", help="Per-group simulator bitrate")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--interface", help="Local address the simulator sends from")
+    parser.add_argument("--window", type=int, default=128, help="Scanner probe window")
+    parser.add_argument("--probe-timeout", type=float, default=0.1)
+    parser.add_argument("--hunt-timeout", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=1, help="Number of scans to run")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--min-rate", type=float, help="Fail if groups/sec falls below this")
+    args = parser.parse_args(argv)
+
+    if args.groups > pattern_size(args.pattern):
+        parser.error("more groups than addresses in --range")
+
+    sim = start_simulator(args)
+    try:
+        # Give every group time to send its first PSI cycle
+        time.sleep(0.5)
+        results = [run_once(args) for _ in range(args.repeat)]
+    finally:
+        sim.terminate()
+        sim.wait()
+
+    for n, r in enumerate(results, 1):
+        print(f"run {n}: {r['groups_probed']} groups in {r['wall_s']}s "
+              f"({r['groups_per_s']} groups/s), first channel {r['first_channel_s']}s, "
+              f"last {r['last_channel_s']}s, {r['cpu_ms_per_group']} ms CPU/group, "
+              f"found {r['channels_found']}/{r['channels_expected']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "runs": results}, f, indent=2)
+
+    worst = min(r["groups_per_s"] for r in results)
+    if args.min_rate is not None and worst < args.min_rate:
+        print(f"FAIL: {worst} groups/s is below --min-rate {args.min_rate}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# test/pystreamer/simulator.py
+"""
+Pure-Python multicast TS simulator.
+
+Sends synthetic MPEG-TS (valid PAT/PMT/SDT, PCRs, random access points) to
+hundreds of groups at a configurable bitrate. The default TTL of 0 keeps
+every datagram on this host: the kernel loops it back to local listeners
+but never puts it on the wire, so no network is needed.
+
+    python test/pystreamer/simulator.py --groups 200 --range 239.255.1.* --bitrate 500k
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.addresses import int_to_ip, iter_pattern, pattern_size  # noqa: E402
+from tsmux import PACKETS_PER_DATAGRAM, TS_PACKET_SIZE, TSMux  # noqa: E402
+
+DATAGRAM_BITS = PACKETS_PER_DATAGRAM * TS_PACKET_SIZE * 8
+
+
+def parse_bitrate(text):
+    """'500k', '2M' or a plain number of bits per second."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    if scale != 1:
+        text = text[:-1]
+    return int(float(text) * scale)
+
+
+def pick_groups(pattern, count):
+    """Spreads `count` live groups evenly over the addresses of a range pattern."""
+    size = pattern_size(pattern)
+    if count <= 0 or size == 0:
+        return []
+    step = max(1, size // count)
+    groups = []
+    for i, addr in enumerate(iter_pattern(pattern)):
+        if i % step == 0:
+            groups.append(int_to_ip(addr))
+            if len(groups) == count:
+                break
+    return groups
+
+
+def build_lineup(groups, services_per_group=1):
+    """Returns [(ip, TSMux)] with uniquely named services on every group."""
+    lineup = []
+    for n, ip in enumerate(groups):
+        services = [(sid, f"Sim {ip} #{sid}", f"Simulator {n % 8}")
+                    for sid in range(1, services_per_group + 1)]
+        lineup.append((ip, TSMux(services, ts_id=n + 1)))
+    return lineup
+
+
+class _Group:
+    __slots__ = ("ip", "mux", "sent", "next_psi", "next_pcr", "next_gop")
+
+    def __init__(self, ip, mux):
+        self.ip = ip
+        self.mux = mux
+        self.sent = 0
+        self.next_psi = 0.0
+        self.next_pcr = 0.0
+        self.next_gop = 0.0
+
+
+class MulticastSimulator:
+    def __init__(self, lineup, port=1234, bitrate=500_000, psi_interval=0.1,
+                 pcr_interval=0.04, gop_interval=0.5, ttl=0, interface=None):
+        self.groups = [_Group(ip, mux) for ip, mux in lineup]
+        self.port = port
+        self.rate = bitrate / DATAGRAM_BITS  # Datagrams per second per group
+        self.psi_interval = psi_interval
+        self.pcr_interval = pcr_interval
+        self.gop_interval = gop_interval
+        self.datagrams_sent = 0
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        if interface:
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+
+        self.is_running = False
+        self.thread = None
+
+    def start(self):
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        if self.thread:
+            self.thread.join()
+        self.sock.close()
+
+    def run(self):
+        start = time.monotonic()
+        pending = {group.ip: [] for group in self.groups}
+
+        while self.is_running:
+            now = time.monotonic()
+            elapsed = now - start
+            due = int(elapsed * self.rate) + 1
+
+            for group in self.groups:
+                queue = pending[group.ip]
+                while group.sent < due:
+                    # PSI is repeated like a real encoder does
+                    if elapsed >= group.next_psi:
+                        queue.extend(group.mux.psi_packets())
+                        group.next_psi = elapsed + self.psi_interval
+
+                    packets = queue[:PACKETS_PER_DATAGRAM]
+                    del queue[:PACKETS_PER_DATAGRAM]
+                    while len(packets) < PACKETS_PER_DATAGRAM:
+                        pcr = None
+                        random_access = elapsed >= group.next_gop
+                        if elapsed >= group.next_pcr:
+                            pcr = int(elapsed * 27_000_000)
+                            group.next_pcr = elapsed + self.pcr_interval
+                        if random_access:
+                            group.next_gop = elapsed + self.gop_interval
+                        packets.append(group.mux.video_packet(pcr, random_access))
+
+                    try:
+                        self.sock.sendto(b"".join(packets), (group.ip, self.port))
+                    except OSError:
+                        pass
+                    group.sent += 1
+                    self.datagrams_sent += 1
+
+            time.sleep(max(0.0, 0.005 - (time.monotonic() - now)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Loopback multicast MPEG-TS simulator.")
+    parser.add_argument("--groups", type=int, default=200, help="Number of live groups (default: 200)")
+    parser.add_argument("--range", dest="pattern", default="239.255.1.*",
+                        help="Range the live groups are spread over (default: 239.255.1.*)")
+    parser.add_argument("--services", type=int, default=1, help="Services per group (MPTS if > 1)")
+    parser.add_argument("--bitrate", default="500k", help="Per-group bitrate, e.g. 500k or 4M")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--ttl", type=int, default=0, help="Multicast TTL; 0 never leaves this host")
+    parser.add_argument("--interface", help="Local address to send from (IP_MULTICAST_IF)")
+    parser.add_argument("--duration", type=float, default=0, help="Stop after N seconds (default: run forever)")
+    args = parser.parse_args(argv)
+
+    groups = pick_groups(args.pattern, args.groups)
+    sim = MulticastSimulator(build_lineup(groups, args.services), port=args.port,
+                             bitrate=parse_bitrate(args.bitrate), ttl=args.ttl,
+                             interface=args.interface)
+    sim.start()
+    print(f"ready: {len(groups)} groups on {args.pattern} port {args.port}", flush=True)
+
+    try:
+        if args.duration > 0:
+            time.sleep(args.duration)
+        else:
+            while True:
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# test/pystreamer/tsmux.py
+"""
+Minimal MPEG-TS multiplexer for the simulator.
+
+Produces valid PAT/PMT/SDT/EIT sections (with CRC) and filler elementary stream
+packets carrying PCRs and random access points. Nothing here is decodable
+video; it only needs to look like a real stream to the scanner.
+"""
+import struct
+import time
+
+from core.psi import crc32_mpeg
+
+TS_PACKET_SIZE = 188
+PACKETS_PER_DATAGRAM = 7  # 1316 bytes, what IPTV encoders send
+
+PMT_PID_BASE = 0x100
+VIDEO_PID_BASE = 0x200
+STREAM_TYPE_H264 = 0x1B
+EIT_PID = 0x12
+# Simulated programmes are this long, starting on the hour and half hour
+SLOT_SECONDS = 1800
+
+
+def psi_section(table_id, ext, body, version=0, number=0, last_number=0):
+    """Wraps a table body in a long-form section header and appends the CRC."""
+    length = 5 + len(body) + 4
+    header = bytes([table_id, 0xB0 | (length >> 8), length & 0xFF])
+    header += struct.pack(">H", ext) + bytes([0xC1 | (version << 1), number, last_number])
+    section = header + body
+    return section + struct.pack(">I", crc32_mpeg(section))
+
+
+def pat_section(ts_id, programs):
+    body = b"".join(struct.pack(">HH", number, 0xE000 | pid) for number, pid in programs)
+    return psi_section(0x00, ts_id, body)
+
+
+def pmt_section(program, pcr_pid, streams):
+    body = struct.pack(">HH", 0xE000 | pcr_pid, 0xF000)
+    for stream_type, pid in streams:
+        body += struct.pack(">BHH", stream_type, 0xE000 | pid, 0xF000)
+    return psi_section(0x02, program, body)
+
+
+def sdt_section(ts_id, network_id, services):
+    body = struct.pack(">HB", network_id, 0xFF)
+    for service_id, name, provider in services:
+        provider_b = provider.encode("utf-8")
+        name_b = name.encode("utf-8")
+        desc = bytes([0x01, len(provider_b)]) + provider_b + bytes([len(name_b)]) + name_b
+        desc = bytes([0x48, len(desc)]) + desc
+        # running_status=4 (running), free_CA=0
+        body += struct.pack(">HBH", service_id, 0xFC, 0x8000 | len(desc)) + desc
+    return psi_section(0x42, ts_id, body)
+
+
+def _bcd(value):
+    return ((value // 10) << 4) | (value % 10)
+
+
+def eit_section(table_id, service_id, ts_id, network_id, events, number=0, last_number=0):
+    """events: [(event_id, start as Unix time, duration in seconds, name, text), ...]"""
+    body = struct.pack(">HHBB", ts_id, network_id, last_number, table_id)
+    for event_id, start, duration, name, text in events:
+        days, seconds = divmod(int(start), 86400)
+        hours, rest = divmod(seconds, 3600)
+        d_hours, d_rest = divmod(int(duration), 3600)
+        name_b = name.encode("utf-8")
+        text_b = text.encode("utf-8")
+        desc = b"eng" + bytes([len(name_b) + 1, 0x15]) + name_b + bytes([len(text_b) + 1, 0x15]) + text_b
+        desc = bytes([0x4D, len(desc)]) + desc
+        body += struct.pack(">HH", event_id, days + 40587)
+        body += bytes([_bcd(hours), _bcd(rest // 60), _bcd(rest % 60)])
+        body += bytes([_bcd(d_hours), _bcd(d_rest // 60), _bcd(d_rest % 60)])
+        # running_status=4 (running) for the present event, free_CA=0
+        body += struct.pack(">H", (0x8000 if number == 0 and table_id == 0x4E else 0) | len(desc)) + desc
+    return psi_section(table_id, service_id, body, number=number, last_number=last_number)
+
+
+def guide_sections(ts_id, network_id, services, now=None):
+    """EIT present/following plus a schedule of the next few slots, per service."""
+    slot = int(now if now is not None else time.time()) // SLOT_SECONDS
+    sections = []
+    for service_id, name, _ in services:
+        events = [((slot + i) & 0xFFFF, (slot + i) * SLOT_SECONDS, SLOT_SECONDS,
+                   f"{name} programme {slot + i}", f"Simulated slot {i}") for i in range(6)]
+        sections.append(eit_section(0x4E, service_id, ts_id, network_id, events[:1], 0, 1))
+        sections.append(eit_section(0x4E, service_id, ts_id, network_id, events[1:2], 1, 1))
+        sections.append(eit_section(0x50, service_id, ts_id, network_id, events))
+    return sections
+
+
+def encode_pcr(pcr):
+    """Six byte PCR field from a 27 MHz clock value."""
+    base, ext = divmod(pcr, 300)
+    base &= (1 << 33) - 1
+    value = (base << 15) | (0x3F << 9) | ext
+    return value.to_bytes(6, "big")
+
+
+class TSMux:
+    """Packetizer for one multicast group carrying one or more services."""
+
+    def __init__(self, services, ts_id=1, network_id=1):
+        # services: [(service_id, name, provider), ...]
+        self.services = services
+        self.cc = {}
+
+        self.programs = []
+        self.pmts = {}
+        for i, (service_id, _, _) in enumerate(services):
+            pmt_pid = PMT_PID_BASE + i
+            video_pid = VIDEO_PID_BASE + i
+            self.programs.append((service_id, pmt_pid))
+            self.pmts[pmt_pid] = pmt_section(service_id, video_pid, [(STREAM_TYPE_H264, video_pid)])
+
+        self.video_pids = [VIDEO_PID_BASE + i for i in range(len(services))]
+        self.pat = pat_section(ts_id, self.programs)
+        self.sdt = sdt_section(ts_id, network_id, services)
+        self.eit = guide_sections(ts_id, network_id, services)
+        self.next_video = 0
+
+    def _header(self, pid, pusi, adaptation):
+        cc = self.cc.get(pid, 0)
+        self.cc[pid] = (cc + 1) & 0x0F
+        return bytes([0x47, (0x40 if pusi else 0) | (pid >> 8), pid & 0xFF, (adaptation << 4) | cc])
+
+    def section_packets(self, pid, section):
+        """Splits a section over as many packets as it needs (pointer_field = 0)."""
+        data = b"\x00" + section
+        packets = []
+        pusi = True
+        while data:
+            chunk, data = data[:184], data[184:]
+            packets.append(self._header(pid, pusi, 0x1) + chunk + b"\xff" * (184 - len(chunk)))
+            pusi = False
+        return packets
+
+    def psi_packets(self):
+        packets = self.section_packets(0x00, self.pat)
+        for pmt_pid, section in self.pmts.items():
+            packets += self.section_packets(pmt_pid, section)
+        packets += self.section_packets(0x11, self.sdt)
+        for section in self.eit:
+            packets += self.section_packets(EIT_PID, section)
+        return packets
+
+    def video_packet(self, pcr=None, random_access=False):
+        """One filler ES packet, round robin over the services' video PIDs."""
+        pid = self.video_pids[self.next_video]
+        self.next_video = (self.next_video + 1) % len(self.video_pids)
+
+        if pcr is None and not random_access:
+            return self._header(pid, False, 0x1) + b"\x00" * 184
+
+        flags = 0x40 if random_access else 0x00
+        field = b""
+        if pcr is not None:
+            flags |= 0x10
+            field = encode_pcr(pcr)
+        adaptation = bytes([1 + len(field), flags]) + field
+        payload = b"\x00" * (184 - len(adaptation))
+        return self._header(pid, random_access, 0x3) + adaptation + payload
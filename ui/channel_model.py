@@ -0,0 +1,212 @@
+# ui/channel_model.py
+import time
+
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionViewItem, QApplication
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QSortFilterProxyModel, QRect
+from PyQt5.QtGui import QFont, QColor, QPainter
+from core.monitor import stream_key
+
+ChannelRole = Qt.UserRole  # The core.channel.Channel behind a row
+SearchRole = Qt.UserRole + 1  # Text the type-to-filter box matches against
+HealthRole = Qt.UserRole + 2  # Latest core.monitor report for the row's stream, or None
+GuideRole = Qt.UserRole + 3  # (current, next) programme from the guide store, or None
+
+
+def channel_address(channel):
+    address = f"{channel.ip}:{channel.port}"
+    if channel.service_id is not None:
+        address += f"  ·  Program {channel.service_id}"
+    if channel.interface:
+        address += f"  ·  {channel.interface}"
+    return address
+
+
+def health_summary(report):
+    if report["up"]:
+        return (f"Up  ·  {report['bitrate'] / 1e6:.2f} Mb/s  ·  {report['cc_errors']} CC errors"
+                f"  ·  PCR jitter {report['pcr_jitter_ms']:.1f} ms")
+    if report["last_seen"] is None:
+        return "Down  ·  no data since watching started"
+    return f"Down  ·  last seen {report['last_seen']:.0f}s ago"
+
+
+def _clock(timestamp):
+    return time.strftime("%H:%M", time.localtime(timestamp))
+
+
+def guide_summary(entry):
+    """Now/next lines for a (current, next) pair of guide events."""
+    current, following = entry
+    lines = []
+    if current:
+        end = current["start"] + current["duration"]
+        lines.append(f"Now  {_clock(current['start'])}-{_clock(end)}  {current['name']}")
+    if following:
+        lines.append(f"Next {_clock(following['start'])}  {following['name']}")
+    return "\n".join(lines)
+
+
+class ChannelListModel(QAbstractListModel):
+    """
+    Flat list of channels keyed by Channel.key. Rows are only ever appended in
+    batches, so a scan delivering thousands of results costs one insert
+    notification per batch instead of a widget per row.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.channels = []
+        self.rows = {}  # Channel.key -> row
+        self.health = {}  # core.monitor.stream_key -> report, while watching
+        self.guide = {}  # Channel.key -> (current, next) guide events
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.channels)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        channel = self.channels[index.row()]
+
+        if role == Qt.DisplayRole:
+            return channel.name
+        if role == ChannelRole:
+            return channel
+        if role == HealthRole:
+            return self.health.get(stream_key(channel))
+        if role == GuideRole:
+            return self.guide.get(channel.key)
+        if role == SearchRole:
+            current = (self.guide.get(channel.key) or (None, None))[0]
+            title = current["name"] if current else ""
+            return f"{channel.name} {channel.ip} {channel.provider} {channel.interface} {title}"
+        if role == Qt.ToolTipRole:
+            tip = f"{channel.name}\n{channel_address(channel)}"
+            if channel.provider:
+                tip += f"\n{channel.provider}"
+            report = self.health.get(stream_key(channel))
+            if report is not None:
+                tip += f"\n{health_summary(report)}"
+            entry = self.guide.get(channel.key)
+            if entry is not None:
+                tip += f"\n{guide_summary(entry)}"
+            return tip
+        return None
+
+    def add_channels(self, channels):
+        """Appends new channels in one insert and refreshes the ones already listed."""
+        new = {}
+        for channel in channels:
+            row = self.rows.get(channel.key)
+            if row is not None:
+                self.channels[row] = channel
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+            else:
+                new[channel.key] = channel
+
+        if not new:
+            return
+
+        first = len(self.channels)
+        self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+        for channel in new.values():
+            self.rows[channel.key] = len(self.channels)
+            self.channels.append(channel)
+        self.endInsertRows()
+
+    def update_health(self, health):
+        """Takes the monitor's latest reports; one repaint notification for all rows."""
+        self.health = health
+        if self.channels:
+            self.dataChanged.emit(self.index(0), self.index(len(self.channels) - 1), [HealthRole])
+
+    def update_guide(self, guide):
+        """Takes now/next for every row from the guide store; one notification for all rows."""
+        self.guide = guide
+        if self.channels:
+            self.dataChanged.emit(self.index(0), self.index(len(self.channels) - 1),
+                                  [GuideRole, SearchRole])
+
+    def retain(self, keys):
+        """Drops every channel whose key is not in `keys`."""
+        kept = [c for c in self.channels if c.key in keys]
+        if len(kept) == len(self.channels):
+            return
+        self.beginResetModel()
+        self.channels = kept
+        self.rows = {c.key: row for row, c in enumerate(kept)}
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.channels = []
+        self.rows = {}
+        self.endResetModel()
+
+
+class ChannelFilterModel(QSortFilterProxyModel):
+    """Case-insensitive type-to-filter on name, address, provider and the programme on now."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFilterRole(SearchRole)
+        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+
+class ChannelDelegate(QStyledItemDelegate):
+    """Paints the two-line name / address rows directly, no widgets per row."""
+    ROW_HEIGHT = 55
+    DOT_SIZE = 8
+
+    def paint(self, painter, option, index):
+        channel = index.data(ChannelRole)
+        if channel is None:
+            return
+
+        # Background, selection and hover come from the stylesheet (::item rules)
+        option = QStyleOptionViewItem(option)
+        self.initStyleOption(option, index)
+        option.text = ""
+        widget = option.widget
+        style = widget.style() if widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, option, painter, widget)
+
+        rect = option.rect.adjusted(10, 8, -10, -8)
+        half = rect.height() // 2
+
+        painter.save()
+
+        # Up/down dot while the health monitor is watching
+        report = index.data(HealthRole)
+        if report is not None:
+            dot = self.DOT_SIZE
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor("#48bb78" if report["up"] else "#f56565"))
+            painter.drawEllipse(rect.right() - dot, rect.top() + (half - dot) // 2, dot, dot)
+            rect.setRight(rect.right() - dot - 6)
+
+        name_font = QFont(option.font)
+        name_font.setBold(True)
+        painter.setFont(name_font)
+        painter.setPen(QColor("#e2e8f0"))
+        name_rect = QRect(rect.left(), rect.top(), rect.width(), half)
+        name = painter.fontMetrics().elidedText(channel.name, Qt.ElideRight, rect.width())
+        painter.drawText(name_rect, Qt.AlignLeft | Qt.AlignVCenter, name)
+
+        address_font = QFont(option.font)
+        address_font.setPixelSize(11)
+        painter.setFont(address_font)
+        painter.setPen(QColor("#cbd5e0" if option.state & QStyle.State_Selected else "#718096"))
+        address_rect = QRect(rect.left(), rect.top() + half, rect.width(), rect.height() - half)
+        # What is on now once the guide knows, the address otherwise (both are in the tooltip)
+        current = (index.data(GuideRole) or (None, None))[0]
+        detail = f"{_clock(current['start'])}  {current['name']}" if current else channel_address(channel)
+        detail = painter.fontMetrics().elidedText(detail, Qt.ElideRight, rect.width())
+        painter.drawText(address_rect, Qt.AlignLeft | Qt.AlignVCenter, detail)
+
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
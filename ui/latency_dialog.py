@@ -0,0 +1,52 @@
+# ui/latency_dialog.py
+
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit,
+                             QPushButton, QFileDialog, QMessageBox)
+from PyQt5.QtGui import QFontDatabase
+
+
+class LatencyDialog(QDialog):
+    """Shows the zap timing histogram and saves the raw measurements."""
+
+    def __init__(self, stats, parent=None):
+        super().__init__(parent)
+        self.stats = stats
+        self.setWindowTitle("Zap Latency")
+        self.resize(560, 520)
+
+        layout = QVBoxLayout(self)
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.text)
+
+        buttons = QHBoxLayout()
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+        save_btn = QPushButton("Save...")
+        save_btn.clicked.connect(self.save)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        buttons.addWidget(refresh_btn)
+        buttons.addStretch()
+        buttons.addWidget(save_btn)
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+
+        self.refresh()
+
+    def refresh(self):
+        if self.stats.samples:
+            self.text.setPlainText(self.stats.report())
+        else:
+            self.text.setPlainText("No channel changes measured yet.")
+
+    def save(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Zap Latency", "zap-latency.jsonl",
+                                              "JSON Lines (*.jsonl);;All Files (*)")
+        if not path:
+            return
+        try:
+            self.stats.dump(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Zap Latency", f"Could not save: {e}")
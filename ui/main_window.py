@@ -1,7 +1,8 @@
 # ui/main_window.py
 
-from PyQt5.QtWidgets import QMainWindow, QWidget, QHBoxLayout
+from PyQt5.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QActionGroup
 from assets.styles import DARK_THEME_QSS
+from ui.latency_dialog import LatencyDialog
 from ui.sidebar import Sidebar
 from ui.video_player import VideoPlayer
 
@@ -24,12 +25,13 @@ class IPTVViewer(QMainWindow):
         main_layout.setSpacing(0)
 
         # Components
-        self.create_menu_bar()
-
         self.sidebar = Sidebar()
         self.video_player = VideoPlayer()
 
+        self.create_menu_bar()
+
         # Connect Components
+        self.sidebar.neighbours_changed.connect(self.video_player.set_neighbours)
         self.sidebar.channel_selected.connect(self.video_player.play_stream)
         self.sidebar.status_message.connect(self.update_status)
         self.video_player.status_message.connect(self.update_status)
@@ -43,14 +45,43 @@ class IPTVViewer(QMainWindow):
     def create_menu_bar(self):
         menu = self.menuBar()
         menu.addMenu("File")
-        menu.addMenu("View")
-        menu.addMenu("Settings")
+        view = menu.addMenu("View")
+        view.addAction("Zap Latency...").triggered.connect(self.show_latency)
+        settings = menu.addMenu("Settings")
         menu.addMenu("Help")
 
+        # Each pre-rolled neighbour costs a full decode, so it is opt-in
+        preroll = settings.addMenu("Pre-roll Neighbouring Channels")
+        group = QActionGroup(self)
+        for size, label in ((0, "Off"), (1, "1 Channel"), (2, "2 Channels"), (4, "4 Channels")):
+            action = preroll.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(size == 0)
+            action.triggered.connect(lambda checked, size=size: self.video_player.set_pool_size(size))
+            group.addAction(action)
+
+        # Paces IGMP joins so a scan cannot flood the switches' snooping tables
+        join_rate = settings.addMenu("Scan Join Rate")
+        group = QActionGroup(self)
+        for rate, label in ((None, "Unlimited"), (50, "50 Joins/s"), (200, "200 Joins/s"), (1000, "1000 Joins/s")):
+            action = join_rate.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(rate is None)
+            action.triggered.connect(lambda checked, rate=rate: self.sidebar.set_join_rate(rate))
+            group.addAction(action)
+
     def create_status_bar(self):
         self.status = self.statusBar()
         self.status.showMessage("Ready")
         # Removed "Online" indicator and Version number logic here
 
     def update_status(self, message):
-        self.status.showMessage(message)
\ No newline at end of file
+        self.status.showMessage(message)
+
+    def show_latency(self):
+        LatencyDialog(self.video_player.latency, self).exec_()
+
+    def closeEvent(self, event):
+        self.sidebar.shutdown()
+        self.video_player.shutdown()
+        super().closeEvent(event)
\ No newline at end of file
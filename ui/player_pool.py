@@ -0,0 +1,82 @@
+# ui/player_pool.py
+
+from PyQt5.QtWidgets import QFrame
+
+
+class WarmPlayer:
+    """A media player, the page it renders into and the channel it plays."""
+    __slots__ = ("channel", "player", "screen")
+
+    def __init__(self, channel, player, screen):
+        self.channel = channel
+        self.player = player
+        self.screen = screen
+
+
+class PlayerPool:
+    """
+    Muted media players that pre-roll the channels next to the current one.
+
+    Every player renders into its own page of `stack` (a QStackedLayout), so
+    a zap to a pre-rolled channel is just a page switch: no new join, no
+    waiting for PSI and a keyframe. At most `size` players are kept warm,
+    which bounds the extra decoding work.
+    """
+
+    def __init__(self, stack, start_player, size=0):
+        self.stack = stack
+        # start_player(channel, screen) -> a playing, muted vlc.MediaPlayer
+        self.start_player = start_player
+        self.size = size
+        self.players = {}  # Channel.key -> WarmPlayer
+
+    def new_screen(self):
+        screen = QFrame()
+        screen.setStyleSheet("background-color: black;")
+        self.stack.addWidget(screen)
+        return screen
+
+    def take(self, channel):
+        """Hands out the warm player for `channel`, if there is one."""
+        return self.players.pop(channel.key, None)
+
+    def add(self, warm):
+        """Takes a player back, e.g. the one that was on screen before a zap."""
+        if warm.channel is None or warm.channel.key in self.players:
+            self.release(warm)
+            return
+        warm.player.audio_set_mute(True)
+        self.players[warm.channel.key] = warm
+
+    def refresh(self, channels, current=None):
+        """Keeps exactly the first `size` of `channels` (nearest first) pre-rolled."""
+        wanted = []
+        for channel in channels:
+            if len(wanted) >= self.size:
+                break
+            if channel is not None and channel.key != (current.key if current else None):
+                wanted.append(channel)
+        wanted_keys = {channel.key for channel in wanted}
+
+        for key in [key for key in self.players if key not in wanted_keys]:
+            self.release(self.players.pop(key))
+
+        for channel in wanted:
+            if channel.key not in self.players:
+                screen = self.new_screen()
+                player = self.start_player(channel, screen)
+                self.players[channel.key] = WarmPlayer(channel, player, screen)
+
+    def release(self, warm):
+        warm.player.stop()
+        warm.player.release()
+        self.stack.removeWidget(warm.screen)
+        warm.screen.deleteLater()
+
+    def is_warm(self, player):
+        return any(warm.player is player for warm in self.players.values())
+
+    def clear(self):
+        for warm in self.players.values():
+            self.release(warm)
+        self.players = {}
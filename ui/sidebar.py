@@ -1,15 +1,27 @@
 # ui/sidebar.py
+import sqlite3
 
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-                             QPushButton, QListWidget, QListWidgetItem,
+                             QPushButton, QListView, QAbstractItemView,
                              QProgressBar, QStyle, QLineEdit, QComboBox, QMessageBox)
-from PyQt5.QtCore import Qt, pyqtSignal, QSize
-from core.scanner import ScannerWorker
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from core.addresses import parse_pattern, parse_ports
+from core.channel_store import ChannelStore
+from core.epg_store import EPGStore
+from core.interfaces import list_interfaces
+from core.scanner import GuideWorker, MonitorWorker, ScannerWorker
+from ui.channel_model import ChannelListModel, ChannelFilterModel, ChannelDelegate, ChannelRole
+
+
+# Seconds between two guide collection passes, and between now/next refreshes
+GUIDE_REPEAT = 600
+GUIDE_REFRESH_MS = 30_000
 
 
 class Sidebar(QWidget):
     # Signals
-    channel_selected = pyqtSignal(str, str)  # Emits (name, ip)
+    channel_selected = pyqtSignal(object)  # Emits a core.channel.Channel
+    neighbours_changed = pyqtSignal(list)  # Channels around the selection, nearest first
     status_message = pyqtSignal(str)  # Emits status text for the main window bar
 
     def __init__(self, parent=None):
@@ -22,8 +34,32 @@ class Sidebar(QWidget):
         self.layout.setSpacing(0)
 
         self.scanner_thread = None
+        self.monitor_thread = None
+        self.guide_thread = None
+
+        # Cached results from previous scans, keyed like the list rows
+        self.store = ChannelStore()
+        self.seen_keys = set()
+        self.scanned_interfaces = set()  # Channel.interface values the current scan covers
+        self.scanned_ports = set()  # Ports the current scan probes
+        self.scan_stopped = False
+        # IGMP joins per second for scans, None for as fast as the window allows
+        self.join_rate = None
+
+        # The scanner delivers channels in batches, one model insert each
+        self.channel_model = ChannelListModel(self)
+
+        # Programme guide collected earlier; now/next is read from its index
+        try:
+            self.guide = EPGStore().open()
+        except (OSError, sqlite3.Error):
+            self.guide = None
+        self.guide_timer = QTimer(self)
+        self.guide_timer.timeout.connect(self.refresh_guide)
+        self.guide_timer.start(GUIDE_REFRESH_MS)
 
         self.setup_ui()
+        self.load_cached_channels()
 
     def setup_ui(self):
         # --- Header Section ---
@@ -52,6 +88,18 @@ class Sidebar(QWidget):
         self.mode_combo.currentIndexChanged.connect(self.toggle_inputs)
         mode_layout.addWidget(self.mode_combo)
 
+        # Interface to join on. "All" scans every VLAN in one concurrent pass.
+        self.interfaces = list_interfaces()
+        self.interface_combo = QComboBox()
+        self.interface_combo.addItem("Default Interface", [])
+        if len(self.interfaces) > 1:
+            self.interface_combo.addItem("All Interfaces",
+                                         [i for i in self.interfaces if not i.loopback])
+        for interface in self.interfaces:
+            self.interface_combo.addItem(str(interface), [interface])
+        self.interface_combo.setToolTip("Network interface to join multicast groups on")
+        self.interface_combo.setStyleSheet(self.mode_combo.styleSheet())
+
         # 3. Custom Input (Hidden by default)
         self.range_input = QLineEdit("239.255.0.*")
         self.range_input.setPlaceholderText("e.g. 239.*.0.1")
@@ -72,6 +120,19 @@ class Sidebar(QWidget):
         """)
         self.range_input.hide()  # Initially hidden
 
+        # Every group is probed on all of these ports in the same pass
+        self.ports_input = QLineEdit("1234")
+        self.ports_input.setPlaceholderText("Ports, e.g. 1234,5000-5010")
+        self.ports_input.setToolTip(
+            "UDP ports to probe on every group.\nExamples:\n1234\n1234,5000,5500\n5000-5010")
+        self.ports_input.setStyleSheet(self.range_input.styleSheet())
+
+        # Type-to-filter over the channel list
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter channels...")
+        self.filter_input.setClearButtonEnabled(True)
+        self.filter_input.setStyleSheet(self.range_input.styleSheet())
+
         # 4. Action Button
         btn_layout = QHBoxLayout()
         self.scan_btn = QPushButton(" Start Scan")
@@ -80,7 +141,26 @@ class Sidebar(QWidget):
         self.scan_btn.setCursor(Qt.PointingHandCursor)
         self.scan_btn.clicked.connect(self.start_scan)
 
+        # Watch: stay joined to every listed group and show live up/down
+        self.watch_btn = QPushButton(" Watch")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.setIcon(self.style().standardIcon(QStyle.SP_DialogApplyButton))
+        self.watch_btn.setCursor(Qt.PointingHandCursor)
+        self.watch_btn.setToolTip("Continuously monitor bitrate, CC errors and PCR jitter of every channel")
+        self.watch_btn.toggled.connect(self.toggle_watch)
+
+        # Guide: collect EIT now/next and schedules in the background
+        self.guide_btn = QPushButton(" Guide")
+        self.guide_btn.setCheckable(True)
+        self.guide_btn.setIcon(self.style().standardIcon(QStyle.SP_FileDialogDetailedView))
+        self.guide_btn.setCursor(Qt.PointingHandCursor)
+        self.guide_btn.setToolTip("Collect the programme guide of every channel in the background")
+        self.guide_btn.setEnabled(self.guide is not None)
+        self.guide_btn.toggled.connect(self.toggle_guide)
+
         btn_layout.addWidget(self.scan_btn)
+        btn_layout.addWidget(self.watch_btn)
+        btn_layout.addWidget(self.guide_btn)
 
         # 5. Progress Bar (Hidden by default)
         self.progress_bar = QProgressBar()
@@ -94,14 +174,27 @@ class Sidebar(QWidget):
         header_layout.addLayout(title_layout)
         header_layout.addSpacing(5)
         header_layout.addLayout(mode_layout)
+        header_layout.addWidget(self.interface_combo)
         header_layout.addWidget(self.range_input)
+        header_layout.addWidget(self.ports_input)
         header_layout.addSpacing(5)
         header_layout.addLayout(btn_layout)
         header_layout.addWidget(self.progress_bar)
+        header_layout.addSpacing(5)
+        header_layout.addWidget(self.filter_input)
 
         # --- List Area ---
-        self.channel_list = QListWidget()
-        self.channel_list.itemClicked.connect(self.on_item_clicked)
+        self.filter_model = ChannelFilterModel(self)
+        self.filter_model.setSourceModel(self.channel_model)
+        self.filter_input.textChanged.connect(self.filter_model.setFilterFixedString)
+
+        self.channel_list = QListView()
+        self.channel_list.setModel(self.filter_model)
+        self.channel_list.setItemDelegate(ChannelDelegate(self.channel_list))
+        self.channel_list.setUniformItemSizes(True)  # Lets the view skip per-row size queries
+        self.channel_list.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.channel_list.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.channel_list.clicked.connect(self.on_item_clicked)
         self.channel_list.hide()
 
         # Empty State
@@ -120,6 +213,14 @@ class Sidebar(QWidget):
         self.layout.addWidget(self.channel_list)
         self.layout.addWidget(footer)
 
+    def load_cached_channels(self):
+        """Shows the channels from the last session straight away."""
+        channels = self.store.load()
+        if channels:
+            self.channel_model.add_channels(channels)
+            self.refresh_guide()
+            self.show_list()
+
     def toggle_inputs(self):
         """Switches between Smart Scan (no input) and Custom Range (input visible)"""
         if self.mode_combo.currentIndex() == 1:  # Custom Range
@@ -129,6 +230,10 @@ class Sidebar(QWidget):
             self.range_input.hide()
             self.empty_state.setText("Click 'Start Scan' to\nauto-discover channels.")
 
+    def set_join_rate(self, rate):
+        """Join limit for the next scan (None for unlimited)."""
+        self.join_rate = rate
+
     def start_scan(self):
         # 1. Safety Check: If thread is somehow already running, kill it first
         if self.scanner_thread and self.scanner_thread.isRunning():
@@ -140,10 +245,15 @@ class Sidebar(QWidget):
         custom_range = self.range_input.text().strip()
 
         # Validation for custom range
-        if scan_mode == "custom" and (not custom_range or custom_range.count('.') != 3):
+        if scan_mode == "custom" and parse_pattern(custom_range) is None:
             self.status_message.emit("Error: Invalid IP format. Use 239.x.x.x")
             return
 
+        ports = parse_ports(self.ports_input.text())
+        if not ports:
+            self.status_message.emit("Error: Invalid ports. Use e.g. 1234,5000-5010")
+            return
+
         # 2. Update UI State
         self.scan_btn.setEnabled(False)  # Temporarily disable to prevent double clicks
         self.scan_btn.setText(" Stop")
@@ -156,22 +266,29 @@ class Sidebar(QWidget):
         self.scan_btn.clicked.connect(self.stop_scan)
         self.scan_btn.setEnabled(True)  # Re-enable
 
-        # Reset List
+        # Keep the cached list on screen; the scan revalidates it
         self.progress_bar.show()
         self.progress_bar.setValue(0)
-        self.channel_list.clear()
-        self.channel_list.hide()
-        self.empty_state.show()
-        self.empty_state.setText("Scanning..." if scan_mode == "custom" else "Smart Scanning...")
+        self.seen_keys = set()
+        interfaces = self.interface_combo.currentData()
+        self.scanned_interfaces = {i.name for i in interfaces} if interfaces else {""}
+        self.scanned_ports = set(ports)
+        self.scan_stopped = False
+        if self.channel_model.rowCount() == 0:
+            self.channel_list.hide()
+            self.empty_state.show()
+            self.empty_state.setText("Scanning..." if scan_mode == "custom" else "Smart Scanning...")
 
         # 3. Initialize Scanner Thread
-        # Port 1234 matches your Go streamer
-        self.scanner_thread = ScannerWorker(mode=scan_mode, custom_range=custom_range, port=1234)
+        self.scanner_thread = ScannerWorker(mode=scan_mode, custom_range=custom_range, ports=ports,
+                                            interfaces=interfaces,
+                                            known=self.store.groups(),
+                                            join_rate=self.join_rate)
 
         # Connect Signals
         self.scanner_thread.progress.connect(self.update_progress_bar)
-        self.scanner_thread.status.connect(lambda msg: self.status_message.emit(msg))
-        self.scanner_thread.channel_found.connect(self.add_channel_item)
+        self.scanner_thread.snapshot.connect(self.update_scan_status)
+        self.scanner_thread.channels_found.connect(self.on_channels_found)
 
         # KEY: Connect 'finished' to 'finish_scan'
         # This ensures the UI only resets when the thread ACTUALLY dies.
@@ -179,6 +296,71 @@ class Sidebar(QWidget):
 
         self.scanner_thread.start()
 
+    def toggle_watch(self, checked):
+        if checked:
+            self.start_watch()
+        else:
+            self.stop_watch()
+            self.channel_model.update_health({})
+
+    def start_watch(self):
+        """(Re)starts the health monitor on the channels currently listed."""
+        self.stop_watch()
+        if not self.channel_model.channels:
+            return
+        self.monitor_thread = MonitorWorker(list(self.channel_model.channels))
+        self.monitor_thread.health.connect(self.channel_model.update_health)
+        self.monitor_thread.status.connect(self.status_message.emit)
+        self.monitor_thread.start()
+
+    def stop_watch(self):
+        if self.monitor_thread and self.monitor_thread.isRunning():
+            self.monitor_thread.stop()
+            self.monitor_thread.wait()  # Returns within one 0.1s select
+        self.monitor_thread = None
+
+    def toggle_guide(self, checked):
+        if checked:
+            self.start_guide()
+        else:
+            self.stop_guide()
+
+    def start_guide(self):
+        """(Re)starts guide collection on the channels currently listed."""
+        self.stop_guide()
+        if not self.channel_model.channels:
+            return
+        self.guide_thread = GuideWorker(list(self.channel_model.channels), repeat_after=GUIDE_REPEAT)
+        self.guide_thread.written.connect(self.refresh_guide)
+        self.guide_thread.status.connect(self.status_message.emit)
+        self.guide_thread.start()
+
+    def stop_guide(self):
+        if self.guide_thread and self.guide_thread.isRunning():
+            self.guide_thread.stop()
+            self.guide_thread.wait()  # Returns within one 0.1s select
+        self.guide_thread = None
+
+    def refresh_guide(self):
+        """Reads now/next of every listed channel from the guide's index."""
+        if self.guide is None:
+            return
+        try:
+            guide = self.guide.now_next([channel.key for channel in self.channel_model.channels])
+        except sqlite3.Error:
+            return
+        self.channel_model.update_guide(guide)
+
+    def shutdown(self):
+        """Stops the background threads before the window goes away."""
+        self.stop_watch()
+        self.stop_guide()
+        if self.guide:
+            self.guide.close()
+        if self.scanner_thread and self.scanner_thread.isRunning():
+            self.scanner_thread.stop()
+            self.scanner_thread.wait()
+
     def stop_scan(self):
         """
         Signal the thread to stop, but DO NOT BLOCK the UI waiting for it.
@@ -188,42 +370,36 @@ class Sidebar(QWidget):
             self.status_message.emit("Stopping scan...")
             self.scan_btn.setEnabled(False)  # Disable button to prevent spamming
             self.scan_btn.setText(" Stopping...")
+            self.scan_stopped = True
             self.scanner_thread.stop()
             # WE DO NOT CALL wait() HERE. It freezes the GUI.
 
     def update_progress_bar(self, val):
         self.progress_bar.setValue(val)
 
-    def add_channel_item(self, name, ip):
+    def update_scan_status(self, snapshot):
+        msg = (f"{snapshot['probed']}/{snapshot['total']} groups probed · "
+               f"{snapshot['in_flight']} in flight · {snapshot['hits']} live · "
+               f"{snapshot['join_rate']:.0f} joins/s")
+        if snapshot["eta"] is not None:
+            minutes, seconds = divmod(int(snapshot["eta"]), 60)
+            msg += f" · ETA {minutes}:{seconds:02d}"
+        if snapshot["event"]:
+            msg = f"{snapshot['event']}  |  {msg}"
+        self.status_message.emit(msg)
+
+    def on_channels_found(self, channels):
+        for channel in channels:
+            self.seen_keys.add(channel.key)
+            self.store.put(channel)
+        self.channel_model.add_channels(channels)
+        self.show_list()
+
+    def show_list(self):
         # Found a channel? Hide empty state
         self.empty_state.hide()
         self.channel_list.show()
 
-        # Create List Item
-        item = QListWidgetItem(self.channel_list)
-
-        # Custom Widget for multi-line support
-        widget = QWidget()
-        layout = QVBoxLayout(widget)
-        layout.setContentsMargins(10, 8, 10, 8)
-        layout.setSpacing(2)
-
-        name_lbl = QLabel(name)
-        name_lbl.setStyleSheet("font-weight: bold; color: #e2e8f0; background: transparent;")
-
-        ip_lbl = QLabel(f"{ip}:1234")
-        ip_lbl.setStyleSheet("color: #718096; font-size: 11px; background: transparent;")
-
-        layout.addWidget(name_lbl)
-        layout.addWidget(ip_lbl)
-
-        # Set Item Size Hint (Crucial for Layout)
-        item.setSizeHint(QSize(widget.sizeHint().width(), 55))
-
-        self.channel_list.setItemWidget(item, widget)
-        # Store metadata
-        item.setData(Qt.UserRole, (name, ip))
-
     def finish_scan(self, count):
         # UI State: Ready
         self.scan_btn.setEnabled(True)
@@ -238,17 +414,53 @@ class Sidebar(QWidget):
 
         self.progress_bar.hide()
 
+        # A full pass is authoritative: drop cached channels it did not confirm.
+        # A stopped scan only adds to what we already knew.
+        if not self.scan_stopped:
+            self.remove_unseen_channels()
+        # Pick up new channels (and drop removed ones) in the watch list
+        if self.watch_btn.isChecked():
+            self.start_watch()
+        if self.guide_btn.isChecked():
+            self.start_guide()
+        self.refresh_guide()
+        try:
+            self.store.save()
+        except OSError as e:
+            self.status_message.emit(f"Could not save channel cache: {e}")
+
         msg = "Scan Complete."
-        final_count = self.channel_list.count()
+        final_count = self.channel_model.rowCount()
         if final_count > 0:
             msg = f"Scan Complete. {final_count} channels found."
         else:
+            self.channel_list.hide()
+            self.empty_state.show()
             self.empty_state.setText("No channels found.")
 
         self.status_message.emit(msg)
 
-    def on_item_clicked(self, item):
-        data = item.data(Qt.UserRole)
-        if data:
-            name, ip = data
-            self.channel_selected.emit(name, ip)
\ No newline at end of file
+    def remove_unseen_channels(self):
+        # Channels on interfaces or ports this scan did not cover are left alone
+        keys = self.seen_keys | {c.key for c in self.channel_model.channels
+                                 if c.interface not in self.scanned_interfaces
+                                 or c.port not in self.scanned_ports}
+        self.channel_model.retain(keys)
+        self.store.retain(keys)
+
+    def on_item_clicked(self, index):
+        channel = index.data(ChannelRole)
+        if channel:
+            # Announced first so the player can keep them warm for the next zap
+            self.neighbours_changed.emit(self.neighbours(index))
+            self.channel_selected.emit(channel)
+
+    def neighbours(self, index, count=2):
+        """Channels up to `count` rows above and below `index` in the visible list, nearest first."""
+        model = index.model()
+        channels = []
+        for distance in range(1, count + 1):
+            for row in (index.row() + distance, index.row() - distance):
+                if 0 <= row < model.rowCount():
+                    channels.append(model.index(row, 0).data(ChannelRole))
+        return channels
\ No newline at end of file
@@ -1,13 +1,21 @@
 # ui/video_player.py
 import sys
+import threading
+import time
 import vlc
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QStackedLayout,
                              QPushButton, QFrame, QSlider, QSizePolicy, QStyle)
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from core.latency import LatencyStats, ZapMeasurement
+from core.recorder import Recorder, RecordingSession, default_recording_dir
+from core.zap import ZapRelay
+from ui.player_pool import PlayerPool, WarmPlayer
 
 
 class VideoPlayer(QWidget):
     status_message = pyqtSignal(str)
+    # (player, stage, monotonic time): emitted from libvlc's thread, handled on ours
+    player_event = pyqtSignal(object, str, float)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -17,20 +25,52 @@ class VideoPlayer(QWidget):
 
         self.current_channel_name = ""
 
+        # Click-to-picture timing of the zap in progress, and of the last ones
+        self.zap = None
+        self.latency = LatencyStats()
+        self.clock_player = None  # Player with MediaPlayerTimeChanged attached, if any
+
         # --- VLC Initialization ---
         # --avcodec-hw=none: Prevents VAAPI crash on Linux
         # --no-xlib: Essential for PyQt/Linux compatibility
         self.instance = vlc.Instance("--avcodec-hw=none --no-xlib")
-        self.mediaplayer = self.instance.media_player_new()
+
+        # Local relay that stays joined to the channels next to the current
+        # one, so zapping to them starts from a buffered keyframe
+        self.neighbours = []
+        try:
+            self.relay = ZapRelay()
+            self.relay.start()
+        except OSError:
+            self.relay = None
+
+        # Recordings are written as raw TS by a thread of their own, started
+        # with the first one
+        self.recordings = RecordingSession(on_status=self.status_message.emit)
+        self.recording_thread = None
+        self.recorder = None
 
         self.setup_ui()
 
+        # Muted players pre-rolling the neighbours; off until a size is set
+        self.pool = PlayerPool(self.video_stack, self.start_warm_player)
+        self.current = WarmPlayer(None, self.instance.media_player_new(), self.pool.new_screen())
+        self.player_event.connect(self.on_player_event)
+
+    @property
+    def mediaplayer(self):
+        """The player currently on screen."""
+        return self.current.player
+
     def setup_ui(self):
         # --- Video Frame ---
         self.video_frame = QFrame()
         self.video_frame.setObjectName("VideoFrame")
         self.video_frame.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.video_frame.setStyleSheet("background-color: black;")
+        # One page per media player; only the one on air is visible
+        self.video_stack = QStackedLayout(self.video_frame)
+        self.video_stack.setContentsMargins(0, 0, 0, 0)
 
         # OSD
         self.osd = QLabel(self.video_frame)
@@ -71,46 +111,208 @@ class VideoPlayer(QWidget):
         fs_btn.setIcon(self.style().standardIcon(QStyle.SP_TitleBarMaxButton))
         fs_btn.setStyleSheet("background: transparent; border: none;")
 
-        # Assemble Layout (Record button removed)
+        # Record the channel on screen
+        self.rec_btn = QPushButton("REC")
+        self.rec_btn.setCheckable(True)
+        self.rec_btn.setFixedHeight(30)
+        self.rec_btn.setToolTip("Record the current channel")
+        self.rec_btn.setStyleSheet("""
+            QPushButton { background: transparent; color: #a0aec0; border: 1px solid #4a5568; border-radius: 4px; padding: 0 10px; }
+            QPushButton:checked { background-color: #c53030; color: white; border-color: #c53030; }
+        """)
+        self.rec_btn.toggled.connect(self.toggle_record)
+
+        # Assemble Layout
         c_layout.addWidget(self.play_btn)
         c_layout.addSpacing(15)
         c_layout.addWidget(vol_icon)
         c_layout.addWidget(self.volume_slider)
         c_layout.addStretch()
-        # Removed Rec Btn here
+        c_layout.addWidget(self.rec_btn)
+        c_layout.addSpacing(10)
         c_layout.addWidget(fs_btn)
 
         self.layout.addWidget(self.video_frame)
         self.layout.addWidget(controls)
 
-    def play_stream(self, name, ip):
+    def play_stream(self, channel):
+        name = channel.name
         self.current_channel_name = name
 
-        if self.mediaplayer.is_playing():
-            self.mediaplayer.stop()
+        # A zap that never got to a picture is still worth keeping
+        if self.zap is not None:
+            self.latency.add(self.zap)
+            self.zap = None
+        self.unwatch_clock()
+
+        if self.relay:
+            self.relay.prefetch([channel] + self.neighbours)
+
+        previous = self.current
+        warm = self.pool.take(channel)
+        if warm is not None:
+            # Pre-rolled: already joined and decoding, just bring it forward
+            zap = ZapMeasurement(name, "warm")
+            self.current = warm
+            self.video_stack.setCurrentWidget(warm.screen)
+            warm.player.audio_set_mute(False)
+            warm.player.audio_set_volume(self.volume_slider.value())
+            zap.mark("displayed")
+            self.latency.add(zap)
+            self.status_message.emit(f"Playing: {name} (Live UDP)  ·  pre-rolled")
+        else:
+            self.status_message.emit(f"Buffering: {name}...")
+            zap = ZapMeasurement(name, "direct")
+            screen = self.pool.new_screen()
+            player, zap.source = self.start_player(channel, screen)
+            self.current = WarmPlayer(channel, player, screen)
+            self.current.player.audio_set_volume(self.volume_slider.value())
+            self.video_stack.setCurrentWidget(screen)
+            # libvlc events are queued to this thread, so none can be missed
+            self.zap = zap
+
+        # The old player either becomes a warm neighbour or is stopped here
+        self.pool.add(previous)
+        self.pool.refresh(self.neighbours, current=channel)
+
+        self.play_btn.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
+        self.show_osd(name, channel.ip)
 
-        url = f"udp://@{ip}:1234"
-        self.status_message.emit(f"Buffering: {name}...")
+    def build_media(self, channel):
+        url = self.relay.url_for(channel) if self.relay else None
+        direct = url is None
+        if direct:
+            url = f"udp://@{channel.ip}:{channel.port}"
 
         media = self.instance.media_new(url)
         media.add_option(":network-caching=300")
         media.add_option(":clock-jitter=0")
         media.add_option(":clock-synchro=0")
+        # Multi-program streams: only demux and decode the selected service
+        if channel.service_id is not None:
+            media.add_option(f":program={channel.service_id}")
+        # Join on the interface the scanner found the group on
+        if direct and channel.interface:
+            media.add_option(f":miface={channel.interface}")
+        return media, "direct" if direct else "relay"
 
-        self.mediaplayer.set_media(media)
+    def start_player(self, channel, screen):
+        """Starts a player on `screen`. Returns (player, "direct" or "relay")."""
+        player = self.instance.media_player_new()
+        media, source = self.build_media(channel)
+        player.set_media(media)
+        self.watch_events(player)
 
         if sys.platform.startswith("linux"):
-            self.mediaplayer.set_xwindow(int(self.video_frame.winId()))
+            player.set_xwindow(int(screen.winId()))
         elif sys.platform == "win32":
-            self.mediaplayer.set_hwnd(int(self.video_frame.winId()))
+            player.set_hwnd(int(screen.winId()))
         elif sys.platform == "darwin":
-            self.mediaplayer.set_nsobject(int(self.video_frame.winId()))
+            player.set_nsobject(int(screen.winId()))
 
-        self.mediaplayer.play()
-        self.play_btn.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
+        player.play()
+        return player, source
+
+    def start_warm_player(self, channel, screen):
+        player, _ = self.start_player(channel, screen)
+        player.audio_set_mute(True)
+        return player
+
+    def watch_events(self, player):
+        """Forwards the libvlc events that mark playback stages to on_player_event."""
+        def emit(stage):
+            self.player_event.emit(player, stage, time.monotonic())
+
+        def buffering(event):
+            # The first report means data arrived, 100% means caching is filled
+            emit("first_packet")
+            if event.u.new_cache >= 100:
+                emit("buffered")
+
+        events = player.event_manager()
+        events.event_attach(vlc.EventType.MediaPlayerOpening, lambda event: emit("opening"))
+        events.event_attach(vlc.EventType.MediaPlayerBuffering, buffering)
+        events.event_attach(vlc.EventType.MediaPlayerPlaying, lambda event: emit("playing"))
+        events.event_attach(vlc.EventType.MediaPlayerVout, lambda event: emit("first_frame"))
+
+    def watch_clock(self, player):
+        """
+        Attaches MediaPlayerTimeChanged, which marks "displayed", until the
+        first sample. It fires many times a second for as long as a player
+        runs, so it is only attached after the first frame of a zap.
+        """
+        self.unwatch_clock()
+        player.event_manager().event_attach(
+            vlc.EventType.MediaPlayerTimeChanged,
+            lambda event: self.player_event.emit(player, "displayed", time.monotonic()))
+        self.clock_player = player
+
+    def unwatch_clock(self):
+        # Detached here on the GUI thread: libvlc cannot detach from inside a callback
+        if self.clock_player is not None:
+            self.clock_player.event_manager().event_detach(vlc.EventType.MediaPlayerTimeChanged)
+            self.clock_player = None
+
+    def on_player_event(self, player, stage, at):
+        # The mute can be lost when the audio output is created; redo it then
+        if stage == "playing" and self.pool.is_warm(player):
+            player.audio_set_mute(True)
+
+        zap = self.zap
+        if zap is None or player is not self.mediaplayer:
+            return
+        if not zap.mark(stage, at):
+            return
+        # The clock runs before the first picture is out on some outputs, so
+        # it is only watched from the first frame on
+        if stage == "first_frame":
+            self.watch_clock(player)
+        elif stage == "displayed":
+            self.unwatch_clock()
+            self.latency.add(zap)
+            self.zap = None
+            self.status_message.emit(f"Playing: {zap.name} (Live UDP)  ·  "
+                                     f"{zap.stages['displayed'] * 1000:.0f} ms to picture")
+
+    def set_pool_size(self, size):
+        """Number of neighbouring channels kept pre-rolled (0 turns the pool off)."""
+        self.pool.size = size
+        self.pool.refresh(self.neighbours, current=self.current.channel)
+
+    def set_neighbours(self, channels):
+        """Channels to keep warm in the relay besides the one playing."""
+        self.neighbours = list(channels)
+
+    def shutdown(self):
+        self.unwatch_clock()
+        self.pool.clear()
+        self.mediaplayer.stop()
+        if self.relay:
+            self.relay.stop()
+        if self.recording_thread:
+            # Closes the segment and index files of every recording
+            self.recordings.stop()
+            self.recording_thread.join(timeout=2.0)
+
+    def toggle_record(self, checked):
+        if not checked:
+            if self.recorder is not None:
+                self.recordings.remove(self.recorder)
+                self.recorder = None
+            self.rec_btn.setToolTip("Record the current channel")
+            return
 
-        self.show_osd(name, ip)
-        QTimer.singleShot(1500, lambda: self.status_message.emit(f"Playing: {name} (Live UDP)"))
+        channel = self.current.channel
+        if channel is None:
+            self.rec_btn.setChecked(False)
+            return
+        if self.recording_thread is None:
+            self.recording_thread = threading.Thread(target=self.recordings.run, daemon=True)
+            self.recording_thread.start()
+        # Keeps recording this channel when zapping away from it
+        self.recorder = Recorder(channel, default_recording_dir())
+        self.recordings.add(self.recorder)
+        self.rec_btn.setToolTip(f"Recording {channel.name}")
 
     def toggle_play(self):
         if self.mediaplayer.is_playing():